@@ -0,0 +1,57 @@
+import gc
+import importlib
+
+import metrics
+
+
+# Every algorithm is a plugin 'module:function'. Plugins import qiskit, Aer
+# and matplotlib, so they are loaded on the first request that needs them;
+# under a prefork server preload() loads them once in the master instead.
+PLUGINS = {
+    'bernstein_vazirani': 'algorithms.bernstein_vazirani:bernstein_vazirani',
+    'bernstein_vazirani_solver': 'algorithms.bernstein_vazirani:solve_bernstein_vazirani',
+    'grover': 'algorithms.grover:grover',
+    'grover_sudoku': 'algorithms.grover:grover_sudoku',
+    'grover_cnf': 'algorithms.grover:grover_cnf',
+    'grover_comparison': 'algorithms.search_comparison:compare_search',
+    'quantum_teleportation': 'algorithms.quantum_teleportation:quantum_teleportation',
+    'teleportation_exact': 'algorithms.quantum_teleportation:teleport_exact',
+    'simon': 'algorithms.simon:simon',
+    'simon_solver': 'algorithms.simon:solve_simon',
+    'qft_bloch': 'algorithms.shor:qft_bloch',
+    'qft_circuit': 'algorithms.shor:qft_circuit',
+    'shor_factor': 'algorithms.shor:factor',
+}
+
+_loaded = {}
+
+
+def load(reference):
+    function = _loaded.get(reference)
+    if function is None:
+        module_name, function_name = reference.split(':')
+        function = getattr(importlib.import_module(module_name), function_name)
+        _loaded[reference] = function
+    return function
+
+
+def get_algorithm(name):
+    return load(PLUGINS[name])
+
+
+def run_algorithm(name, cache, **kwargs):
+    # 'circuit' is the plugin's own time: building the circuit and its key;
+    # transpiling, simulation and drawing are stages of their own
+    with metrics.stage('load', algorithm=name):
+        function = get_algorithm(name)
+    with metrics.stage('circuit', algorithm=name):
+        return function(cache=cache, **kwargs)
+
+
+def preload(names=None):
+    for name in names or PLUGINS:
+        get_algorithm(name)
+    # Keep the preloaded objects out of the collector so forked workers
+    # do not touch (and copy) their pages on every GC pass
+    gc.collect()
+    gc.freeze()
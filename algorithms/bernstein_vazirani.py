@@ -0,0 +1,228 @@
+import time
+from functools import lru_cache
+
+import numpy as np
+from qiskit import transpile
+from qiskit.circuit import ParameterVector
+from qiskit_aer import AerSimulator
+
+import resource_governor
+from circuit import create_circuit_ir
+from cnot_gate import add_controlledX_gate
+from draw_circuit import draw
+from hadamard_gate import add_hadamard_gate
+from counts import register_sizes
+from histogram import create_histogram
+from pauli_gate import add_x_gate
+from result_cache import cached_run, result_key
+from simulation import AER, run_counts, run_samples
+
+
+# Bernstein Vazirani algorithm
+def bernstein_vazirani_circuit(secret_number):
+    # A CircuitIR: every step is one bulk append, so secrets of hundreds of
+    # bits build in microseconds and the stabilizer engine reads the arrays
+    # directly; it is lowered to qiskit only to be drawn or run on Aer
+    num_qubits = len(secret_number) + 1
+    num_bits = len(secret_number)
+    circuit, quantum_register = create_circuit_ir(
+        num_qubits=num_qubits,
+        num_bits=num_bits
+    )
+    add_hadamard_gate(
+        circuit=circuit,
+        quantum_register=quantum_register,
+        vector_register=range(len(secret_number))
+    )
+    add_x_gate(
+        circuit=circuit,
+        qubit=len(secret_number)
+    )
+    add_hadamard_gate(
+        circuit=circuit,
+        quantum_register=quantum_register,
+        vector_register=[len(secret_number)]
+    )
+    circuit.barrier()
+    add_controlledX_gate(
+        circuit=circuit,
+        quantum_register=quantum_register,
+        vector_register=[
+            [index, len(secret_number)]
+            for index, value in enumerate(reversed(secret_number))
+            if value == '1'
+        ]
+    )
+    circuit.barrier()
+    add_hadamard_gate(
+        circuit=circuit,
+        quantum_register=quantum_register,
+        vector_register=range(len(secret_number))
+    )
+    circuit.barrier()
+    circuit.measure(
+        range(len(secret_number)),
+        range(len(secret_number))
+    )
+    return circuit
+
+
+def bernstein_vazirani(cache, secret_number='111000', engine=AER):
+    circuit = bernstein_vazirani_circuit(secret_number)
+
+    def run():
+        circuit_image = draw(
+            circuit=circuit
+        )
+        counts = run_counts(
+            circuit,
+            backend='qasm_simulator',
+            shots=1,
+            engine=engine
+        )
+        histogram_image = create_histogram(
+            counts=counts,
+            name="bernstein_vazirani_algorithm_histogram",
+            registers=register_sizes(circuit)
+        )
+        return {
+            'counts': counts,
+            'registers': register_sizes(circuit),
+            'artifacts': {
+                'circuit': circuit_image,
+                'histogram': histogram_image
+            }
+        }
+
+    return cached_run(
+        cache=cache,
+        key=result_key(circuit, f'{engine}:qasm_simulator', shots=1),
+        run=run
+    )
+
+
+def solve_bernstein_vazirani(cache, secret_number='111000', engine=AER):
+    # One shot recovers the secret. The circuit is Clifford, so it runs on a
+    # stabilizer tableau and the register may be far wider than run_counts'
+    # 2^n counts array allows (hundreds of bits)
+    if not secret_number or set(secret_number) - {'0', '1'}:
+        raise ValueError('Секрет задаётся строкой из 0 и 1')
+    circuit = bernstein_vazirani_circuit(secret_number)
+
+    def run():
+        value, = run_samples(
+            circuit,
+            backend='qasm_simulator',
+            shots=1,
+            engine=engine
+        )
+        return {
+            'counts': None,
+            'secret': format(value, f'0{len(secret_number)}b'),
+            'num_qubits': circuit.num_qubits,
+            'artifacts': {}
+        }
+
+    return cached_run(
+        cache=cache,
+        key=result_key(circuit, f'{engine}:samples:qasm_simulator', shots=1),
+        run=run
+    )
+
+
+# Bernstein Vazirani parameter sweep
+# BV circuits stay product states, so the MPS method handles 30+ bit secrets
+# with bond dimension 1 where a statevector would need 2^n amplitudes.
+SWEEP_METHOD = 'matrix_product_state'
+
+
+@lru_cache(maxsize=None)
+def sweep_simulator():
+    return AerSimulator(method=SWEEP_METHOD)
+
+
+@lru_cache(maxsize=64)
+def sweep_template(num_bits):
+    # The ancilla in |-> turns every CX(i, ancilla) of the oracle into a Z on
+    # qubit i, so the oracle is P(pi * s_i) and the secret bits are parameters
+    secret = ParameterVector('s', num_bits)
+    circuit, quantum_register = create_circuit_ir(num_qubits=num_bits, num_bits=num_bits)
+    circuit.h(quantum_register)
+    circuit.p(0.0, quantum_register)
+    circuit.h(quantum_register)
+    circuit.measure(quantum_register, quantum_register)
+    # The P gates are rows num_bits .. 2 num_bits - 1. No barriers and
+    # optimization_level=0: Aer binds parameters by instruction position,
+    # which barriers and gate merging shift
+    template = circuit.to_qiskit(parameters={
+        num_bits + index: np.pi * secret[index] for index in range(num_bits)
+    })
+    return transpile(template, sweep_simulator(), optimization_level=0), secret
+
+
+def secret_bits(secrets):
+    # (len(secrets), n) array of 0/1 with column i = qubit i (last character)
+    characters = np.frombuffer(''.join(secrets).encode('ascii'), dtype=np.uint8)
+    return (characters - ord('0')).reshape(len(secrets), -1)[:, ::-1]
+
+
+def sweep(secrets, max_secrets=10000, max_length=64):
+    if not 0 < len(secrets) <= max_secrets:
+        raise ValueError(f'Нужно от 1 до {max_secrets} секретов')
+    groups = {}
+    for index, secret in enumerate(secrets):
+        if not isinstance(secret, str) or not 0 < len(secret) <= max_length \
+                or secret.strip('01'):
+            raise ValueError(f'Некорректный секрет: {secret!r}')
+        groups.setdefault(len(secret), []).append(index)
+
+    # One template per secret length, every secret bound into a single Aer job
+    circuits = []
+    parameter_binds = []
+    order = []
+    for num_bits, indices in groups.items():
+        template, parameters = sweep_template(num_bits)
+        bits = secret_bits([secrets[index] for index in indices])
+        circuits.append(template)
+        parameter_binds.append({
+            parameters[qubit]: bits[:, qubit].tolist()
+            for qubit in range(num_bits)
+        })
+        order.extend(indices)
+
+    # Aer runs the experiments of a job one after another: the largest one
+    # has to fit the memory budget, all of them together the time budget
+    plans = []
+    for template, binds in zip(circuits, parameter_binds):
+        plan = resource_governor.plan(template, shots=1, method=SWEEP_METHOD)
+        plan['seconds'] *= len(next(iter(binds.values())))
+        plans.append(plan)
+    plan = dict(
+        max(plans, key=lambda plan: plan['bytes']),
+        seconds=sum(plan['seconds'] for plan in plans)
+    )
+    start = time.perf_counter()
+    with resource_governor.GOVERNOR.admit(plan):
+        result = sweep_simulator().run(
+            circuits,
+            parameter_binds=parameter_binds,
+            shots=1
+        ).result()
+    if not result.success:
+        raise RuntimeError(result.status)
+    elapsed = time.perf_counter() - start
+
+    recovered = [None] * len(secrets)
+    for position, index in enumerate(order):
+        experiment = result.results[position]
+        recovered[index] = {
+            'secret': secrets[index],
+            'recovered': next(iter(result.get_counts(position))),
+            'time': experiment.time_taken
+        }
+        recovered[index]['correct'] = recovered[index]['recovered'] == secrets[index]
+    return {
+        'results': recovered,
+        'total_time': elapsed,
+        'method': SWEEP_METHOD
+    }
@@ -0,0 +1,232 @@
+from qiskit import ClassicalRegister, QuantumCircuit, QuantumRegister
+
+from algorithms.grover_oracle import Problem, build_grover, success_probability
+from circuit import create_circuit
+from draw_circuit import draw
+from hadamard_gate import add_hadamard_gate
+from counts import register_sizes
+from histogram import create_histogram
+from pauli_gate import add_z_gate
+from result_cache import cached_run, result_key
+from simulation import AER, run_counts, run_statevector
+
+
+# Grover algorithm
+def grover(cache, engine=AER):
+    num_qubits=2
+    num_bits=2
+    circuit, quantum_register = create_circuit(
+        num_qubits=num_qubits,
+        num_bits=num_bits
+    )
+    add_hadamard_gate(
+        circuit=circuit,
+        quantum_register=quantum_register,
+        vector_register=[0,1]
+    )
+    # ORACLE
+    add_z_gate(
+        circuit=circuit,
+        quantum_register=quantum_register,
+        vector_register=[0,1]  
+    )
+    # DIFUSSION OPERATOR
+    add_hadamard_gate(
+        circuit=circuit,
+        quantum_register=quantum_register,
+        vector_register=[0,1]
+    )
+    circuit.z(
+        [0,1]
+    )
+    add_z_gate(
+        circuit=circuit,
+        quantum_register=quantum_register,
+        vector_register=[0,1]
+    )
+    add_hadamard_gate(
+        circuit=circuit,
+        quantum_register=quantum_register,
+        vector_register=[0,1]
+    )
+
+    def run():
+        # EXPORT CIRCUIT
+        circuit_image = draw(
+            circuit=circuit
+        )
+        # ANALYSIS
+        state_vector = run_statevector(circuit, engine=engine)
+        measured_circuit = circuit.measure_all(inplace=False)
+        counts = run_counts(
+            measured_circuit,
+            backend='qasm_simulator',
+            engine=engine
+        )
+        histogram_image = create_histogram(
+            counts=counts,
+            name="grover_algorithm_histogram",
+            registers=register_sizes(measured_circuit)
+        )
+        return {
+            'counts': counts,
+            'registers': register_sizes(measured_circuit),
+            'statevector': state_vector,
+            'artifacts': {
+                'circuit': circuit_image,
+                'histogram': histogram_image
+            }
+        }
+
+    return cached_run(
+        cache=cache,
+        key=result_key(circuit, f'{engine}:statevector_simulator+qasm_simulator', shots=1024),
+        run=run
+    )
+
+
+# 2x2 sudoku: neighbouring cells must differ
+SUDOKU = Problem(
+    num_variables=4,
+    xor_clauses=[([0,1], 1), ([0,2], 1), ([1,3], 1), ([2,3], 1)]
+)
+
+
+def grover_sudoku(cache, engine=AER):
+    clause_list = [variables for variables, _ in SUDOKU.xor_clauses]
+    in_qubits = QuantumRegister(2, name='input')
+    out_qubit = QuantumRegister(1, name='output')
+    circuit = QuantumCircuit(in_qubits, out_qubit)
+    XOR(circuit, in_qubits[0], in_qubits[1], out_qubit)
+
+    # Create separate registers to name bits
+    var_qubits = QuantumRegister(4, name='v')  # variable bits
+    clause_qubits = QuantumRegister(4, name='c')  # bits to store clause-checks
+    circuit_dos = QuantumCircuit(var_qubits, clause_qubits)
+    i = 0
+    for clause in clause_list:
+        XOR(circuit_dos, clause[0], clause[1], clause_qubits[i])
+        i += 1
+
+    # Create separate registers to name bits
+    var_qubits = QuantumRegister(4, name='v')
+    clause_qubits = QuantumRegister(4, name='c')
+    output_qubit = QuantumRegister(1, name='out')
+    circuit_tres = QuantumCircuit(var_qubits, clause_qubits, output_qubit)
+    # Compute clauses
+    i = 0
+    for clause in clause_list:
+        XOR(circuit_tres, clause[0], clause[1], clause_qubits[i])
+        i += 1
+    # Flip 'output' bit if all clauses are satisfied
+    # MCT - Multiple Control X Gate
+    circuit_tres.mct(clause_qubits, output_qubit)
+
+    # REPETING STATES WITHOUT COMPUTING
+    var_qubits = QuantumRegister(4, name='v')
+    clause_qubits = QuantumRegister(4, name='c')
+    output_qubit = QuantumRegister(1, name='out')
+    cbits = ClassicalRegister(4, name='cbits')
+    circuit_cuatro = QuantumCircuit(var_qubits, clause_qubits, output_qubit, cbits)
+    sudoku_oracle(
+        qc=circuit_cuatro,
+        clause_list=clause_list,
+        clause_qubits=clause_qubits,
+        output_qubit=output_qubit
+    )
+
+    # FINAL ALGORITHM
+    # Compiled from the clauses: the iteration count follows from the number
+    # of solutions (2 here) and the diffuser borrows the idle clause qubits
+    circuit_cinco, _, _ = build_grover(SUDOKU)
+
+    def run():
+        artifacts = {}
+        examples = (circuit, circuit_dos, circuit_tres, circuit_cuatro, circuit_cinco)
+        for number, example in enumerate(examples, start=1):
+            artifacts[f'sudoku_circuit_{number}'] = draw(
+                circuit=example
+            )
+        # Simulate and plot results
+        counts = run_counts(
+            circuit_cinco,
+            backend='qasm_simulator',
+            engine=engine
+        )
+        artifacts['histogram'] = create_histogram(
+            counts=counts,
+            name="sudoku_histogram",
+            registers=register_sizes(circuit_cinco)
+        )
+        return {
+            'counts': counts,
+            'registers': register_sizes(circuit_cinco),
+            'artifacts': artifacts
+        }
+
+    return cached_run(
+        cache=cache,
+        key=result_key(circuit_cinco, f'{engine}:qasm_simulator', shots=1024),
+        run=run
+    )
+
+
+# Grover search over arbitrary CNF / XOR constraints
+def grover_cnf(cache, num_variables, clauses=(), xor_clauses=(), num_solutions=None,
+               iterations=None, max_qubits=None, engine=AER, shots=1024):
+    problem = Problem(num_variables, clauses=clauses, xor_clauses=xor_clauses)
+    circuit, iterations, num_solutions = build_grover(
+        problem,
+        iterations=iterations,
+        num_solutions=num_solutions,
+        max_qubits=max_qubits
+    )
+
+    def run():
+        counts = run_counts(
+            circuit,
+            backend='qasm_simulator',
+            shots=shots,
+            engine=engine
+        )
+        return {
+            'counts': counts,
+            'registers': register_sizes(circuit),
+            'artifacts': {}
+        }
+
+    entry = cached_run(
+        cache=cache,
+        key=result_key(circuit, f'{engine}:qasm_simulator', shots=shots),
+        run=run
+    )
+    entry['iterations'] = iterations
+    entry['num_solutions'] = num_solutions
+    entry['num_qubits'] = circuit.num_qubits
+    entry['depth'] = circuit.depth()
+    if num_solutions:
+        entry['success_probability'] = success_probability(num_variables, num_solutions, iterations)
+    return entry
+
+
+def XOR(qc, a, b, output):
+    qc.cx(a, output)
+    qc.cx(b, output)
+
+
+def sudoku_oracle(qc, clause_list, clause_qubits, output_qubit):
+    # Compute clauses
+    i = 0
+    for clause in clause_list:
+        XOR(qc, clause[0], clause[1], clause_qubits[i])
+        i += 1
+
+    # Flip 'output' bit if all clauses are satisfied
+    qc.mct(clause_qubits, output_qubit)
+
+    # Uncompute clauses to reset clause-checking bits to 0
+    i = 0
+    for clause in clause_list:
+        XOR(qc, clause[0], clause[1], clause_qubits[i])
+        i += 1
+
@@ -0,0 +1,222 @@
+import math
+from numbers import Integral
+
+import numpy as np
+from qiskit import ClassicalRegister, QuantumCircuit, QuantumRegister
+from qiskit.circuit.library import MCXGate
+
+
+# Constraint problems for Grover's search.
+#   clauses:     CNF clauses as DIMACS literals, [1, -3] means x0 OR NOT x2
+#   xor_clauses: (variables, parity) pairs, ([0, 1], 1) means x0 XOR x1 = 1
+# The 2x2 sudoku of grover_sudoku is four XOR clauses: a 2-coloring of a 4-cycle.
+
+# Above this many clauses the clause ancillas are reused in blocks
+MAX_UNBLOCKED_CLAUSES = 4
+
+# Assignments are enumerated classically to count solutions up to this size,
+# this many at a time (a chunk of 2^16 x 22 uint8 is under 2 MB)
+MAX_COUNTED_VARIABLES = 22
+COUNTING_CHUNK = 2 ** 16
+
+# Longest circuit build_grover builds (one solution among 2^24 needs 3216)
+MAX_ITERATIONS = 4096
+
+
+def _is_integer(value):
+    return isinstance(value, Integral) and not isinstance(value, bool)
+
+
+class Problem:
+    def __init__(self, num_variables, clauses=(), xor_clauses=()):
+        if not _is_integer(num_variables) or num_variables < 1:
+            raise ValueError('Число переменных должно быть целым положительным')
+        self.num_variables = num_variables
+        self.clauses = [list(clause) for clause in clauses]
+        self.xor_clauses = [(list(variables), parity) for variables, parity in xor_clauses]
+        for clause in self.clauses:
+            if not clause or any(
+                not _is_integer(literal) or not 0 < abs(literal) <= num_variables
+                for literal in clause
+            ):
+                raise ValueError(f'Некорректная клауза: {clause}')
+        for variables, parity in self.xor_clauses:
+            if not variables or not _is_integer(parity) or parity not in (0, 1) or any(
+                not _is_integer(variable) or not 0 <= variable < num_variables
+                for variable in variables
+            ):
+                raise ValueError(f'Некорректная XOR-клауза: {variables}')
+
+    @property
+    def num_clauses(self):
+        return len(self.clauses) + len(self.xor_clauses)
+
+    def satisfied(self, assignments):
+        # assignments: (k, num_variables) array of 0/1 -> (k,) bool
+        result = np.ones(len(assignments), dtype=bool)
+        for clause in self.clauses:
+            clause_value = np.zeros(len(assignments), dtype=bool)
+            for literal in clause:
+                values = assignments[:, abs(literal) - 1].astype(bool)
+                clause_value |= values if literal > 0 else ~values
+            result &= clause_value
+        for variables, parity in self.xor_clauses:
+            result &= (assignments[:, variables].sum(axis=1) % 2) == parity
+        return result
+
+    def count_solutions(self):
+        if self.num_variables > MAX_COUNTED_VARIABLES:
+            return None
+        shifts = np.arange(self.num_variables)
+        total = 0
+        for start in range(0, 2 ** self.num_variables, COUNTING_CHUNK):
+            indices = np.arange(start, min(start + COUNTING_CHUNK, 2 ** self.num_variables))
+            assignments = ((indices[:, None] >> shifts) & 1).astype(np.uint8)
+            total += int(self.satisfied(assignments).sum())
+        return total
+
+
+def _angle(num_variables, num_solutions):
+    # sqrt(M / 2^n) without forming 2^n, which overflows floats past n = 1023
+    return math.asin(math.sqrt(num_solutions) * 2 ** (-num_variables / 2))
+
+
+def optimal_iterations(num_variables, num_solutions):
+    if not num_solutions:
+        return 0
+    theta = _angle(num_variables, num_solutions)
+    if not theta:
+        raise ValueError(f'Слишком много переменных: {num_variables}')
+    return max(0, math.floor(math.pi / (4 * theta)))
+
+
+def success_probability(num_variables, num_solutions, iterations):
+    theta = _angle(num_variables, num_solutions)
+    return math.sin((2 * iterations + 1) * theta) ** 2
+
+
+def _mcx(circuit, controls, target, free):
+    # Pick the cheapest multi-controlled X the clean qubits in `free` allow
+    controls = list(controls)
+    free = list(free)
+    if len(controls) <= 2:
+        circuit.mcx(controls, target)
+    elif len(free) >= len(controls) - 2:
+        circuit.mcx(controls, target, free[:len(controls) - 2], mode='v-chain')
+    elif free:
+        circuit.mcx(controls, target, free[:1], mode='recursion')
+    else:
+        circuit.mcx(controls, target)
+
+
+class GroverCircuit:
+    def __init__(self, problem, clause_qubits=None):
+        self.problem = problem
+        num_clauses = problem.num_clauses
+        if clause_qubits is None:
+            if num_clauses <= MAX_UNBLOCKED_CLAUSES:
+                clause_qubits = num_clauses
+            else:
+                clause_qubits = math.ceil(math.sqrt(num_clauses))
+        clause_qubits = max(1, min(clause_qubits, num_clauses))
+        self.blocks = [
+            list(range(start, min(start + clause_qubits, num_clauses)))
+            for start in range(0, num_clauses, clause_qubits)
+        ]
+        self.variables = QuantumRegister(problem.num_variables, name='v')
+        self.clause_ancillas = QuantumRegister(clause_qubits, name='c')
+        registers = [self.variables, self.clause_ancillas]
+        self.block_ancillas = None
+        if len(self.blocks) > 1:
+            self.block_ancillas = QuantumRegister(len(self.blocks), name='b')
+            registers.append(self.block_ancillas)
+        self.output = QuantumRegister(1, name='out')
+        self.cbits = ClassicalRegister(problem.num_variables, name='cbits')
+        self.circuit = QuantumCircuit(*registers, self.output, self.cbits)
+
+    def _clause(self, index, ancilla):
+        circuit = self.circuit
+        clauses = self.problem.clauses
+        if index < len(clauses):
+            # OR = NOT(all literals false); the control state encodes "false"
+            clause = clauses[index]
+            controls = [self.variables[abs(literal) - 1] for literal in clause]
+            false_state = ''.join(
+                '0' if literal > 0 else '1' for literal in reversed(clause)
+            )
+            circuit.append(MCXGate(len(controls), ctrl_state=false_state), controls + [ancilla])
+            circuit.x(ancilla)
+        else:
+            variables, parity = self.problem.xor_clauses[index - len(clauses)]
+            for variable in variables:
+                circuit.cx(self.variables[variable], ancilla)
+            if parity == 0:
+                circuit.x(ancilla)
+
+    def _block(self, block, target, free):
+        # Compute the clauses of a block, AND them into target, uncompute
+        ancillas = self.clause_ancillas[:len(block)]
+        for index, ancilla in zip(block, ancillas):
+            self._clause(index, ancilla)
+        _mcx(self.circuit, ancillas, target, free)
+        for index, ancilla in reversed(list(zip(block, ancillas))):
+            self._clause(index, ancilla)
+
+    def oracle(self):
+        circuit = self.circuit
+        if self.block_ancillas is None:
+            self._block(self.blocks[0], self.output[0], [])
+            return
+        blocks = list(enumerate(self.blocks))
+        for position, block in blocks:
+            self._block(block, self.block_ancillas[position], self.block_ancillas[position + 1:])
+        _mcx(circuit, self.block_ancillas, self.output[0], self.clause_ancillas)
+        for position, block in reversed(blocks):
+            self._block(block, self.block_ancillas[position], self.block_ancillas[position + 1:])
+
+    def diffuser(self):
+        circuit = self.circuit
+        variables = list(self.variables)
+        free = list(self.clause_ancillas) + list(self.block_ancillas or [])
+        circuit.h(variables)
+        circuit.x(variables)
+        circuit.h(variables[-1])
+        _mcx(circuit, variables[:-1], variables[-1], free)
+        circuit.h(variables[-1])
+        circuit.x(variables)
+        circuit.h(variables)
+
+
+def build_grover(problem, iterations=None, num_solutions=None, clause_qubits=None, max_qubits=None):
+    # The registers alone fix the width, so too wide or too long circuits are
+    # rejected before counting solutions or appending any gate
+    if not problem.num_clauses:
+        raise ValueError('Нужна хотя бы одна клауза')
+    grover = GroverCircuit(problem, clause_qubits=clause_qubits)
+    circuit = grover.circuit
+    if max_qubits is not None and circuit.num_qubits > max_qubits:
+        raise ValueError(f'Схема требует {circuit.num_qubits} кубитов (максимум {max_qubits})')
+    if num_solutions is None:
+        num_solutions = problem.count_solutions()
+    if num_solutions is not None and (
+        not _is_integer(num_solutions) or not 1 <= num_solutions <= 2 ** problem.num_variables
+    ):
+        raise ValueError(f'Число решений должно быть от 1 до 2^{problem.num_variables}')
+    if iterations is None:
+        if num_solutions is None:
+            raise ValueError('Укажите число решений или число итераций')
+        iterations = optimal_iterations(problem.num_variables, num_solutions)
+    if not _is_integer(iterations) or not 0 <= iterations <= MAX_ITERATIONS:
+        raise ValueError(f'Число итераций должно быть от 0 до {MAX_ITERATIONS}')
+    # Output qubit in |-> turns the oracle's bit flip into a phase flip
+    circuit.x(grover.output)
+    circuit.h(grover.output)
+    circuit.h(grover.variables)
+    circuit.barrier()
+    for _ in range(iterations):
+        grover.oracle()
+        circuit.barrier()
+        grover.diffuser()
+        circuit.barrier()
+    circuit.measure(grover.variables, grover.cbits)
+    return circuit, iterations, num_solutions
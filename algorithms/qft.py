@@ -0,0 +1,50 @@
+import math
+
+import numpy as np
+from qiskit import QuantumCircuit
+
+
+# Quantum Fourier transform with controlled-phase (cp) gates, the same
+# convention as qiskit.circuit.library.QFT: qubit 0 is the least
+# significant bit and, with do_swaps, QFT|x> = sum_k e^(2 pi i x k / N) |k> / sqrt(N).
+#
+# approximation_degree drops the controlled rotations with the smallest
+# angles: a rotation by pi / 2^d is kept only while d < n - approximation_degree.
+
+
+def logarithmic_approximation_degree(num_qubits):
+    # Keeps rotations down to pi / 2^(log2(n) + 2): O(n log n) gates with an
+    # error of order n / 2^(log2(n) + 2), below 1/4 whatever n is (Coppersmith)
+    kept = math.ceil(math.log2(max(num_qubits, 1))) + 2
+    return max(0, num_qubits - 1 - kept)
+
+
+def build_qft(num_qubits, approximation_degree=0, do_swaps=True, inverse=False, name='QFT'):
+    if num_qubits < 1:
+        raise ValueError('QFT требует хотя бы один кубит')
+    if approximation_degree < 0:
+        raise ValueError('Степень аппроксимации не может быть отрицательной')
+    circuit = QuantumCircuit(num_qubits, name=name)
+    for target in reversed(range(num_qubits)):
+        circuit.h(target)
+        for control in reversed(range(max(0, target - num_qubits + 1 + approximation_degree), target)):
+            circuit.cp(math.pi / 2 ** (target - control), target, control)
+    if do_swaps:
+        for qubit in range(num_qubits // 2):
+            circuit.swap(qubit, num_qubits - 1 - qubit)
+    if inverse:
+        circuit = circuit.inverse()
+        circuit.name = f'{name}_dg'
+    return circuit
+
+
+def qft_statevector(statevector, inverse=False):
+    # Exact QFT (with swaps) of a known statevector by FFT: O(N log N) instead
+    # of simulating O(n^2) gates on N = 2^n amplitudes. numpy's ifft uses
+    # e^(+2 pi i x k / N), the QFT sign; norm='ortho' is the 1/sqrt(N)
+    state = np.asarray(statevector, dtype=complex)
+    if state.size & (state.size - 1) or state.size < 2:
+        raise ValueError('Длина вектора состояния должна быть степенью двойки')
+    if inverse:
+        return np.fft.fft(state, norm='ortho')
+    return np.fft.ifft(state, norm='ortho')
@@ -0,0 +1,166 @@
+import numpy as np
+
+from circuit import create_circuit
+from cnot_gate import add_controlledX_gate
+from draw_circuit import draw
+from hadamard_gate import add_hadamard_gate
+from counts import format_outcome, register_sizes
+from histogram import create_histogram
+from pauli_gate import add_z_gate
+from result_cache import cached_run, result_key
+from simulation import AER, run_counts, run_statevector
+
+
+# Quantum Teleportation algorithm
+def teleportation_circuits(theta=0.0, phi=0.0, deferred=False):
+    # The drawn circuit and the one that is run (with the final measurement).
+    # Qubit 0 starts in cos(theta/2)|0> + e^(i phi) sin(theta/2)|1>. With
+    # deferred the Bell measurement is moved to the end: the corrections are
+    # already quantum-controlled, so measuring there gives the same statistics
+    # DATA
+    num_qubits = 3
+    num_bits = 3
+
+    circuit, quantum_register = create_circuit(
+        num_qubits=num_qubits,
+        num_bits=num_bits
+    )
+    if theta or phi:
+        circuit.u(theta, phi, 0, quantum_register[0])
+    circuit.barrier()
+    add_hadamard_gate(
+        circuit=circuit,
+        quantum_register=quantum_register,
+        vector_register=[1]
+    )
+    add_controlledX_gate(
+        circuit=circuit,
+        quantum_register=quantum_register,
+        vector_register=[1, 2]
+    )
+    add_controlledX_gate(
+        circuit=circuit,
+        quantum_register=quantum_register,
+        vector_register=[0, 1]
+    )
+    add_hadamard_gate(
+        circuit=circuit,
+        quantum_register=quantum_register,
+        vector_register=[0]
+    )
+    circuit.barrier()
+    if not deferred:
+        circuit.measure(
+            [0,1],
+            [0,1]
+        )
+        circuit.barrier()
+    add_controlledX_gate(
+        circuit=circuit,
+        quantum_register=quantum_register,
+        vector_register=[1, 2]
+    )
+    add_z_gate(
+        circuit=circuit,
+        quantum_register=quantum_register,
+        vector_register=[0, 2]
+    )
+    measured_circuit = circuit.copy()
+    if deferred:
+        measured_circuit.measure([0, 1, 2], [0, 1, 2])
+    else:
+        measured_circuit.measure(2,2)
+    return circuit, measured_circuit
+
+
+def quantum_teleportation(cache, engine=AER, shots=1024, theta=0.0, phi=0.0):
+    # Drawn with the Bell measurement in the middle, run with it deferred: all
+    # measurements are then final and every engine samples the shots from one
+    # final state instead of simulating the circuit once per shot
+    circuit, _ = teleportation_circuits(theta, phi)
+    _, measured_circuit = teleportation_circuits(theta, phi, deferred=True)
+
+    def run():
+        circuit_image = draw(
+            circuit=circuit
+        )
+        counts = run_counts(
+            measured_circuit,
+            backend='qasm_simulator',
+            shots=shots,
+            engine=engine
+        )
+        histogram_image = create_histogram(
+            counts=counts,
+            name="quantum_teleportation_algorithm_histogram",
+            registers=register_sizes(measured_circuit)
+        )
+        return {
+            'counts': counts,
+            'registers': register_sizes(measured_circuit),
+            'artifacts': {
+                'circuit': circuit_image,
+                'histogram': histogram_image
+            }
+        }
+
+    return cached_run(
+        cache=cache,
+        key=result_key(measured_circuit, f'{engine}:qasm_simulator', shots=shots),
+        run=run
+    )
+
+
+# Exact teleportation (deferred measurement, no sampling)
+# ___________________________________________________________________________
+def input_states(angles):
+    # [[theta, phi], ...] -> (k, 2) amplitudes of cos(theta/2)|0> + e^(i phi) sin(theta/2)|1>
+    angles = np.asarray(angles, dtype=float).reshape(-1, 2)
+    theta, phi = angles[:, 0], angles[:, 1]
+    return np.stack([np.cos(theta / 2), np.exp(1j * phi) * np.sin(theta / 2)], axis=1)
+
+
+def teleport_exact(cache, states, engine=AER):
+    # states: [[theta, phi], ...]. The deferred circuit is linear in the input
+    # qubit, so it is simulated once per input basis state (|0> and |1>) and
+    # every requested state is a combination of those two statevectors.
+    amplitudes = input_states(states)
+    circuit, _ = teleportation_circuits(deferred=True)
+
+    def run():
+        # U(pi, 0, 0)|0> = |1>
+        one, _ = teleportation_circuits(theta=np.pi, deferred=True)
+        return {
+            'counts': None,
+            'statevector': np.stack([
+                run_statevector(circuit, engine=engine),
+                run_statevector(one, engine=engine)
+            ], axis=1),
+            'artifacts': {}
+        }
+
+    columns = cached_run(
+        cache=cache,
+        key=result_key(circuit, f'{engine}:exact_statevector'),
+        run=run
+    )['statevector']
+    # (k, 8) final states; basis index bits are (q2 q1 q0)
+    finals = amplitudes @ columns.T
+    probabilities = np.abs(finals) ** 2
+    # Reduced state of qubit 2: rho = M M^dagger with M[q2, (q1 q0)]
+    blocks = finals.reshape(-1, 2, 4)
+    rho = np.einsum('kia,kja->kij', blocks, blocks.conj())
+    fidelities = np.einsum('ki,kij,kj->k', amplitudes.conj(), rho, amplitudes).real
+    registers = [3]
+    # Plain lists, so the result is JSON as it is (also as a job result)
+    return {
+        'fidelities': fidelities.tolist(),
+        'target_probabilities': np.einsum('kii->ki', rho).real.tolist(),
+        'probabilities': [
+            {
+                format_outcome(value, registers): float(row[value])
+                for value in np.flatnonzero(row > 1e-12)
+            }
+            for row in probabilities
+        ]
+    }
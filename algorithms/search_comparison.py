@@ -0,0 +1,108 @@
+import math
+import time
+
+import numpy as np
+
+from algorithms.grover_oracle import optimal_iterations, success_probability
+
+
+# Unstructured search: a classical linear scan against Grover's algorithm,
+# both counted in oracle queries. The classical side runs as one vectorized
+# NumPy comparison over the whole array; Grover runs on 2^n >= N items.
+DEFAULT_SIZES = (10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6, 4 * 10 ** 6)
+
+# Sizes compared in one call
+MAX_SIZES = 20
+
+# Grover is also simulated (amplitudes of all 2^n states) up to this size
+MAX_SIMULATED_QUBITS = 16
+
+
+def classical_search(items, target):
+    # One pass in NumPy; queries = position of the first hit + 1, as a scan
+    # that stops there would need
+    start = time.perf_counter()
+    hits = np.flatnonzero(np.asarray(items) == target)
+    seconds = time.perf_counter() - start
+    return {
+        'index': int(hits[0]) if hits.size else None,
+        'queries': int(hits[0]) + 1 if hits.size else len(items),
+        'marked': int(hits.size),
+        'milliseconds': seconds * 1000
+    }
+
+
+def classical_queries(size, marked):
+    # Exact query counts of a scan in random order, M marked among N:
+    # E = (N + 1) / (M + 1), worst case N - M + 1 (N if nothing is marked)
+    if not marked:
+        return {'expected': size, 'worst_case': size}
+    return {
+        'expected': (size + 1) / (marked + 1),
+        'worst_case': size - marked + 1
+    }
+
+
+def grover_queries(size, marked):
+    num_qubits = max(1, math.ceil(math.log2(size)))
+    iterations = optimal_iterations(num_qubits, marked)
+    probability = success_probability(num_qubits, marked, iterations) if marked else 0.0
+    return {
+        'num_qubits': num_qubits,
+        'iterations': iterations,
+        'success_probability': probability,
+        # One oracle call per iteration plus one to check the measured item,
+        # repeated until a run succeeds
+        'expected': (iterations + 1) / probability if probability else None
+    }
+
+
+def simulate_grover(num_qubits, marked_indices, iterations):
+    # Ideal statevector: the oracle flips the sign of the marked amplitudes,
+    # the diffuser reflects every amplitude about the mean
+    state = np.full(2 ** num_qubits, 2 ** (-num_qubits / 2))
+    marked = np.asarray(marked_indices)
+    for _ in range(iterations):
+        state[marked] *= -1
+        state = 2 * state.mean() - state
+    return float(np.sum(state[marked] ** 2))
+
+
+def compare_search(cache=None, sizes=None, seed=None, max_size=None, items=None, target=None):
+    # Timings are the point here, so nothing goes through the result cache.
+    # items/target: an explicit example searched first (the page's list).
+    # Then random arrays of N values in [0, N) for every size; the target is
+    # one of them, so it appears about once (duplicates are extra marked items)
+    sizes = [int(size) for size in (sizes or DEFAULT_SIZES)]
+    if len(sizes) > MAX_SIZES:
+        raise ValueError(f'Не больше {MAX_SIZES} размеров за один запрос')
+    if not sizes or min(sizes) < 2:
+        raise ValueError('Размер массива должен быть не меньше 2')
+    if max_size is not None and max(sizes) > max_size:
+        raise ValueError(f'Размер массива не должен превышать {max_size}')
+    rng = np.random.default_rng(seed)
+    rows = []
+    for size in sizes:
+        values = rng.integers(0, size, size)
+        wanted = values[rng.integers(size)]
+        classical = classical_search(values, wanted)
+        grover = grover_queries(size, classical['marked'])
+        if grover['num_qubits'] <= MAX_SIMULATED_QUBITS:
+            start = time.perf_counter()
+            grover['simulated_success_probability'] = simulate_grover(
+                grover['num_qubits'],
+                np.flatnonzero(values == wanted),
+                grover['iterations']
+            )
+            grover['milliseconds'] = (time.perf_counter() - start) * 1000
+        classical.update(classical_queries(size, classical['marked']))
+        rows.append({
+            'size': size,
+            'classical': classical,
+            'grover': grover,
+            'speedup': classical['expected'] / grover['expected'] if grover['expected'] else None
+        })
+    return {
+        'example': classical_search(items, target) if items is not None else None,
+        'sizes': rows
+    }
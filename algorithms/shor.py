@@ -0,0 +1,282 @@
+import random
+import re
+from functools import lru_cache
+from math import gcd
+
+import numpy as np
+from qiskit import ClassicalRegister, QuantumCircuit, QuantumRegister
+from qiskit.extensions import UnitaryGate
+
+from algorithms.qft import build_qft, logarithmic_approximation_degree, qft_statevector
+from artifact_store import render_artifact
+from counts import nonzero, register_sizes
+from render import save_bloch_multivector, save_circuit
+from result_cache import cached_run, result_key
+from simulation import AER, run_counts
+
+
+BASIS_STATE = re.compile(r'^[01]+$')
+
+
+# Shor algorithm (QFT)
+def qft_bloch(cache, state='00', max_qubits=None):
+    # state: qubit 0 first, so '01' puts qubit 1 in |1>
+    if not BASIS_STATE.match(state):
+        raise ValueError('Состояние задаётся строкой из 0 и 1')
+    if max_qubits is not None and len(state) > max_qubits:
+        raise ValueError(f'Не больше {max_qubits} кубитов')
+    # Only identifies the state for the result cache; nothing is simulated
+    circuit = QuantumCircuit(len(state))
+    for qubit, bit in enumerate(state):
+        if bit == '1':
+            circuit.x(qubit)
+
+    def run():
+        computational = np.zeros(2 ** len(state), dtype=complex)
+        computational[int(state[::-1], 2)] = 1
+        computational_bases = render_artifact(
+            save_bloch_multivector,
+            computational
+        )
+        fourier_bases = render_artifact(
+            save_bloch_multivector,
+            qft_statevector(computational)
+        )
+        return {
+            'counts': None,
+            'artifacts': {
+                'QFT_computational_bases': computational_bases,
+                'QFT_fourier_bases': fourier_bases
+            }
+        }
+
+    return cached_run(
+        cache=cache,
+        key=result_key(circuit, 'fft_bloch_multivector'),
+        run=run
+    )
+
+
+# Shor algorithm (QFT)
+def qft_circuit(cache, num_qubits=4, approximation_degree=None, max_qubits=None):
+    # approximation_degree=None drops the rotations below pi / 2^(log2(n) + 2)
+    if max_qubits is not None and num_qubits > max_qubits:
+        raise ValueError(f'Не больше {max_qubits} кубитов')
+    if approximation_degree is None:
+        approximation_degree = logarithmic_approximation_degree(num_qubits)
+    circuit = build_qft(num_qubits, approximation_degree)
+
+    def run():
+        return {
+            'counts': None,
+            'artifacts': {
+                'Quantum_circuit_QFT': render_artifact(save_circuit, circuit)
+            }
+        }
+
+    return cached_run(
+        cache=cache,
+        key=result_key(circuit, 'draw'),
+        run=run
+    )
+
+
+# Shor algorithm (factoring)
+# ___________________________________________________________________________
+# Deterministic Miller-Rabin for every N below 3.3 * 10^24
+PRIME_BASES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37)
+
+
+def is_prime(number):
+    if number < 2:
+        return False
+    for base in PRIME_BASES:
+        if number % base == 0:
+            return number == base
+    d, s = number - 1, 0
+    while d % 2 == 0:
+        d, s = d // 2, s + 1
+    for base in PRIME_BASES:
+        x = pow(base, d, number)
+        if x in (1, number - 1):
+            continue
+        for _ in range(s - 1):
+            x = pow(x, 2, number)
+            if x == number - 1:
+                break
+        else:
+            return False
+    return True
+
+
+def perfect_power(number):
+    # (base, exponent) with base ** exponent == number and exponent >= 2, or None
+    for exponent in range(number.bit_length(), 1, -1):
+        base = round(number ** (1 / exponent))
+        for candidate in (base - 1, base, base + 1):
+            if candidate > 1 and candidate ** exponent == number:
+                return candidate, exponent
+    return None
+
+
+def classical_factor(number):
+    # Cases that never need the simulator: (factor, method) or (None, None).
+    # Raises ValueError for numbers there is nothing to factor in
+    if number < 4:
+        raise ValueError('Число должно быть не меньше 4')
+    if number % 2 == 0:
+        return 2, 'even'
+    if is_prime(number):
+        raise ValueError(f'{number} - простое число')
+    power = perfect_power(number)
+    if power is not None:
+        return power[0], 'perfect_power'
+    return None, None
+
+
+def controlled_multiplier(multiplier, number):
+    # |c>|y> -> |c>|multiplier^c * y mod number> for y < number, as a
+    # permutation matrix; qubit 0 of the gate is the control
+    num_work = number.bit_length()
+    size = 2 ** (num_work + 1)
+    targets = np.arange(size)
+    work = np.arange(number)
+    targets[1 + 2 * work] = 1 + 2 * (multiplier * work % number)
+    matrix = np.zeros((size, size))
+    matrix[targets, np.arange(size)] = 1
+    return UnitaryGate(matrix, label=f'x{multiplier} mod {number}')
+
+
+@lru_cache(maxsize=64)
+def order_finding_circuit(a, number):
+    # Phase estimation of y -> a*y mod N: 2n counting qubits, n work qubits.
+    # Cached per (a, N); callers must not modify the circuit
+    if gcd(a, number) != 1:
+        raise ValueError('a и N должны быть взаимно простыми')
+    num_work = number.bit_length()
+    num_counting = 2 * num_work
+    counting = QuantumRegister(num_counting, 'count')
+    work = QuantumRegister(num_work, 'work')
+    circuit = QuantumCircuit(counting, work, ClassicalRegister(num_counting, 'c'))
+    circuit.h(counting)
+    circuit.x(work[0])
+    for power in range(num_counting):
+        multiplier = pow(a, 2 ** power, number)
+        if multiplier != 1:
+            circuit.append(controlled_multiplier(multiplier, number), [counting[power], *work])
+    circuit.compose(build_qft(num_counting, inverse=True), counting, inplace=True)
+    circuit.measure(counting, circuit.clbits)
+    return circuit
+
+
+@lru_cache(maxsize=256)
+def order_finding_key(a, number, engine, shots):
+    # Hashing the unitaries of a cached circuit again on every request is wasted work
+    return result_key(order_finding_circuit(a, number), f'{engine}:qasm_simulator', shots=shots)
+
+
+def order_candidates(values, num_bits, number):
+    # Continued fractions of every measured value k / 2^num_bits at once:
+    # the denominator of the last convergent that is not above N
+    x = np.asarray(values, dtype=np.int64)
+    y = np.full_like(x, 2 ** num_bits)
+    q_previous = np.ones_like(x)
+    q = np.zeros_like(x)
+    denominators = np.ones_like(x)
+    active = y > 0
+    while active.any():
+        terms = x // np.where(y > 0, y, 1)
+        q_next = terms * q + q_previous
+        active &= q_next <= number
+        denominators = np.where(active & (q_next > 0), q_next, denominators)
+        q_previous, q = np.where(active, q, q_previous), np.where(active, q_next, q)
+        x, y = np.where(active, y, x), np.where(active, x - terms * y, y)
+        active &= y > 0
+    return denominators
+
+
+def find_order(a, number, counts, num_bits):
+    # counts: array indexed by measured value. A continued-fraction
+    # denominator d > 1 only proposes r = k * d for k up to log2(N) (the
+    # measured fraction may be s/r with s sharing a factor with r); anything
+    # further would be a classical search. The gcd of the proposals that
+    # satisfy a^r = 1 (mod N) is the order. Returns (order or None, share of
+    # shots whose own denominator gave that order)
+    values, weights = nonzero(counts)
+    denominators = order_candidates(values, num_bits, number)
+    unique, inverse = np.unique(denominators, return_inverse=True)
+    orders = np.zeros(unique.size, dtype=np.int64)
+    for index, denominator in enumerate(unique.tolist()):
+        if denominator <= 1:
+            continue
+        for multiple in range(1, number.bit_length() + 1):
+            if pow(a, denominator * multiple, number) == 1:
+                orders[index] = denominator * multiple
+                break
+    found = orders[inverse]
+    if not found.any():
+        return None, 0.0
+    order = int(np.gcd.reduce(found[found > 0]))
+    return order, float(weights[found == order].sum() / weights.sum())
+
+
+def factor(cache, number, a=None, attempts=5, shots=1024, engine=AER, max_number=None, seed=None):
+    if max_number is not None and number > max_number:
+        raise ValueError(f'Не больше {max_number}')
+    found, method = classical_factor(number)
+    if found is not None:
+        return _factoring(number, found, method, [])
+    if a is not None and not 2 <= a < number:
+        raise ValueError(f'a должно быть от 2 до {number - 1}')
+    generator = random.Random(seed)
+    candidates = generator.sample(range(2, number), min(attempts, number - 2))
+    if a is not None:
+        candidates = [a] + [candidate for candidate in candidates if candidate != a][:attempts - 1]
+    tries = []
+    entry = None
+    for a in candidates:
+        common = gcd(a, number)
+        if common > 1:
+            return _factoring(number, common, 'gcd', tries, a=a)
+        circuit = order_finding_circuit(a, number)
+
+        def run():
+            return {
+                'counts': run_counts(circuit, backend='qasm_simulator', shots=shots, engine=engine),
+                'registers': register_sizes(circuit),
+                'artifacts': {}
+            }
+
+        entry = cached_run(
+            cache=cache,
+            key=order_finding_key(a, number, engine, shots),
+            run=run
+        )
+        order, share = find_order(a, number, entry['counts'], number.bit_length() * 2)
+        tries.append({
+            'a': a,
+            'order': order,
+            'order_share': share,
+            'num_qubits': circuit.num_qubits
+        })
+        # An odd order, or a^(r/2) = -1 (mod N), only gives trivial factors
+        if order is None or order % 2 or pow(a, order // 2, number) == number - 1:
+            continue
+        half = pow(a, order // 2, number)
+        for candidate in (gcd(half - 1, number), gcd(half + 1, number)):
+            if 1 < candidate < number:
+                return _factoring(number, candidate, 'quantum', tries, a=a, entry=entry)
+    return _factoring(number, None, None, tries, entry=entry)
+
+
+def _factoring(number, found, method, tries, a=None, entry=None):
+    return {
+        'number': number,
+        'factors': sorted((found, number // found)) if found else None,
+        'method': method,
+        'a': a,
+        'attempts': tries,
+        'counts': entry['counts'] if entry else None,
+        'registers': entry['registers'] if entry else None,
+        'artifacts': {}
+    }
@@ -0,0 +1,187 @@
+from qiskit import QuantumCircuit
+
+from circuit import create_circuit
+from draw_circuit import draw
+from hadamard_gate import add_hadamard_gate
+from counts import register_sizes
+from histogram import create_histogram
+from result_cache import cached_run, result_key
+from simulation import AER, run_counts, run_samples
+
+
+# Simon algorithm
+def simon_oracle(b):
+    # f(x) = f(x xor b): copy x, then xor b in when the lowest set bit of b
+    # is 1 (same construction as qiskit_textbook.tools.simon_oracle)
+    n = len(b)
+    bits = b[::-1]
+    circuit = QuantumCircuit(n * 2)
+    for qubit in range(n):
+        circuit.cx(qubit, qubit + n)
+    if '1' not in bits:
+        return circuit
+    control = bits.find('1')
+    for qubit in range(n):
+        if bits[qubit] == '1':
+            circuit.cx(control, qubit + n)
+    return circuit
+
+
+def simon_function(b, x):
+    # The oracle evaluated classically on a basis state x (as an integer)
+    secret = int(b, 2)
+    if secret and x >> ((secret & -secret).bit_length() - 1) & 1:
+        return x ^ secret
+    return x
+
+
+def simon_circuit(b):
+    n = len(b)
+    circuit, quantum_register = create_circuit(
+        num_qubits=n*2,
+        num_bits=n
+    )
+    add_hadamard_gate(
+        circuit=circuit,
+        quantum_register=quantum_register,
+        vector_register=range(n)
+    )
+    circuit.barrier()
+    circuit = circuit.compose(simon_oracle(b))
+    circuit.barrier()
+    add_hadamard_gate(
+        circuit=circuit,
+        quantum_register=quantum_register,
+        vector_register=range(n)
+    )
+    circuit.measure(
+        range(n),
+        range(n)
+    )
+    return circuit
+
+
+def simon(cache, b='110', engine=AER):
+    circuit = simon_circuit(b)
+
+    def run():
+        circuit_image = draw(
+            circuit=circuit
+        )
+        counts = run_counts(
+            circuit,
+            backend='aer_simulator',
+            engine=engine
+        )
+        histogram_image = create_histogram(
+            counts=counts,
+            name="simon_algorithm_histogram",
+            registers=register_sizes(circuit)
+        )
+        return {
+            'counts': counts,
+            'registers': register_sizes(circuit),
+            'artifacts': {
+                'circuit': circuit_image,
+                'histogram': histogram_image
+            }
+        }
+
+    return cached_run(
+        cache=cache,
+        key=result_key(circuit, f'{engine}:aer_simulator', shots=1024),
+        run=run
+    )
+
+
+def bdotz(b, z):
+    return bin(int(b, 2) & int(z, 2)).count('1') % 2
+
+
+# Adaptive solver
+# ___________________________________________________________________________
+class GF2Basis:
+    # Incremental Gaussian elimination over GF(2) with every equation packed
+    # into an int: rows[p] is the row whose highest set bit is p
+
+    def __init__(self, num_bits):
+        self.num_bits = num_bits
+        self.rows = {}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def add(self, row):
+        # True if row is independent of the rows already in the basis
+        while row:
+            pivot = row.bit_length() - 1
+            if pivot not in self.rows:
+                self.rows[pivot] = row
+                return True
+            row ^= self.rows[pivot]
+        return False
+
+    def null_vector(self):
+        # With rank n - 1, the one non-zero x with row . x = 0 for every row
+        free = [bit for bit in range(self.num_bits) if bit not in self.rows]
+        if len(free) != 1:
+            raise ValueError('Нужно ровно n - 1 независимых уравнений')
+        x = 1 << free[0]
+        # Each row only has bits below its pivot besides the pivot itself
+        for pivot in sorted(self.rows):
+            if bin((self.rows[pivot] ^ (1 << pivot)) & x).count('1') % 2:
+                x |= 1 << pivot
+        return x
+
+
+def solve_simon(cache, b='110', engine=AER, batch_size=None, max_shots=None, seed=None):
+    # Samples the Simon circuit in batches until n - 1 independent equations
+    # z . b = 0 are known, then solves for b. Rank n means b = 0. Without
+    # batch_size every batch asks for the missing equations plus two (a
+    # random z is new with probability >= 1/2)
+    if not b or set(b) - {'0', '1'}:
+        raise ValueError('b задаётся строкой из 0 и 1')
+    n = len(b)
+    circuit = simon_circuit(b)
+    max_shots = max_shots or 16 * n + 64
+
+    def run():
+        basis = GF2Basis(n)
+        shots = 0
+        batches = 0
+        while len(basis) < n - 1 and shots < max_shots:
+            size = batch_size or n - 1 - len(basis) + 2
+            samples = run_samples(
+                circuit,
+                backend='aer_simulator',
+                shots=size,
+                seed=None if seed is None else seed + batches,
+                engine=engine
+            )
+            shots += size
+            batches += 1
+            for z in set(samples):
+                basis.add(z)
+        if len(basis) == n:
+            found = 0
+        elif len(basis) == n - 1:
+            found = basis.null_vector()
+            # Two classical queries tell b from 0 when rank n was not seen
+            if simon_function(b, 0) != simon_function(b, found):
+                found = 0
+        else:
+            found = None
+        return {
+            'counts': None,
+            'b': None if found is None else format(found, f'0{n}b'),
+            'equations': [format(row, f'0{n}b') for _, row in sorted(basis.rows.items(), reverse=True)],
+            'shots': shots,
+            'batches': batches,
+            'artifacts': {}
+        }
+
+    return cached_run(
+        cache=cache,
+        key=result_key(circuit, f'{engine}:adaptive:{batch_size}:{max_shots}', seed=seed),
+        run=run
+    )
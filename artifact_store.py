@@ -0,0 +1,107 @@
+import hashlib
+import os
+import re
+import tempfile
+import threading
+
+from disk_lru import TEMPORARY_PREFIX, atomic_write, evict_lru
+from render import render
+from result_cache import MEGABYTE
+
+
+# Images and drawings of algorithm runs, stored under the SHA-256 of their
+# content (<hash>.<extension>): identical outputs share one file, concurrent
+# runs never write to the same path, and every write is an atomic rename.
+ARTIFACT_ID = re.compile(r'^[0-9a-f]{64}\.(png|svg|txt)$')
+
+
+class ArtifactStore:
+    # Disk budget with LRU eviction (mtime is the last access time) and a TTL
+
+    def __init__(self, directory='results/artifacts', disk_budget=256 * MEGABYTE,
+                 ttl=7 * 24 * 3600):
+        self.directory = directory
+        self.disk_budget = disk_budget
+        self.ttl = ttl
+        self._lock = threading.Lock()
+
+    def path(self, artifact_id):
+        if not ARTIFACT_ID.match(artifact_id):
+            raise ValueError(artifact_id)
+        return os.path.join(self.directory, artifact_id)
+
+    def exists(self, artifact_id):
+        try:
+            os.utime(self.path(artifact_id))
+        except OSError:
+            return False
+        return True
+
+    def temporary_path(self, extension):
+        # A private path for a renderer to write to before put_file()
+        os.makedirs(self.directory, exist_ok=True)
+        # The real extension stays last: renderers pick the format from it
+        descriptor, path = tempfile.mkstemp(prefix=TEMPORARY_PREFIX, suffix=f'.{extension}', dir=self.directory)
+        os.close(descriptor)
+        return path
+
+    def put(self, content, extension):
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        artifact_id = f'{hashlib.sha256(content).hexdigest()}.{extension}'
+        if self.exists(artifact_id):
+            return artifact_id
+        os.makedirs(self.directory, exist_ok=True)
+        atomic_write(self.path(artifact_id), content)
+        self.evict()
+        return artifact_id
+
+    def put_file(self, path, extension):
+        # Takes ownership of `path` (a temporary_path() the caller wrote)
+        digest = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(MEGABYTE), b''):
+                digest.update(block)
+        artifact_id = f'{digest.hexdigest()}.{extension}'
+        if self.exists(artifact_id):
+            os.remove(path)
+            return artifact_id
+        return self._publish(path, artifact_id)
+
+    def _publish(self, temporary_path, artifact_id):
+        os.replace(temporary_path, self.path(artifact_id))
+        self.evict()
+        return artifact_id
+
+    def evict(self):
+        with self._lock:
+            evict_lru(self.directory, self.disk_budget, match=ARTIFACT_ID.match, ttl=self.ttl)
+
+
+# The store used by the draw/histogram helpers; create_app and the job
+# workers replace it with one built from the ARTIFACTS_* settings
+ARTIFACTS = ArtifactStore()
+
+
+def configure(**settings):
+    global ARTIFACTS
+    ARTIFACTS = ArtifactStore(**settings)
+
+
+def store_artifact(content, extension):
+    return ARTIFACTS.put(content, extension)
+
+
+def artifacts_exist(artifact_ids):
+    return all(ARTIFACTS.exists(artifact_id) for artifact_id in artifact_ids)
+
+
+def render_artifact(function, *args, extension='png', **kwargs):
+    # Runs render(function, ..., path) into a temporary file and stores it
+    path = ARTIFACTS.temporary_path(extension)
+    try:
+        render(function, *args, path, **kwargs)
+    except BaseException:
+        os.remove(path)
+        raise
+    return ARTIFACTS.put_file(path, extension)
@@ -0,0 +1,320 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+
+# Scaling sweeps over the circuit-building code of every algorithm route,
+# without Flask. Every point runs build -> transpile -> simulate -> render in
+# a child process and records wall time, peak RSS, depth and gate count per
+# stage; a sweep stops at the first point that fails, runs out of memory or
+# exceeds --max-seconds, and that size is reported as its limit.
+#
+#   python -m benchmarks.scaling                      # all sweeps
+#   python -m benchmarks.scaling -s grover -s simon --max-seconds 10
+#   python -m benchmarks.scaling --compare benchmarks/results/<old>.json
+#
+# Results are written to benchmarks/results/<commit>.json.
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+STAGES = ('build', 'transpile', 'simulate', 'render')
+
+# Stage time ratio above which --compare flags a regression
+REGRESSION_RATIO = 1.2
+
+
+def _secret(length):
+    return ''.join(random.choice('01') for _ in range(length - 1)) + '1'
+
+
+def build_bernstein_vazirani(secret_length):
+    from algorithms.bernstein_vazirani import bernstein_vazirani_circuit
+
+    return bernstein_vazirani_circuit(_secret(secret_length)), 'qasm_simulator', 1
+
+
+def build_simon(b_length):
+    from algorithms.simon import simon_circuit
+
+    return simon_circuit(_secret(b_length)), 'aer_simulator', 1024
+
+
+def build_qft(num_qubits):
+    from algorithms.qft import build_qft, logarithmic_approximation_degree
+
+    # As the circuit route draws it
+    circuit = build_qft(num_qubits, logarithmic_approximation_degree(num_qubits))
+    circuit.measure_all()
+    return circuit, 'qasm_simulator', 1024
+
+
+def build_grover(num_clauses, num_variables=6):
+    from algorithms.grover_oracle import Problem, build_grover
+
+    # Random 3-CNF with a planted solution, so there is always something to find
+    planted = [random.random() < 0.5 for _ in range(num_variables)]
+    clauses = []
+    for _ in range(num_clauses):
+        variables = random.sample(range(num_variables), 3)
+        literals = [(variable + 1) * random.choice((1, -1)) for variable in variables]
+        if not any((literal > 0) == planted[abs(literal) - 1] for literal in literals):
+            literals[0] = -literals[0]
+        clauses.append(literals)
+    circuit, _, _ = build_grover(Problem(num_variables, clauses=clauses))
+    return circuit, 'qasm_simulator', 1024
+
+
+def build_teleportation(shots):
+    from algorithms.quantum_teleportation import teleportation_circuits
+
+    # As the route runs it, with the Bell measurement deferred
+    _, measured_circuit = teleportation_circuits(deferred=True)
+    return measured_circuit, 'qasm_simulator', shots
+
+
+# name: (builder, swept parameter, default values). The sweeps reach the
+# limits create_app puts on the routes (BV_MAX_LENGTH, SIMON_MAX_LENGTH, ...)
+SWEEPS = {
+    'bernstein_vazirani': (
+        build_bernstein_vazirani, 'secret_length', (2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+    ),
+    'simon': (build_simon, 'b_length', (2, 3, 4, 6, 8, 12, 16, 32, 64, 128, 256)),
+    'qft': (build_qft, 'num_qubits', (2, 4, 6, 8, 10, 12, 14, 16, 20, 24, 28)),
+    'grover': (build_grover, 'num_clauses', (1, 2, 4, 8, 12, 16, 24, 32, 48)),
+    'teleportation': (build_teleportation, 'shots', (10 ** 2, 10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6)),
+}
+
+
+def _reset_peak_rss():
+    # Linux: writing 5 to clear_refs resets VmHWM, so every stage gets its own peak
+    try:
+        with open('/proc/self/clear_refs', 'w') as file:
+            file.write('5')
+    except OSError:
+        pass
+
+
+def _peak_rss():
+    try:
+        with open('/proc/self/status') as file:
+            for line in file:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def _measure(stages, name, function):
+    _reset_peak_rss()
+    start = time.perf_counter()
+    result = function()
+    stages[name] = {
+        'seconds': time.perf_counter() - start,
+        'peak_rss_bytes': _peak_rss()
+    }
+    return result
+
+
+def run_point(sweep, value, engine, directory):
+    import simulation
+    from circuit_ir import lower
+    from counts import counts_to_dict, register_sizes
+    from histogram import histogram_svg
+    from render import save_circuit
+    from transpile_cache import TranspileCache
+
+    # A private cache: transpile is measured as a miss, simulate reuses it
+    simulation.TRANSPILE_CACHE = TranspileCache(directory=os.path.join(directory, 'transpiled'))
+    builder = SWEEPS[sweep][0]
+    stages = {}
+
+    circuit, backend, shots = _measure(stages, 'build', lambda: builder(value))
+    # Builders may return a CircuitIR (bernstein_vazirani); transpiling needs
+    # the qiskit circuit
+    lowered = lower(circuit)
+    stages['build'].update(depth=lowered.depth(), gates=circuit.size())
+    # The simulator run_counts picks for this circuit, so simulate hits the
+    # transpile cache entry measured here
+    plan = simulation.plan_run(circuit, engine, shots=shots)
+    simulator = simulation.aer_backend(plan['method'], backend)
+    transpiled = _measure(
+        stages, 'transpile',
+        lambda: simulation.TRANSPILE_CACHE.transpile(lowered, simulator)
+    )
+    stages['transpile'].update(depth=transpiled.depth(), gates=transpiled.size())
+    counts = _measure(
+        stages, 'simulate',
+        lambda: simulation.run_counts(circuit, backend=backend, shots=shots, engine=engine)
+    )
+
+    def render():
+        save_circuit(circuit, os.path.join(directory, 'circuit.png'))
+        histogram_svg(counts_to_dict(counts, register_sizes(circuit)))
+
+    _measure(stages, 'render', render)
+    return {
+        'num_qubits': circuit.num_qubits,
+        'shots': shots,
+        'method': plan['method'],
+        'stages': stages
+    }
+
+
+def _child(connection, sweep, value, engine, seed):
+    random.seed(seed)
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            connection.send(('ok', run_point(sweep, value, engine, directory)))
+    except MemoryError:
+        connection.send(('out_of_memory', None))
+    except Exception as error:
+        connection.send(('failed', f'{type(error).__name__}: {error}'))
+
+
+def run_sweep(sweep, values, engine, max_seconds, seed):
+    # Each point runs in its own process so a crash, an OOM kill or a
+    # timeout ends that point only, and peak RSS is not inherited
+    context = multiprocessing.get_context('spawn')
+    points = []
+    limit = None
+    for value in values:
+        receiver, sender = context.Pipe(duplex=False)
+        process = context.Process(target=_child, args=(sender, sweep, value, engine, seed))
+        start = time.perf_counter()
+        process.start()
+        sender.close()
+        if receiver.poll(max_seconds):
+            try:
+                status, result = receiver.recv()
+            except EOFError:
+                status, result = 'crashed', None
+        else:
+            status, result = ('timeout' if process.is_alive() else 'crashed'), None
+        process.terminate()
+        process.join()
+        point = {
+            SWEEPS[sweep][1]: value,
+            'status': status,
+            'seconds': time.perf_counter() - start
+        }
+        if status == 'ok':
+            point.update(result)
+        elif status == 'crashed':
+            point['exitcode'] = process.exitcode
+        elif result:
+            point['error'] = result
+        points.append(point)
+        print(_format_point(sweep, point), flush=True)
+        if status != 'ok':
+            limit = value
+            break
+    return {
+        'parameter': SWEEPS[sweep][1],
+        'points': points,
+        'limit': limit
+    }
+
+
+def _format_point(sweep, point):
+    parameter = SWEEPS[sweep][1]
+    text = f'{sweep:20} {parameter}={point[parameter]:<8} {point["status"]:13}'
+    if point['status'] != 'ok':
+        return text
+    stages = ' '.join(
+        f'{name}={point["stages"][name]["seconds"]:.3f}s/{point["stages"][name]["peak_rss_bytes"] // 2 ** 20}MB'
+        for name in STAGES
+    )
+    return f'{text} qubits={point["num_qubits"]:<3} {stages}'
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(RESULTS_DIR)
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(old, new):
+    # Prints stage time ratios new/old for the points both runs have
+    for sweep, results in new['sweeps'].items():
+        if sweep not in old['sweeps']:
+            continue
+        parameter = results['parameter']
+        old_points = {point[parameter]: point for point in old['sweeps'][sweep]['points']}
+        for point in results['points']:
+            previous = old_points.get(point[parameter])
+            if previous is None or point['status'] != 'ok' or previous['status'] != 'ok':
+                continue
+            ratios = []
+            for name in STAGES:
+                before = previous['stages'][name]['seconds']
+                after = point['stages'][name]['seconds']
+                ratio = after / before if before else float('inf')
+                mark = ' !' if ratio > REGRESSION_RATIO else ''
+                ratios.append(f'{name}={ratio:.2f}x{mark}')
+            print(f'{sweep:20} {parameter}={point[parameter]:<8} {" ".join(ratios)}')
+        print(f'{sweep:20} limit {old["sweeps"][sweep]["limit"]} -> {results["limit"]}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Scaling benchmarks of the algorithm routes')
+    parser.add_argument('-s', '--sweep', action='append', choices=sorted(SWEEPS),
+                        help='sweeps to run (default: all)')
+    parser.add_argument('--engine', default='aer', choices=('aer', 'numpy'))
+    parser.add_argument('--max-seconds', type=float, default=60,
+                        help='a point that takes longer ends its sweep')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', help='JSON file (default: results/<commit>.json)')
+    parser.add_argument('--compare', metavar='OLD_JSON',
+                        help='compare the new results with an earlier run')
+    arguments = parser.parse_args(argv)
+
+    import qiskit
+    import qiskit_aer
+
+    report = {
+        'commit': _git_commit(),
+        'created': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'qiskit': qiskit.__version__,
+        'qiskit_aer': qiskit_aer.__version__,
+        'platform': platform.platform(),
+        'engine': arguments.engine,
+        'max_seconds': arguments.max_seconds,
+        'seed': arguments.seed,
+        'sweeps': {}
+    }
+    for sweep in arguments.sweep or SWEEPS:
+        report['sweeps'][sweep] = run_sweep(
+            sweep,
+            SWEEPS[sweep][2],
+            engine=arguments.engine,
+            max_seconds=arguments.max_seconds,
+            seed=arguments.seed
+        )
+    output = arguments.output or os.path.join(RESULTS_DIR, f'{report["commit"]}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f'written to {output}')
+    if arguments.compare:
+        with open(arguments.compare) as file:
+            compare(json.load(file), report)
+
+
+if __name__ == '__main__':
+    main()
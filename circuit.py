@@ -1,8 +1,17 @@
+import numpy as np
 from qiskit import QuantumCircuit, QuantumRegister, ClassicalRegister
 
+from circuit_ir import CircuitIR
+
 
 def create_circuit(num_qubits, num_bits):
     quantum_register = QuantumRegister(num_qubits)
     classical_register = ClassicalRegister(num_bits)
     circuit = QuantumCircuit(quantum_register, classical_register)
     return circuit, quantum_register
+
+
+def create_circuit_ir(num_qubits, num_bits):
+    # Same interface for the gate helpers: the "register" maps qubit
+    # positions to qubit indices, so quantum_register[[0, 2]] works on both
+    return CircuitIR(num_qubits, num_bits), np.arange(num_qubits)
@@ -0,0 +1,328 @@
+import hashlib
+import struct
+
+import numpy as np
+
+
+# Array-backed circuit: one row of a NumPy structured array per instruction
+# (opcode, two qubits, a clbit, three params) instead of one Python object
+# per gate. The gate methods mirror QuantumCircuit's and broadcast the same
+# way (ir.h([0, 1, 2]), ir.cx([0, 1], [2, 2])), but append all rows at once.
+# Hashing, serialization and diffing work on the raw bytes; qiskit is only
+# imported by to_qiskit(), when the circuit is actually run or drawn.
+OPCODES = (
+    'barrier', 'id', 'h', 'x', 'y', 'z', 's', 'sdg', 't', 'tdg', 'sx', 'sxdg',
+    'p', 'rx', 'ry', 'rz', 'u', 'cx', 'cz', 'cp', 'swap', 'measure',
+)
+OPCODE = {name: code for code, name in enumerate(OPCODES)}
+
+# Gate: (qubits, params)
+ARITY = {name: (1, 0) for name in OPCODES}
+ARITY.update({
+    'barrier': (0, 0),
+    'p': (1, 1), 'rx': (1, 1), 'ry': (1, 1), 'rz': (1, 1), 'u': (1, 3),
+    'cx': (2, 0), 'cz': (2, 0), 'cp': (2, 1), 'swap': (2, 0),
+})
+
+INSTRUCTION = np.dtype([
+    ('opcode', np.uint8),
+    ('qubits', np.int32, (2,)),
+    ('clbit', np.int32),
+    ('params', np.float64, (3,)),
+])
+
+# magic, format version, num_qubits, num_clbits, number of instructions
+HEADER = struct.Struct('<4sBIIQ')
+MAGIC = b'QPIR'
+FORMAT_VERSION = 1
+
+# Single-qubit phases of the diagonal gates, for apply()
+PHASES = {
+    'z': -1,
+    's': 1j,
+    'sdg': -1j,
+    't': np.exp(1j * np.pi / 4),
+    'tdg': np.exp(-1j * np.pi / 4),
+}
+
+
+class CircuitIR:
+
+    def __init__(self, num_qubits, num_clbits=0, capacity=16):
+        self.num_qubits = num_qubits
+        self.num_clbits = num_clbits
+        self._data = np.zeros(capacity, dtype=INSTRUCTION)
+        self._length = 0
+
+    def __len__(self):
+        return self._length
+
+    def __eq__(self, other):
+        if not isinstance(other, CircuitIR):
+            return NotImplemented
+        return self.to_bytes() == other.to_bytes()
+
+    @property
+    def data(self):
+        # Read-only view of the instructions
+        view = self._data[:self._length]
+        view.flags.writeable = False
+        return view
+
+    def copy(self):
+        circuit = CircuitIR(self.num_qubits, self.num_clbits, capacity=max(self._length, 16))
+        circuit._data[:self._length] = self._data[:self._length]
+        circuit._length = self._length
+        return circuit
+
+    def size(self):
+        # Gates, as QuantumCircuit.size() counts them (barriers excluded)
+        return int(np.count_nonzero(self.data['opcode'] != OPCODE['barrier']))
+
+    def count_ops(self):
+        codes, counts = np.unique(self.data['opcode'], return_counts=True)
+        return {OPCODES[code]: int(count) for code, count in zip(codes, counts)}
+
+    def _reserve(self, extra):
+        needed = self._length + extra
+        if needed > len(self._data):
+            data = np.zeros(max(needed, 2 * len(self._data)), dtype=INSTRUCTION)
+            data[:self._length] = self._data[:self._length]
+            self._data = data
+
+    def append(self, name, qubits=(), params=(), clbits=None):
+        # qubits: one array per qubit argument, params: one per parameter;
+        # scalars and arrays broadcast against each other, one row per element
+        if name not in OPCODE:
+            raise ValueError(f'Неизвестная операция: {name}')
+        num_qubits, num_params = ARITY[name]
+        if len(qubits) != num_qubits or len(params) != num_params:
+            raise ValueError(f'{name}: ожидается {num_qubits} кубит(а) и {num_params} параметр(а)')
+        arguments = [np.asarray(qubit, dtype=np.int64) for qubit in qubits]
+        if clbits is not None:
+            arguments.append(np.asarray(clbits, dtype=np.int64))
+        arguments += [np.asarray(param, dtype=np.float64) for param in params]
+        columns = [np.ravel(column) for column in np.broadcast_arrays(*arguments)] if arguments else []
+        count = columns[0].size if columns else 1
+        for column in columns[:num_qubits]:
+            if count and (column.min() < 0 or column.max() >= self.num_qubits):
+                raise ValueError(f'Номер кубита вне диапазона 0..{self.num_qubits - 1}')
+        if clbits is not None and count:
+            clbit_column = columns[num_qubits]
+            if clbit_column.min() < 0 or clbit_column.max() >= self.num_clbits:
+                raise ValueError(f'Номер бита вне диапазона 0..{self.num_clbits - 1}')
+        self._reserve(count)
+        rows = self._data[self._length:self._length + count]
+        rows['opcode'] = OPCODE[name]
+        rows['qubits'] = -1
+        rows['clbit'] = -1
+        rows['params'] = 0
+        for position, column in enumerate(columns[:num_qubits]):
+            rows['qubits'][:, position] = column
+        if clbits is not None:
+            rows['clbit'] = columns[num_qubits]
+        for position, column in enumerate(columns[len(columns) - num_params:] if num_params else []):
+            rows['params'][:, position] = column
+        self._length += count
+        return self
+
+    # QuantumCircuit-style gate methods
+    def barrier(self):
+        return self.append('barrier')
+
+    def id(self, qubits):
+        return self.append('id', (qubits,))
+
+    def h(self, qubits):
+        return self.append('h', (qubits,))
+
+    def x(self, qubits):
+        return self.append('x', (qubits,))
+
+    def y(self, qubits):
+        return self.append('y', (qubits,))
+
+    def z(self, qubits):
+        return self.append('z', (qubits,))
+
+    def s(self, qubits):
+        return self.append('s', (qubits,))
+
+    def sdg(self, qubits):
+        return self.append('sdg', (qubits,))
+
+    def t(self, qubits):
+        return self.append('t', (qubits,))
+
+    def tdg(self, qubits):
+        return self.append('tdg', (qubits,))
+
+    def sx(self, qubits):
+        return self.append('sx', (qubits,))
+
+    def sxdg(self, qubits):
+        return self.append('sxdg', (qubits,))
+
+    def p(self, theta, qubits):
+        return self.append('p', (qubits,), (theta,))
+
+    def rx(self, theta, qubits):
+        return self.append('rx', (qubits,), (theta,))
+
+    def ry(self, theta, qubits):
+        return self.append('ry', (qubits,), (theta,))
+
+    def rz(self, phi, qubits):
+        return self.append('rz', (qubits,), (phi,))
+
+    def u(self, theta, phi, lam, qubits):
+        return self.append('u', (qubits,), (theta, phi, lam))
+
+    def cx(self, control_qubits, target_qubits):
+        return self.append('cx', (control_qubits, target_qubits))
+
+    def cz(self, control_qubits, target_qubits):
+        return self.append('cz', (control_qubits, target_qubits))
+
+    def cp(self, theta, control_qubits, target_qubits):
+        return self.append('cp', (control_qubits, target_qubits), (theta,))
+
+    def swap(self, qubits_a, qubits_b):
+        return self.append('swap', (qubits_a, qubits_b))
+
+    def measure(self, qubits, clbits):
+        return self.append('measure', (qubits,), clbits=clbits)
+
+    def measure_all(self):
+        # Unlike QuantumCircuit.measure_all there is no new register: the
+        # circuit needs num_clbits >= num_qubits
+        self.barrier()
+        return self.measure(np.arange(self.num_qubits), np.arange(self.num_qubits))
+
+    # Hashing, serialization and diffing
+    def _header(self):
+        return HEADER.pack(MAGIC, FORMAT_VERSION, self.num_qubits, self.num_clbits, self._length)
+
+    def to_bytes(self):
+        return self._header() + self._data[:self._length].tobytes()
+
+    @classmethod
+    def from_bytes(cls, payload):
+        magic, version, num_qubits, num_clbits, length = HEADER.unpack_from(payload)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError('Неизвестный формат схемы')
+        data = np.frombuffer(payload, dtype=INSTRUCTION, count=length, offset=HEADER.size)
+        circuit = cls(num_qubits, num_clbits, capacity=max(length, 16))
+        circuit._data[:length] = data
+        circuit._length = length
+        return circuit
+
+    def digest(self):
+        return hashlib.sha256(self.to_bytes()).hexdigest()
+
+    def diff(self, other):
+        # Positions of the instructions that differ, compared row by row;
+        # rows past the end of the shorter circuit all count as different
+        common = min(self._length, other._length)
+        row = np.dtype((np.void, INSTRUCTION.itemsize))
+        changed = np.flatnonzero(
+            self._data[:common].view(row) != other._data[:common].view(row)
+        )
+        return np.concatenate([changed, np.arange(common, max(self._length, other._length))])
+
+    # Lowering
+    def to_qiskit(self, name=None, parameters=None):
+        # parameters: {instruction position: qiskit parameter expression} that
+        # replaces the first param of that instruction, for templates whose
+        # parameters are bound later (Aer parameter_binds)
+        from qiskit import ClassicalRegister, QuantumCircuit, QuantumRegister
+
+        quantum_register = QuantumRegister(self.num_qubits, 'q')
+        registers = [quantum_register]
+        if self.num_clbits:
+            registers.append(ClassicalRegister(self.num_clbits, 'c'))
+        circuit = QuantumCircuit(*registers, name=name)
+        data = self.data
+        parameters = parameters or {}
+        for position, (code, qubits, clbit, params) in enumerate(zip(
+            data['opcode'].tolist(), data['qubits'].tolist(),
+            data['clbit'].tolist(), data['params'].tolist()
+        )):
+            operation = OPCODES[code]
+            num_qubits, num_params = ARITY[operation]
+            if position in parameters:
+                params[0] = parameters[position]
+            if operation == 'barrier':
+                circuit.barrier()
+            elif operation == 'measure':
+                circuit.measure(qubits[0], clbit)
+            else:
+                getattr(circuit, operation)(*params[:num_params], *qubits[:num_qubits])
+        return circuit
+
+    def apply(self, engine):
+        # Runs the gates on a statevector_engine.StatevectorEngine without
+        # building qiskit objects; measurements and barriers are skipped
+        data = self.data
+        for code, (first, second), params in zip(
+            data['opcode'].tolist(), data['qubits'].tolist(), data['params'].tolist()
+        ):
+            operation = OPCODES[code]
+            if operation in ('barrier', 'id', 'measure'):
+                continue
+            if operation == 'h':
+                engine.h(first)
+            elif operation == 'x':
+                engine.x(first)
+            elif operation == 'y':
+                engine.y(first)
+            elif operation in PHASES:
+                engine.phase(first, PHASES[operation])
+            elif operation == 'p':
+                engine.phase(first, np.exp(1j * params[0]))
+            elif operation == 'cx':
+                engine.x(second, {first: 1})
+            elif operation == 'cz':
+                engine.phase(second, -1, {first: 1})
+            elif operation == 'cp':
+                engine.phase(second, np.exp(1j * params[0]), {first: 1})
+            elif operation == 'swap':
+                engine.x(second, {first: 1})
+                engine.x(first, {second: 1})
+                engine.x(second, {first: 1})
+            else:
+                engine.unitary([first], single_qubit_matrix(operation, params))
+        return engine
+
+
+def single_qubit_matrix(operation, params):
+    theta, phi, lam = params
+    if operation == 'sx':
+        return np.array([[1 + 1j, 1 - 1j], [1 - 1j, 1 + 1j]]) / 2
+    if operation == 'sxdg':
+        return np.array([[1 - 1j, 1 + 1j], [1 + 1j, 1 - 1j]]) / 2
+    if operation == 'rx':
+        return np.array([
+            [np.cos(theta / 2), -1j * np.sin(theta / 2)],
+            [-1j * np.sin(theta / 2), np.cos(theta / 2)]
+        ])
+    if operation == 'ry':
+        return np.array([
+            [np.cos(theta / 2), -np.sin(theta / 2)],
+            [np.sin(theta / 2), np.cos(theta / 2)]
+        ], dtype=np.complex128)
+    if operation == 'rz':
+        return np.diag([np.exp(-0.5j * theta), np.exp(0.5j * theta)])
+    if operation == 'u':
+        return np.array([
+            [np.cos(theta / 2), -np.exp(1j * lam) * np.sin(theta / 2)],
+            [np.exp(1j * phi) * np.sin(theta / 2), np.exp(1j * (phi + lam)) * np.cos(theta / 2)]
+        ])
+    raise ValueError(f'Неизвестная операция: {operation}')
+
+
+def lower(circuit):
+    # QuantumCircuit for anything that needs one; other circuits pass through
+    if isinstance(circuit, CircuitIR):
+        return circuit.to_qiskit()
+    return circuit
@@ -1,8 +1,13 @@
+import numpy as np
+
+
 def add_controlledX_gate(circuit, quantum_register, vector_register):
-    register_a=vector_register[0]
-    register_b=vector_register[1]
-    circuit.cx(
-        quantum_register[register_a],
-        quantum_register[register_b]
-    )
-    return circuit
\ No newline at end of file
+    # vector_register: a [control, target] pair or a list of pairs,
+    # applied in order by one broadcast cx call
+    pairs = np.reshape(vector_register, (-1, 2)).tolist()
+    if pairs:
+        circuit.cx(
+            quantum_register[[register_a for register_a, _ in pairs]],
+            quantum_register[[register_b for _, register_b in pairs]]
+        )
+    return circuit
@@ -0,0 +1,85 @@
+import numpy as np
+
+
+# Counts are kept as int64 arrays indexed by the integer value of the
+# classical register (bit i = clbit i). The Result.get_counts() dict shape
+# is only produced at the edges: histograms, printing and JSON.
+
+# Wider registers get SparseCounts instead (2^24 int64 counts are already
+# 128 MiB, and at most one entry per shot is ever non-zero)
+DENSE_MAX_CLBITS = 24
+
+
+class SparseCounts:
+    # The outcomes that occurred, as sorted register values and their counts
+
+    def __init__(self, counts, num_clbits):
+        # counts: {register value: count}
+        values = sorted(counts)
+        # Python ints once the values no longer fit an int64
+        self.values = np.array(values, dtype=np.int64 if num_clbits < 63 else object)
+        self.counts = np.array([counts[value] for value in values], dtype=np.int64)
+        self.num_clbits = num_clbits
+
+    def __len__(self):
+        return len(self.values)
+
+
+def nonzero(counts):
+    # (values, counts) of the outcomes that occurred, for either representation
+    if isinstance(counts, SparseCounts):
+        return counts.values, counts.counts
+    values = np.flatnonzero(counts)
+    return values, counts[values]
+
+
+def from_values(values, num_clbits):
+    # Counts of per-shot register values (Python ints, any width)
+    if num_clbits > DENSE_MAX_CLBITS:
+        totals = {}
+        for value in values:
+            totals[value] = totals.get(value, 0) + 1
+        return SparseCounts(totals, num_clbits)
+    return np.bincount(np.asarray(values, dtype=np.int64), minlength=2 ** num_clbits)
+
+
+def register_sizes(circuit):
+    # A CircuitIR has no registers: all clbits are one register
+    return [register.size for register in getattr(circuit, 'cregs', ())] or [circuit.num_clbits]
+
+
+def sample(probabilities, shots, seed=None):
+    rng = np.random.default_rng(seed)
+    return rng.multinomial(shots, probabilities / probabilities.sum())
+
+
+def counts_from_dict(counts, num_clbits):
+    if num_clbits > DENSE_MAX_CLBITS:
+        totals = {}
+        for key, value in counts.items():
+            outcome = int(key.replace(' ', ''), 2)
+            totals[outcome] = totals.get(outcome, 0) + value
+        return SparseCounts(totals, num_clbits)
+    array = np.zeros(2 ** num_clbits, dtype=np.int64)
+    for key, value in counts.items():
+        array[int(key.replace(' ', ''), 2)] += value
+    return array
+
+
+def format_outcome(value, registers):
+    # Same key layout as Result.get_counts(): one space between registers
+    bits = format(value, f'0{sum(registers)}b')
+    chunks = []
+    end = len(bits)
+    for size in registers:
+        chunks.append(bits[end - size:end])
+        end -= size
+    return ' '.join(reversed(chunks))
+
+
+def counts_to_dict(counts, registers):
+    values, weights = nonzero(counts)
+    return {
+        format_outcome(int(value), registers): int(weight)
+        for value, weight in zip(values.tolist(), weights.tolist())
+    }
@@ -0,0 +1,61 @@
+import os
+import tempfile
+import time
+
+
+# Every writer goes through a file with this prefix in the target directory
+TEMPORARY_PREFIX = '.tmp-'
+# Temporary files older than this were left by a writer that died
+STALE_TEMPORARY = 3600
+
+
+def atomic_write(path, payload):
+    # Readers see the old file or the new one, never a partial write
+    directory = os.path.dirname(path) or '.'
+    descriptor, temporary_path = tempfile.mkstemp(prefix=TEMPORARY_PREFIX, dir=directory)
+    try:
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(payload)
+        os.replace(temporary_path, path)
+    except BaseException:
+        remove(temporary_path)
+        raise
+
+
+def evict_lru(directory, max_bytes, match=None, ttl=None):
+    # Deletes the least recently used files (mtime is the last access time)
+    # until the ones accepted by match(name) fit in max_bytes, and with a ttl
+    # every one of them not accessed for that many seconds
+    files = []
+    total = 0
+    now = time.time()
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        if name.startswith(TEMPORARY_PREFIX):
+            if now - stat.st_mtime > STALE_TEMPORARY:
+                remove(path)
+            continue
+        if match is not None and not match(name):
+            continue
+        if ttl and now - stat.st_mtime > ttl:
+            remove(path)
+            continue
+        files.append((stat.st_mtime, stat.st_size, path))
+        total += stat.st_size
+    files.sort()
+    for _, size, path in files:
+        if total <= max_bytes:
+            break
+        remove(path)
+        total -= size
+
+
+def remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
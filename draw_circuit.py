@@ -1,22 +1,14 @@
-import matplotlib.pyplot as plot
+import metrics
+from artifact_store import render_artifact
+from render import save_circuit
 
 
-def draw(circuit, filename):
-    circuit.draw(
-        # mpl - > images with color rendered purely in Python using matplotlib.
-        output='mpl',
-        interactive= True
-    )
-    plot.savefig(
-        f'results/quantum_circuits/{filename}.png'
-    )
-
-def draw_sudoku_example(circuit, filename):
-    circuit.draw(
-        # mpl - > images with color rendered purely in Python using matplotlib.
-        output='mpl',
-        interactive= True
-    )
-    plot.savefig(
-        f'results/examples/grover_algorithm/quantum_circuits/{filename}.png'
-    )
\ No newline at end of file
+# Returns the artifact id of the drawing, named by its content
+def draw(circuit, output='png'):
+    # output: 'png', 'svg' or 'txt' (text drawing, no matplotlib at all)
+    with metrics.stage('draw_circuit'):
+        return render_artifact(
+            save_circuit,
+            circuit,
+            extension=output
+        )
@@ -1,6 +1,8 @@
 def add_hadamard_gate(circuit, quantum_register, vector_register):
-    for register in vector_register:
+    # One broadcast h call for all the qubits (a single bulk append on a CircuitIR)
+    qubits = list(vector_register)
+    if qubits:
         circuit.h(
-            quantum_register[register]
+            quantum_register[qubits]
         )
-    return circuit
\ No newline at end of file
+    return circuit
@@ -1,26 +1,129 @@
-from qiskit.tools.visualization import plot_histogram
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from xml.sax.saxutils import escape
 
+import numpy as np
+
+import metrics
+from artifact_store import render_artifact, store_artifact
+from counts import SparseCounts, counts_to_dict
+from render import save_histogram
+
+
+# Histograms are hand-built SVG by default; output='png' still goes through
+# matplotlib (render.save_histogram) when a raster image is really needed.
+# Both are kept in the artifact store.
+SVG_CACHE_SIZE = 256
+
+# Wider histograms keep the most frequent outcomes and sum the rest
+MAX_BARS = 64
+
+_svg_cache = OrderedDict()
+_svg_lock = threading.Lock()
+
+
+def as_counts_dict(counts, registers=None):
+    # Simulation returns counts as arrays; histograms are drawn from get_counts()-style dicts
+    if isinstance(counts, SparseCounts):
+        return counts_to_dict(counts, registers or [counts.num_clbits])
+    if not isinstance(counts, np.ndarray):
+        return counts
+    if registers is None:
+        registers = [int(np.log2(counts.size))]
+    return counts_to_dict(counts, registers)
+
+
+def counts_hash(counts):
+    return hashlib.sha256(
+        json.dumps(counts, sort_keys=True, separators=(',', ':')).encode()
+    ).hexdigest()
+
+
+def _bars(counts):
+    outcomes = sorted(counts)
+    if len(outcomes) > MAX_BARS:
+        kept = sorted(sorted(counts, key=counts.get, reverse=True)[:MAX_BARS - 1])
+        other = sum(counts.values()) - sum(counts[outcome] for outcome in kept)
+        return [(outcome, counts[outcome]) for outcome in kept] + [('other', other)]
+    return [(outcome, counts[outcome]) for outcome in outcomes]
+
+
+def _build_svg(counts, title, color):
+    bars = _bars(counts)
+    total = sum(value for _, value in bars) or 1
+    label_height = 8 * max((len(outcome) for outcome, _ in bars), default=1) + 10
+    left, top, plot_height, step = 50, 40, 300, 48
+    width = left + step * len(bars) + 20
+    height = top + plot_height + label_height
+    scale = max((value for _, value in bars), default=1) / total * 1.1 or 1
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}" font-family="sans-serif" font-size="12">',
+        f'<text x="{width / 2:.0f}" y="20" text-anchor="middle" font-size="14">{escape(title)}</text>',
+    ]
+    for tick in range(5):
+        probability = scale * tick / 4
+        y = top + plot_height * (1 - tick / 4)
+        parts.append(
+            f'<line x1="{left}" x2="{width - 10}" y1="{y:.1f}" y2="{y:.1f}" '
+            f'stroke="#ccc" stroke-dasharray="4 3"/>'
+            f'<text x="{left - 6}" y="{y + 4:.1f}" text-anchor="end">{probability:.2f}</text>'
+        )
+    for index, (outcome, value) in enumerate(bars):
+        probability = value / total
+        bar_height = plot_height * probability / scale
+        x = left + step * index + 6
+        y = top + plot_height - bar_height
+        center = x + 18
+        label_y = top + plot_height + 10
+        parts.append(
+            f'<rect x="{x}" y="{y:.1f}" width="36" height="{bar_height:.1f}" fill="{color}">'
+            f'<title>{escape(outcome)}: {value}</title></rect>'
+            f'<text x="{center}" y="{y - 4:.1f}" text-anchor="middle">{probability:.3f}</text>'
+            f'<text x="{center}" y="{label_y}" text-anchor="end" '
+            f'transform="rotate(-70 {center} {label_y})">{escape(outcome)}</text>'
+        )
+    parts.append('</svg>')
+    return ''.join(parts)
+
+
+def histogram_svg(counts, title='', color='crimson'):
+    key = (counts_hash(counts), title, color)
+    with _svg_lock:
+        svg = _svg_cache.get(key)
+        if svg is not None:
+            _svg_cache.move_to_end(key)
+            return svg
+    svg = _build_svg(counts, title, color)
+    with _svg_lock:
+        _svg_cache[key] = svg
+        while len(_svg_cache) > SVG_CACHE_SIZE:
+            _svg_cache.popitem(last=False)
+    return svg
+
+
+def _save(counts, title, output):
+    with metrics.stage('histogram'):
+        if output == 'svg':
+            return store_artifact(histogram_svg(counts, title=title), 'svg')
+        return render_artifact(
+            save_histogram,
+            counts,
+            extension=output,
+            title=title,
+            legend='Execution',
+            color='crimson',
+            # x and y [inches]
+            figsize=(25, 10)
+        )
 
-def create_histogram(counts, name):
-    legend = ['Execution']
-    plot_histogram(
-        counts,
-        legend=legend,
-        color=['crimson','midnightblue'],
-        # x and y [inches]
-        figsize = (25, 10),
-        title=f" -- {name} -- ",
-        filename=f"results/histograms/{name}.png"
-    )
 
-def create_sudoku_histogram(counts, name):
-    legend = ['Execution']
-    plot_histogram(
-        counts,
-        legend=legend,
-        color=['crimson','midnightblue'],
-        # x and y [inches]
-        figsize = (25, 10),
+# Returns the artifact id of the histogram
+def create_histogram(counts, name, registers=None, output='svg'):
+    return _save(
+        as_counts_dict(counts, registers),
         title=f" -- {name} -- ",
-        filename=f"results/examples/grover_algorithm/histograms/{name}.png"
+        output=output
     )
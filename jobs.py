@@ -0,0 +1,212 @@
+import atexit
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+
+import artifact_store
+import resource_governor
+import simulation
+from algorithms import PLUGINS, run_algorithm
+from counts import counts_to_dict
+from result_cache import ResultCache
+from transpile_cache import TranspileCache
+
+
+QUEUED = 'queued'
+RUNNING = 'running'
+FINISHED = 'finished'
+FAILED = 'failed'
+TIMEOUT = 'timeout'
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class JobTimeout(Exception):
+    pass
+
+
+# WORKER PROCESS
+# ___________________________________________________________________________
+_worker_cache = None
+_worker_starts = None
+
+
+def _init_worker(cache_settings, transpile_settings, artifact_settings, governor_settings, starts):
+    global _worker_cache, _worker_starts
+    _worker_cache = ResultCache(**cache_settings)
+    _worker_starts = starts
+    artifact_store.configure(**artifact_settings)
+    resource_governor.configure(**governor_settings)
+    simulation.TRANSPILE_CACHE = TranspileCache(**transpile_settings)
+
+
+def _raise_timeout(signum, frame):
+    raise JobTimeout()
+
+
+def _run_job(job_id, name, kwargs, timeout):
+    # The pool marks a future running before a worker takes it, so the
+    # worker reports when the job really starts
+    _worker_starts.put((job_id, time.time()))
+    # SIGALRM interrupts the job inside the worker; the pool process survives
+    signal.signal(signal.SIGALRM, _raise_timeout)
+    signal.alarm(timeout)
+    try:
+        entry = run_algorithm(name, cache=_worker_cache, **kwargs)
+    finally:
+        signal.alarm(0)
+    counts = entry.get('counts')
+    if counts is not None:
+        counts = counts_to_dict(counts, entry['registers'])
+    # Plugin-specific fields (factors, iterations, ...) are passed through
+    details = {
+        key: value for key, value in entry.items()
+        if key not in ('counts', 'registers', 'statevector', 'artifacts')
+    }
+    return {
+        **details,
+        'counts': counts,
+        'artifacts': entry.get('artifacts', {})
+    }
+
+
+# JOB MANAGER (WEB PROCESS)
+# ___________________________________________________________________________
+class Job:
+    def __init__(self, job_id, algorithm, kwargs, future):
+        self.id = job_id
+        self.algorithm = algorithm
+        self.kwargs = kwargs
+        self.future = future
+        self.submitted = time.time()
+        # Reported by the worker when it takes the job
+        self.started = None
+        self.timed_out = False
+
+
+class JobManager:
+    def __init__(self, max_workers=None, max_queue=32, timeout=120,
+                 max_history=1024, cache_settings=None, transpile_settings=None,
+                 artifact_settings=None, governor_settings=None):
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 2) - 1)
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.max_history = max_history
+        self.cache_settings = cache_settings or {}
+        self.transpile_settings = transpile_settings or {}
+        self.artifact_settings = artifact_settings or {}
+        self.governor_settings = governor_settings or {}
+        self._executor = None
+        self._starts = None
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        if self._executor is None:
+            # spawn: forking a threaded web worker is not safe
+            context = multiprocessing.get_context('spawn')
+            self._starts = context.Queue()
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(
+                    self.cache_settings, self.transpile_settings,
+                    self.artifact_settings, self.governor_settings, self._starts
+                )
+            )
+            atexit.register(self.shutdown)
+        return self._executor
+
+    def submit(self, algorithm, **kwargs):
+        if algorithm not in PLUGINS:
+            raise KeyError(algorithm)
+        with self._lock:
+            if self._active_jobs() >= self.max_queue:
+                raise JobQueueFull()
+            job_id = uuid.uuid4().hex
+            future = self._get_executor().submit(
+                _run_job, job_id, algorithm, kwargs, self.timeout
+            )
+            job = Job(job_id, algorithm, kwargs, future)
+            self._jobs[job.id] = job
+            self._forget_old_jobs()
+        return job.id
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def status(self, job):
+        future = job.future
+        if job.timed_out:
+            return TIMEOUT
+        if future.done():
+            if future.cancelled():
+                return FAILED
+            exception = future.exception()
+            if isinstance(exception, JobTimeout):
+                return TIMEOUT
+            return FAILED if exception is not None else FINISHED
+        # Backstop for jobs stuck in native code where SIGALRM is not delivered,
+        # counted from the start of the run, not from submission
+        self._collect_starts()
+        if job.started is None:
+            return QUEUED
+        if time.time() - job.started > self.timeout * 2:
+            job.timed_out = True
+            return TIMEOUT
+        return RUNNING
+
+    def describe(self, job):
+        status = self.status(job)
+        description = {
+            'job_id': job.id,
+            'algorithm': job.algorithm,
+            'status': status,
+            'elapsed': round(time.time() - job.submitted, 3)
+        }
+        if status == FAILED:
+            try:
+                description['error'] = repr(job.future.exception())
+            except CancelledError:
+                description['error'] = 'cancelled'
+        return description
+
+    def result(self, job):
+        return job.future.result(timeout=0)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _active_jobs(self):
+        # A timed-out job still holds its worker until the worker exits
+        return sum(1 for job in self._jobs.values() if not job.future.done())
+
+    def _collect_starts(self):
+        # (job id, start time) messages from the workers
+        while self._starts is not None:
+            try:
+                job_id, started = self._starts.get_nowait()
+            except queue.Empty:
+                return
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.started = started
+
+    def _forget_old_jobs(self):
+        for job_id in list(self._jobs):
+            if len(self._jobs) <= self.max_history:
+                break
+            if self._jobs[job_id].future.done():
+                del self._jobs[job_id]
@@ -1,52 +1,51 @@
+import gzip
+import hmac
+import math
+import mimetypes
 import os
+import shutil
 import warnings
-import webbrowser
 from datetime import datetime
 from random import randrange
 
-import matplotlib.pyplot as plot
-import numpy as np
-from flask import Flask, abort, redirect, render_template, request, url_for
+import click
+from flask import (Blueprint, Flask, Response, abort, current_app, jsonify,
+                   redirect, render_template, request, send_from_directory,
+                   stream_with_context, url_for)
 from flask_sqlalchemy import SQLAlchemy
 from flask_wtf import FlaskForm
-from IPython.display import display
-from qiskit import (Aer, ClassicalRegister, QuantumCircuit, QuantumRegister,
-                    execute, transpile)
-from qiskit.circuit.library import QFT
-from qiskit.quantum_info import Statevector
-from qiskit.visualization import array_to_latex, plot_bloch_multivector
-from qiskit_textbook.tools import simon_oracle
+from werkzeug.utils import safe_join
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
 from wtforms import StringField, SubmitField, TextAreaField, URLField
 from wtforms.validators import DataRequired, Length, Optional
 
 warnings.filterwarnings('ignore')
 
-from circuit import create_circuit
-from cnot_gate import add_controlledX_gate
-from draw_circuit import draw, draw_sudoku_example
-from hadamard_gate import add_hadamard_gate
-from histogram import create_histogram, create_sudoku_histogram
-from pauli_gate import add_x_gate, add_z_gate
+import algorithms
+import artifact_store
+import metrics
+import render
+import resource_governor
+import simulation
+from counts import counts_to_dict
+from histogram import counts_hash, histogram_svg
+from jobs import FAILED, FINISHED, TIMEOUT, JobManager, JobQueueFull
+from opinion_index import OpinionIndex
+from opinion_io import export_jsonl, hash_text, import_jsonl, migrate_text_hash
+from opinion_search import (create_search_index, decode_cursor, encode_cursor,
+                            match_query)
+from result_cache import MEGABYTE, ResultCache
+from transpile_cache import TranspileCache
 
 
-# CONFIGURATION APP
-# ___________________________________________________________________________
-app = Flask(__name__)
-
-# Подключается БД SQLite
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///db.sqlite3'
-
-# Задаётся конкретное значение для конфигурационного ключа
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-# Всесто MY SECRET KEY придумайте и впишите свой ключ
-app.config['SECRET_KEY'] = 'SECRET_KEY'
+# В ORM передаётся в качестве параметра экземпляр приложения Flask (init_app)
+db = SQLAlchemy()
 
-# В ORM передаётся в качестве параметра экземпляр приложения Flask
-db = SQLAlchemy(app)
+views = Blueprint('views', __name__)
 
-FORMAT_TIME = '%Y-%m-%d-Time-%H-%M-%S' 
-NOW_TIME = datetime.strftime(datetime.now(), FORMAT_TIME) 
+# Precompressed document variants, in order of preference
+DOCUMENT_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
 
 
 # MODELS
@@ -62,18 +61,34 @@ class Opinion(db.Model):
     )
     text = db.Column(
         db.Text,
-        unique=True,
         nullable=False
     )
+    # Duplicates are detected on this fixed-width hash, not on the full text
+    text_hash = db.Column(
+        db.String(64),
+        unique=True,
+        nullable=False,
+        default=lambda context: hash_text(context.get_current_parameters()['text'])
+    )
     source = db.Column(
         db.String(256)
     )
     timestamp = db.Column(
         db.DateTime,
-        index=True,
         default=datetime.utcnow
     )
 
+    # Keyset pagination walks this index newest first
+    __table_args__ = (
+        db.Index('ix_opinion_timestamp_id', 'timestamp', 'id'),
+    )
+
+
+@event.listens_for(Opinion.__table__, 'after_create')
+def create_opinion_search_index(target, connection, **kwargs):
+    if connection.dialect.name == 'sqlite':
+        create_search_index(connection)
+
 
 # FORMS
 # ___________________________________________________________________________
@@ -103,14 +118,54 @@ class OpinionForm(FlaskForm):
 
 # FUNCTIONS and VIEWS
 # ___________________________________________________________________________
-@app.route('/', methods=['GET'])
+def get_result_cache():
+    return current_app.extensions['result_cache']
+
+
+def get_job_manager():
+    return current_app.extensions['job_manager']
+
+
+def selected_engine():
+    engine = request.args.get('engine', current_app.config['SIMULATION_ENGINE'])
+    if engine not in simulation.ENGINES:
+        abort(400)
+    return engine
+
+
+def selected_shots(default):
+    shots = request.args.get('shots', default, type=int)
+    if not 1 <= shots <= current_app.config['MAX_SHOTS']:
+        abort(400)
+    return shots
+
+
+def get_opinion_index():
+    return current_app.extensions['opinion_index']
+
+
+def load_opinion_ids():
+    return db.session.scalars(db.select(Opinion.id)).all()
+
+
+def random_opinion():
+    opinion = get_opinion_index().random(
+        lambda id: db.session.get(Opinion, id)
+    )
+    if opinion is None:
+        # Index empty or out of sync: fall back to the COUNT + OFFSET query
+        quantity = Opinion.query.count()
+        if quantity:
+            opinion = Opinion.query.offset(randrange(quantity)).first()
+    return opinion
+
+
+@views.route('/', methods=['GET'])
 def index_view():
-    quantity = Opinion.query.count()
-    if not quantity:
+    opinion = random_opinion()
+    if opinion is None:
         #return 'В базе данных мнений о фильмах нет.'
         abort(404)
-    offset_value = randrange(quantity)
-    opinion = Opinion.query.offset(offset_value).first()
     context = {
         'opinion': opinion
     }
@@ -120,15 +175,155 @@ def index_view():
     )
 
 
+def opinion_page(search=None):
+    # Keyset pagination: ?cursor= is the last row of the previous page, so
+    # every page is one index range scan, never an OFFSET.
+    #   browse: newest first on the (timestamp, id) index
+    #   search: newest first on the FTS5 rowid, which FTS5 walks in order
+    #           without collecting and sorting every match
+    limit = request.args.get('limit', 20, type=int)
+    if not 1 <= limit <= current_app.config['OPINIONS_MAX_PAGE_SIZE']:
+        abort(400)
+    cursor = request.args.get('cursor')
+    try:
+        timestamp, id = decode_cursor(cursor) if cursor else (None, None)
+    except ValueError:
+        abort(400)
+    if search is None:
+        query = db.select(Opinion).order_by(
+            Opinion.timestamp.desc(),
+            Opinion.id.desc()
+        ).limit(limit + 1)
+        if cursor:
+            query = query.where(db.tuple_(Opinion.timestamp, Opinion.id) < (timestamp, id))
+    else:
+        match = match_query(search)
+        if match is None:
+            return [], None
+        query = db.select(Opinion).from_statement(
+            db.text(
+                'SELECT opinion.* FROM opinion_fts JOIN opinion ON opinion.id = opinion_fts.rowid '
+                'WHERE opinion_fts MATCH :match AND opinion_fts.rowid < :id '
+                'ORDER BY opinion_fts.rowid DESC LIMIT :limit'
+            ).bindparams(match=match, id=id if cursor else 2 ** 63 - 1, limit=limit + 1)
+        )
+    opinions = db.session.scalars(query).all()
+    next_cursor = encode_cursor(opinions[limit - 1]) if len(opinions) > limit else None
+    return opinions[:limit], next_cursor
+
+
+@views.route('/opinions', methods=['GET'])
+def opinions_view():
+    search = request.args.get('q')
+    opinions, next_cursor = opinion_page(search)
+    context = {
+        'opinions': opinions,
+        'search': search or '',
+        'next_cursor': next_cursor
+    }
+    return render_template(
+        template_name_or_list='opinions.html',
+        **context
+    )
+
+
+@views.route('/api/opinions', methods=['GET'])
+def opinions_api_view():
+    opinions, next_cursor = opinion_page(request.args.get('q'))
+    return jsonify(
+        opinions=[
+            {
+                'id': opinion.id,
+                'title': opinion.title,
+                'text': opinion.text,
+                'source': opinion.source,
+                'timestamp': opinion.timestamp.isoformat()
+            }
+            for opinion in opinions
+        ],
+        next_cursor=next_cursor
+    )
+
+
+@views.route('/api/opinions/export', methods=['GET'])
+def opinions_export_view():
+    def generate():
+        with db.engine.connect() as connection:
+            yield from export_jsonl(connection)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson'
+    )
+
+
+@views.route('/api/opinions/import', methods=['POST'])
+def opinions_import_view():
+    # Disabled unless OPINIONS_IMPORT_TOKEN is set; the token goes in X-Import-Token
+    token = current_app.config['OPINIONS_IMPORT_TOKEN']
+    if not token or not hmac.compare_digest(request.headers.get('X-Import-Token', ''), token):
+        abort(403)
+    with db.engine.begin() as connection:
+        stats = import_jsonl(connection, request.stream)
+    get_opinion_index().invalidate()
+    return jsonify(stats)
+
+
+# Presentations and exercises (static/files). send_from_directory answers
+# Range and conditional requests (ETag / Last-Modified) and hands the file to
+# the front server with USE_X_SENDFILE; without a Range header a .br / .gz
+# variant made by `flask compress-documents` is preferred when accepted.
+@views.route('/documents/<path:filename>', methods=['GET'])
+def document_view(filename):
+    directory = current_app.config['DOCUMENTS_DIR']
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    encodings = request.accept_encodings
+    if 'Range' not in request.headers:
+        for encoding, suffix in DOCUMENT_ENCODINGS:
+            if encodings[encoding] and os.path.isfile(safe_join(directory, filename + suffix) or ''):
+                response = send_from_directory(
+                    directory,
+                    filename + suffix,
+                    mimetype=mimetype,
+                    max_age=current_app.config['DOCUMENTS_MAX_AGE']
+                )
+                response.headers['Content-Encoding'] = encoding
+                response.vary.add('Accept-Encoding')
+                return response
+    response = send_from_directory(
+        directory,
+        filename,
+        mimetype=mimetype,
+        max_age=current_app.config['DOCUMENTS_MAX_AGE']
+    )
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+# Run images are content-addressed, so a URL never changes its content
+@views.route('/artifacts/<artifact_id>', methods=['GET'])
+def artifact_view(artifact_id):
+    store = artifact_store.ARTIFACTS
+    if not artifact_store.ARTIFACT_ID.match(artifact_id):
+        abort(404)
+    response = send_from_directory(
+        os.path.abspath(store.directory),
+        artifact_id,
+        max_age=365 * 24 * 3600
+    )
+    response.cache_control.immutable = True
+    return response
+
+
 # VIEW FOR ALGORITHMS VIEW
-@app.route('/quantum_algorithms', methods=['GET'])
+@views.route('/quantum_algorithms', methods=['GET'])
 def index_quantum_algorithms_view():
     return render_template(
         template_name_or_list='index_algorithms.html'
     )
 
 
-@app.route('/add', methods=['GET', 'POST'])
+@views.route('/add', methods=['GET', 'POST'])
 def add_opinion_view():
     form = OpinionForm()
     if form.validate_on_submit():
@@ -138,10 +333,16 @@ def add_opinion_view():
             source=form.source.data
         )
         db.session.add(opinion)
-        db.session.commit()
-        return redirect(
-            url_for('opinion_view',id=opinion.id)
-        )
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            form.text.errors.append('Такое мнение уже есть')
+        else:
+            get_opinion_index().add(opinion.id)
+            return redirect(
+                url_for('.opinion_view',id=opinion.id)
+            )
     context = {
         'form': form
     }
@@ -151,7 +352,7 @@ def add_opinion_view():
     )
 
 
-@app.route('/opinions/<int:id>', methods=['GET'])
+@views.route('/opinions/<int:id>', methods=['GET'])
 def opinion_view(id):
     opinion = Opinion.query.get_or_404(id)
     context = {
@@ -163,608 +364,830 @@ def opinion_view(id):
     )
 
 
-@app.route('/quantum_algorithms/Bernstein_Vazirani_algorithm', methods=['GET', 'POST'])
+@views.route('/quantum_algorithms/Bernstein_Vazirani_algorithm', methods=['GET', 'POST'])
 def bernstein_vazirani_algorithm_view():
+    # There are no presentation and exercises documents for this algorithm
+    # (static/files has none), so the page only has the run button
     if request.method == 'POST':
-        workingdir = os.path.abspath(os.getcwd())
-        filepath = workingdir + '/static/files/berstein_vazirani_algorithm'
-        if request.form['submit_button'] == 'Презентация':
-            path = filepath + 'BVPresentation.pdf'
-            webbrowser.open_new_tab(path)
-        elif request.form['submit_button'] == 'Упражнения':
-            path = filepath + 'BVExercises.pdf'
-            webbrowser.open_new_tab(path)
-        elif request.form['submit_button'] == 'Вычислять':
+        if request.form['submit_button'] == 'Вычислять':
             return redirect(
-                url_for('bernstein_vazirani_algorithm')
+                url_for('.bernstein_vazirani_algorithm')
             )
     return render_template(
         template_name_or_list='bernsteinvazirani_algorithm.html'
     )
 
 
-@app.route('/quantum_algorithms/Grover_algorithm', methods=['GET', 'POST'])
+@views.route('/quantum_algorithms/Grover_algorithm', methods=['GET', 'POST'])
 def grover_algorithm_view():
     if request.method == 'POST':
         if request.form['submit_button'] == 'Classical solution':
             return redirect(
-                url_for('grover_classical_algorithm')
+                url_for('.grover_classical_algorithm')
             )
         elif request.form['submit_button'] == 'Quantum solution':
             return redirect(
-                url_for('grover_algorithm')
+                url_for('.grover_algorithm')
             )
         elif request.form['submit_button'] == 'Sudoku Quantum solution':
             return redirect(
-                url_for('grover_sudoku_algorithm')
+                url_for('.grover_sudoku_algorithm')
             )
     return render_template(
         template_name_or_list='grover_algorithm.html'
     )
 
 
-@app.route('/quantum_algorithms/Quantum_Teleportation_algorithm', methods=['GET', 'POST'])
+@views.route('/quantum_algorithms/Quantum_Teleportation_algorithm', methods=['GET', 'POST'])
 def quantum_teleportation_algorithm_view():
     if request.method == 'POST':
         if request.form['submit_button'] == 'Вычислять':
             return redirect(
-                url_for('quantum_teleportation_algorithm')
+                url_for('.quantum_teleportation_algorithm')
             )
     return render_template(
         template_name_or_list="quantumteleportation_algorithm.html"
     )
 
 
-@app.route('/algorithms/Shor_algorithm', methods=['GET', 'POST'])
+@views.route('/algorithms/Shor_algorithm', methods=['GET', 'POST'])
 def shor_algorithm_view():
     if request.method == 'POST':
         if request.form['submit_button'] == 'QFT':
             return redirect(
-                url_for('shor_algorithm_QFT')
+                url_for('.shor_algorithm_QFT')
             )
         elif request.form['submit_button'] == 'Circuit - QFT':
             return redirect(
-                url_for('shor_algorithm_quantum_circuit_QFT')
+                url_for('.shor_algorithm_quantum_circuit_QFT')
             )
     return render_template(
         template_name_or_list="shor_algorithm.html"
     )
 
-
-@app.route('/algorithms/Simon_algorithm', methods=['GET', 'POST'])
+@views.route('/algorithms/Simon_algorithm', methods=['GET', 'POST'])
 def simon_algorithm_view():
     if request.method == 'POST':
-        workingdir = os.path.abspath(os.getcwd())
-        filepath = workingdir + '/static/files/simon_algorithm'
         if request.form['submit_button'] == 'Презентация':
-            path = filepath + 'SAPresentation.pdf'
-            webbrowser.open_new_tab(path)
+            return redirect(
+                url_for('.document_view', filename='simon_algorithm/SAPresentation.pdf')
+            )
         elif request.form['submit_button'] == 'Упражнения':
-            path = filepath + 'SAExercises.pdf'
-            webbrowser.open_new_tab(path)
+            return redirect(
+                url_for('.document_view', filename='simon_algorithm/SAExercises.pdf')
+            )
         elif request.form['submit_button'] == 'Classical solution':
             return redirect(
-                url_for('simon_algorithm')
+                url_for('.simon_algorithm')
             )
     return render_template(
         template_name_or_list="simon_algorithm.html"
     )
 
 # Bernstein Vazirani algorithm
-@app.route('/quantum_algorithms/Bernstein_Vazirani_algorithm/quantum_solution', methods=['GET', 'POST'])
+@views.route('/quantum_algorithms/Bernstein_Vazirani_algorithm/quantum_solution', methods=['GET', 'POST'])
 def bernstein_vazirani_algorithm():
-    
-    # DATA
-    # INPUTS
-    secret_number = '111000'
-    
-    num_qubits = len(secret_number) + 1
-    num_bits = len(secret_number)
-    circuit, quantum_register = create_circuit(
-        num_qubits=num_qubits,
-        num_bits=num_bits
-    )
-    add_hadamard_gate(
-        circuit=circuit,
-        quantum_register=quantum_register,
-        vector_register=range(len(secret_number))
-    )
-    add_x_gate(
-        circuit=circuit,
-        qubit=len(secret_number)
-    )
-    add_hadamard_gate(
-        circuit=circuit,
-        quantum_register=quantum_register,
-        vector_register=[len(secret_number)]
-    )
-    circuit.barrier()
-    for index, value in enumerate(reversed(secret_number)):
-        if value == '1':
-            add_controlledX_gate(
-                circuit=circuit,
-                quantum_register=quantum_register,
-                vector_register=[index, len(secret_number)]
-            )
-    circuit.barrier()
-    add_hadamard_gate(
-        circuit=circuit,
-        quantum_register=quantum_register,
-        vector_register=range(len(secret_number))
-    )
-    circuit.barrier()
-    circuit.measure(
-        range(len(secret_number)),
-        range(len(secret_number))
-    )
-    draw(
-        circuit=circuit,
-        filename="bernstein_vazirani_circuit"
-    )
-    simulator = Aer.get_backend('qasm_simulator')
-    result = execute(
-        circuit,
-        backend=simulator,
-        shots=1
-    ).result()
-    counts = result.get_counts()
-    create_histogram(
-        counts=counts,
-        name="bernstein_vazirani_algorithm_histogram"
-    )
-    print(counts)
+    algorithms.run_algorithm(
+        'bernstein_vazirani',
+        cache=get_result_cache(),
+        engine=selected_engine()
+    )
     return render_template(
         template_name_or_list="bernsteinvazirani_algorithm.html"
     )
 
 
+@views.route('/quantum_algorithms/Bernstein_Vazirani_algorithm/solve', methods=['GET'])
+def bernstein_vazirani_solve():
+    # ?secret=1011: one shot on the stabilizer simulator recovers the secret
+    secret = request.args.get('secret', '111000')
+    if len(secret) > current_app.config['BV_MAX_LENGTH']:
+        return jsonify(error=f"Не больше {current_app.config['BV_MAX_LENGTH']} бит"), 400
+    try:
+        solution = algorithms.run_algorithm(
+            'bernstein_vazirani_solver',
+            cache=get_result_cache(),
+            secret_number=secret,
+            engine=selected_engine()
+        )
+    except ValueError as error:
+        return jsonify(error=str(error)), 400
+    return jsonify(
+        secret=solution['secret'],
+        correct=solution['secret'] == secret,
+        num_qubits=solution['num_qubits']
+    )
+
+
+@views.route('/quantum_algorithms/Bernstein_Vazirani_algorithm/sweep', methods=['POST'])
+def bernstein_vazirani_sweep():
+    sweep = algorithms.load('algorithms.bernstein_vazirani:sweep')
+    secrets = (request.get_json(silent=True) or {}).get('secrets')
+    if not isinstance(secrets, list):
+        return jsonify(error='Ожидается JSON вида {"secrets": ["101", ...]}'), 400
+    try:
+        results = sweep(
+            secrets,
+            max_secrets=current_app.config['BV_SWEEP_MAX_SECRETS'],
+            max_length=current_app.config['BV_SWEEP_MAX_LENGTH']
+        )
+    except ValueError as error:
+        return jsonify(error=str(error)), 400
+    return jsonify(results)
+
+
 # Grover algorithm
-@app.route('/quantum_algorithms/Grover_algorithm/quantum_solution', methods=['GET', 'POST'])
+@views.route('/quantum_algorithms/Grover_algorithm/quantum_solution', methods=['GET', 'POST'])
 def grover_algorithm():
-    num_qubits=2
-    num_bits=2
-    circuit, quantum_register = create_circuit(
-        num_qubits=num_qubits,
-        num_bits=num_bits
-    )
-    add_hadamard_gate(
-        circuit=circuit,
-        quantum_register=quantum_register,
-        vector_register=[0,1]
-    )
-    # ORACLE
-    add_z_gate(
-        circuit=circuit,
-        quantum_register=quantum_register,
-        vector_register=[0,1]  
-    )
-    # DIFUSSION OPERATOR
-    add_hadamard_gate(
-        circuit=circuit,
-        quantum_register=quantum_register,
-        vector_register=[0,1]
-    )
-    circuit.z(
-        [0,1]
-    )
-    add_z_gate(
-        circuit=circuit,
-        quantum_register=quantum_register,
-        vector_register=[0,1]
-    )
-    add_hadamard_gate(
-        circuit=circuit,
-        quantum_register=quantum_register,
-        vector_register=[0,1]
-    )
-    # EXPORT CIRCUIT
-    draw(
-        circuit=circuit,
-        filename="grover_circuit"
-    )
-    # ANALYSIS
-    sv_sim = Aer.get_backend('statevector_simulator')
-    result = sv_sim.run(circuit).result()
-    state_vector = result.get_statevector()
-    result = array_to_latex(state_vector, prefix="|\\psi\\rangle =")
-
-    circuit.measure_all()
-    qasm_sim = Aer.get_backend('qasm_simulator')
-    result = qasm_sim.run(circuit).result()
-    counts = result.get_counts()
-    create_histogram(
-        counts=counts,
-        name="grover_algorithm_histogram"
+    algorithms.run_algorithm(
+        'grover',
+        cache=get_result_cache(),
+        engine=selected_engine()
     )
-
     return render_template(
         template_name_or_list="grover_algorithm.html"
     )
 
 
-@app.route('/quantum_algorithms/Grover_algorithm/sudoku_solution', methods=['GET'])
+@views.route('/quantum_algorithms/Grover_algorithm/sudoku_solution', methods=['GET'])
 def grover_sudoku_algorithm():
-    clause_list = [ [0,1],
-               [0,2],
-               [1,3],
-               [2,3] ]
-    in_qubits = QuantumRegister(2, name='input')
-    out_qubit = QuantumRegister(1, name='output')
-    circuit = QuantumCircuit(in_qubits, out_qubit)
-    XOR(circuit, in_qubits[0], in_qubits[1], out_qubit)
-    draw_sudoku_example(
-        circuit=circuit,
-        filename="sudoku_circuit"
-    )
-
-    # Create separate registers to name bits
-    var_qubits = QuantumRegister(4, name='v')  # variable bits
-    clause_qubits = QuantumRegister(4, name='c')  # bits to store clause-checks
-    circuit_dos = QuantumCircuit(var_qubits, clause_qubits)
-    i = 0
-    for clause in clause_list:
-        XOR(circuit_dos, clause[0], clause[1], clause_qubits[i])
-        i += 1
-    draw_sudoku_example(
-        circuit=circuit_dos,
-        filename="sudoku_circuit"
-    )
-
-    # Create separate registers to name bits
-    var_qubits = QuantumRegister(4, name='v')
-    clause_qubits = QuantumRegister(4, name='c')
-    output_qubit = QuantumRegister(1, name='out')
-    circuit_tres = QuantumCircuit(var_qubits, clause_qubits, output_qubit)
-    # Compute clauses
-    i = 0
-    for clause in clause_list:
-        XOR(circuit_tres, clause[0], clause[1], clause_qubits[i])
-        i += 1
-    # Flip 'output' bit if all clauses are satisfied
-    # MCT - Multiple Control X Gate
-    circuit_tres.mct(clause_qubits, output_qubit)
-    draw_sudoku_example(
-        circuit=circuit_tres,
-        filename="sudoku_circuit"
-    )
-
-    # REPETING STATES WITHOUT COMPUTING
-    var_qubits = QuantumRegister(4, name='v')
-    clause_qubits = QuantumRegister(4, name='c')
-    output_qubit = QuantumRegister(1, name='out')
-    cbits = ClassicalRegister(4, name='cbits')
-    circuit_cuatro = QuantumCircuit(var_qubits, clause_qubits, output_qubit, cbits)
-    sudoku_oracle(
-        qc=circuit_cuatro,
-        clause_list=clause_list,
-        clause_qubits=clause_qubits,
-        output_qubit=output_qubit
-    )
-    draw_sudoku_example(
-        circuit=circuit_cuatro,
-        filename="sudoku_circuit"
-    )
-
-    # FINAL ALGORITHM
-    var_qubits = QuantumRegister(4, name='v')
-    clause_qubits = QuantumRegister(4, name='c')
-    output_qubit = QuantumRegister(1, name='out')
-    cbits = ClassicalRegister(4, name='cbits')
-    circuit_cinco = QuantumCircuit(var_qubits, clause_qubits, output_qubit, cbits)
-
-    # Initialize 'out0' in state |->
-    circuit_cinco.initialize([1, -1]/np.sqrt(2), output_qubit)
-
-    # Initialize qubits in state |s>
-    circuit_cinco.h(var_qubits)
-    circuit_cinco.barrier()  # for visual separation
-
-    ## First Iteration
-    # Apply our oracle
-    sudoku_oracle(circuit_cinco, clause_list, clause_qubits, output_qubit)
-    circuit_cinco.barrier()  # for visual separation
-    # Apply our diffuser
-    circuit_cinco.append(diffuser(4), [0,1,2,3])
-
-    ## Second Iteration
-    sudoku_oracle(circuit_cinco, clause_list, clause_qubits, output_qubit)
-    circuit_cinco.barrier()  # for visual separation
-    # Apply our diffuser
-    circuit_cinco.append(diffuser(4), [0,1,2,3])
-
-    # Measure the variable qubits
-    circuit_cinco.measure(var_qubits, cbits)
-
-    circuit_cinco.draw(fold=-1)
-    
-    draw_sudoku_example(
-        circuit=circuit_cinco,
-        filename="sudoku_circuit"
-    )
-
-    # Simulate and plot results
-    qasm_simulator = Aer.get_backend('qasm_simulator')
-    transpiled_qc = transpile(circuit_cinco, qasm_simulator)
-    result = qasm_simulator.run(transpiled_qc).result()
-    counts = result.get_counts()
-    create_sudoku_histogram(
-        counts=counts,
-        name="sudoku_histogram"
+    algorithms.run_algorithm(
+        'grover_sudoku',
+        cache=get_result_cache(),
+        engine=selected_engine()
     )
-
     return render_template(
         template_name_or_list="grover_algorithm.html"
     )
 
-def XOR(qc, a, b, output):
-    qc.cx(a, output)
-    qc.cx(b, output)
-
-
-def sudoku_oracle(qc, clause_list, clause_qubits, output_qubit):
-    # Compute clauses
-    i = 0
-    for clause in clause_list:
-        XOR(qc, clause[0], clause[1], clause_qubits[i])
-        i += 1
-
-    # Flip 'output' bit if all clauses are satisfied
-    qc.mct(clause_qubits, output_qubit)
-
-    # Uncompute clauses to reset clause-checking bits to 0
-    i = 0
-    for clause in clause_list:
-        XOR(qc, clause[0], clause[1], clause_qubits[i])
-        i += 1
-
-def diffuser(nqubits):
-    circuit = QuantumCircuit(nqubits)
-    # Apply transformation |s> -> |00..0> (H-gates)
-    for qubit in range(nqubits):
-        circuit.h(qubit)
-    # Apply transformation |00..0> -> |11..1> (X-gates)
-    for qubit in range(nqubits):
-        circuit.x(qubit)
-    # Do multi-controlled-Z gate
-    circuit.h(nqubits-1)
-    circuit.mct(list(range(nqubits-1)), nqubits-1)  # multi-controlled-toffoli
-    circuit.h(nqubits-1)
-    # Apply transformation |11..1> -> |00..0>
-    for qubit in range(nqubits):
-        circuit.x(qubit)
-    # Apply transformation |00..0> -> |s>
-    for qubit in range(nqubits):
-        circuit.h(qubit)
-    # We will return the diffuser as a gate
-    U_s = circuit.to_gate()
-    U_s.name = "U$_s$"
-    return U_s
-
-
-@app.route('/quantum_algorithms/Grover_algorithm/classical_solution', methods=['GET'])
+
+@views.route('/quantum_algorithms/Grover_algorithm/cnf', methods=['POST'])
+def grover_cnf_algorithm():
+    problem = request.get_json(silent=True)
+    if not isinstance(problem, dict) or not isinstance(problem.get('num_variables'), int):
+        return jsonify(error='Ожидается JSON вида {"num_variables": 3, "clauses": [[1, -2]], "xor_clauses": [[[0, 1], 1]]}'), 400
+    try:
+        entry = algorithms.run_algorithm(
+            'grover_cnf',
+            cache=get_result_cache(),
+            num_variables=problem['num_variables'],
+            clauses=problem.get('clauses', []),
+            xor_clauses=problem.get('xor_clauses', []),
+            num_solutions=problem.get('num_solutions'),
+            max_qubits=current_app.config['GROVER_MAX_QUBITS'],
+            engine=selected_engine(),
+            shots=selected_shots(default=1024)
+        )
+    except (TypeError, ValueError) as error:
+        return jsonify(error=str(error)), 400
+    return jsonify(
+        counts=counts_to_dict(entry['counts'], entry['registers']),
+        iterations=entry['iterations'],
+        num_solutions=entry['num_solutions'],
+        success_probability=entry.get('success_probability'),
+        num_qubits=entry['num_qubits'],
+        depth=entry['depth']
+    )
+
+
+def selected_sizes():
+    # ?sizes=1000,1000000; None keeps the plugin's defaults
+    if 'sizes' not in request.args:
+        return None
+    try:
+        return [int(size) for size in request.args['sizes'].split(',')]
+    except ValueError:
+        abort(400)
+
+
+@views.route('/quantum_algorithms/Grover_algorithm/classical_solution', methods=['GET'])
 def grover_classical_algorithm():
     # 7 is the last and 9 in the middle.
     element_tofind = 9
     my_list = [1,3,5,2,4,1,5,8,0,2,6,3,2,8,5,3,9,2,6,8,1,1,2,5,3,6,2,8,1,1,2,3,2,4,5,3,2,2,8,1,7,5]
-    print(f'Number of elements: {len(my_list)}')
-    def the_oracle(my_input):
-        if my_input is element_tofind:
-            response = True
-        else:
-            response = False
-        return response
-    
-    for index, trial_number in enumerate(my_list):
-        if the_oracle(trial_number):
-            print('Winner found at index:', index)
-            print('Calls to the Oracle used:', (index+1))
-            break
-
+    try:
+        comparison = algorithms.run_algorithm(
+            'grover_comparison',
+            cache=get_result_cache(),
+            sizes=selected_sizes(),
+            seed=request.args.get('seed', type=int),
+            max_size=current_app.config['GROVER_COMPARISON_MAX_SIZE'],
+            items=my_list,
+            target=element_tofind
+        )
+    except ValueError:
+        abort(400)
     return render_template(
-        template_name_or_list="grover_algorithm.html"
-    )
+        template_name_or_list="grover_algorithm.html",
+        example=comparison['example'],
+        example_size=len(my_list),
+        comparison=comparison['sizes']
+    )
+
+
+@views.route('/quantum_algorithms/Grover_algorithm/comparison', methods=['GET'])
+def grover_comparison():
+    try:
+        comparison = algorithms.run_algorithm(
+            'grover_comparison',
+            cache=get_result_cache(),
+            sizes=selected_sizes(),
+            seed=request.args.get('seed', type=int),
+            max_size=current_app.config['GROVER_COMPARISON_MAX_SIZE']
+        )
+    except ValueError as error:
+        return jsonify(error=str(error)), 400
+    return jsonify(comparison=comparison['sizes'])
 
 
 # Quantum Teleportation algorithm
-@app.route('/algorithms/Quantum_Teleportation_Algorithm/quantum_solution', methods=['GET', 'POST'])
+@views.route('/algorithms/Quantum_Teleportation_Algorithm/quantum_solution', methods=['GET', 'POST'])
 def quantum_teleportation_algorithm():
-    
-    # DATA
-    # INPUTS
-    num_qubits = 3
-    num_bits = 3
-
-    circuit, quantum_register = create_circuit(
-        num_qubits=num_qubits,
-        num_bits=num_bits
-    )
-    # Esto va en el label tambien
-    #add_x_gate(
-    #    circuit=circuit,
-    #    qubit=0
-    #)
-    circuit.barrier()
-    add_hadamard_gate(
-        circuit=circuit,
-        quantum_register=quantum_register,
-        vector_register=[1]
-    )
-    add_controlledX_gate(
-        circuit=circuit,
-        quantum_register=quantum_register,
-        vector_register=[1, 2]
-    )
-    add_controlledX_gate(
-        circuit=circuit,
-        quantum_register=quantum_register,
-        vector_register=[0, 1]
-    )
-    add_hadamard_gate(
-        circuit=circuit,
-        quantum_register=quantum_register,
-        vector_register=[0]
-    )
-    circuit.barrier()
-    circuit.measure(
-        [0,1],
-        [0,1]
-    )
-    circuit.barrier()
-    add_controlledX_gate(
-        circuit=circuit,
-        quantum_register=quantum_register,
-        vector_register=[1, 2]
-    )
-    add_z_gate(
-        circuit=circuit,
-        quantum_register=quantum_register,
-        vector_register=[0, 2]
-    )
-    draw(
-        circuit=circuit,
-        filename="quantum_teleportation_circuit"
-    )
-    circuit.measure(2,2)
-    simulator = Aer.get_backend('qasm_simulator')
-    result = execute(
-        circuit,
-        backend=simulator,
-        shots=1024
-    ).result()
-    counts = result.get_counts()
-    create_histogram(
-        counts=counts,
-        name="quantum_teleportation_algorithm_histogram"
+    # ?theta=&phi=: input state cos(theta/2)|0> + e^(i phi) sin(theta/2)|1>
+    algorithms.run_algorithm(
+        'quantum_teleportation',
+        cache=get_result_cache(),
+        engine=selected_engine(),
+        shots=selected_shots(default=1024),
+        theta=request.args.get('theta', 0.0, type=float),
+        phi=request.args.get('phi', 0.0, type=float)
     )
     return render_template(
         template_name_or_list="quantumteleportation_algorithm.html"
     )
 
 
-# Shor algorithm (QFT)
-@app.route('/algorithms/Shor_Algorithm/QFT/quantum_solution', methods=['GET', 'POST'])
-def shor_algorithm_QFT():
-
-    state = '00'
-    
-    circuit = QuantumCircuit(len(state))
-    circuit.initialize(
-        Statevector.from_label(state).data,
-        circuit.qubits[::-1]
-    )
-    print(f'Computational bases |{state}>')
-    display(
-        plot_bloch_multivector(Statevector.from_instruction(circuit).data)
-    )
-    plot.savefig(
-        f'results/quantum_circuits/QFT_computational_bases_{NOW_TIME}.png'
-    )
-    print(f'Fourier bases |{state}>')
-    circuit.append(
-        QFT(len(state), do_swaps=True),
-        circuit.qubits
+def is_angle_pair(state):
+    # [theta, phi], both finite numbers
+    return isinstance(state, list) and len(state) == 2 and all(
+        isinstance(angle, (int, float)) and not isinstance(angle, bool) and math.isfinite(angle)
+        for angle in state
     )
-    display(
-        plot_bloch_multivector(Statevector.from_instruction(circuit).data)
-    )
-    plot.savefig(
-        f'results/quantum_circuits/QFT_fourier_bases_{NOW_TIME}.png'
+
+
+@views.route('/algorithms/Quantum_Teleportation_Algorithm/exact', methods=['GET', 'POST'])
+def quantum_teleportation_exact():
+    # Exact distribution and fidelity, no shots. GET ?theta=&phi= for one
+    # state, POST {"states": [[theta, phi], ...]} for a batch
+    if request.method == 'POST':
+        body = request.get_json(silent=True)
+        states = body.get('states') if isinstance(body, dict) else None
+    else:
+        states = [[
+            request.args.get('theta', 0.0, type=float),
+            request.args.get('phi', 0.0, type=float)
+        ]]
+    if not isinstance(states, list) or not 1 <= len(states) <= current_app.config['TELEPORTATION_MAX_STATES'] \
+            or not all(is_angle_pair(state) for state in states):
+        return jsonify(error='Ожидается JSON вида {"states": [[theta, phi], ...]}'), 400
+    try:
+        result = algorithms.run_algorithm(
+            'teleportation_exact',
+            cache=get_result_cache(),
+            states=states,
+            engine=selected_engine()
+        )
+    except (TypeError, ValueError) as error:
+        return jsonify(error=str(error)), 400
+    return jsonify(
+        results=[
+            {
+                'theta': theta,
+                'phi': phi,
+                'fidelity': fidelity,
+                'target_probabilities': target,
+                'probabilities': probabilities
+            }
+            for (theta, phi), fidelity, target, probabilities in zip(
+                states,
+                result['fidelities'],
+                result['target_probabilities'],
+                result['probabilities']
+            )
+        ]
     )
+
+
+# Shor algorithm (QFT)
+@views.route('/algorithms/Shor_Algorithm/QFT/quantum_solution', methods=['GET', 'POST'])
+def shor_algorithm_QFT():
+    # ?state=0110: basis state, qubit 0 first; the QFT is computed by FFT
+    try:
+        algorithms.run_algorithm(
+            'qft_bloch',
+            cache=get_result_cache(),
+            state=request.args.get('state', '00'),
+            max_qubits=current_app.config['QFT_MAX_QUBITS']
+        )
+    except ValueError:
+        abort(400)
     return render_template(
         template_name_or_list="shor_algorithm.html"
     )
 
 
 # Shor algorithm (QFT)
-@app.route('/algorithms/Shor_Algorithm/Circuit_QFT/quantum_solution', methods=['GET', 'POST'])
+@views.route('/algorithms/Shor_Algorithm/Circuit_QFT/quantum_solution', methods=['GET', 'POST'])
 def shor_algorithm_quantum_circuit_QFT():
-    # Get value of PI
-    num_qubits=4
-    display(
-        QFT(num_qubits).draw()
-    )
-    plot.savefig(
-        f'results/quantum_circuits/Quantum_circuit_QFT_{NOW_TIME}.png'
-    )
+    # ?num_qubits=20&approximation_degree=0 (by default O(n log n) rotations)
+    try:
+        algorithms.run_algorithm(
+            'qft_circuit',
+            cache=get_result_cache(),
+            num_qubits=request.args.get('num_qubits', 4, type=int),
+            approximation_degree=request.args.get('approximation_degree', type=int),
+            max_qubits=current_app.config['QFT_MAX_QUBITS']
+        )
+    except ValueError:
+        abort(400)
     return render_template(
         template_name_or_list="shor_algorithm.html"
     )
 
-# No reconoce la libreria cu1
-def my_qc_QFT(num_qubits):
-    pi = np.pi
-    circuit = QuantumCircuit(num_qubits)
-    for qubit in range(num_qubits):
-        circuit.h(qubit)
-        for otherqubit in range(qubit+1, num_qubits):
-            # https://qiskit.org/documentation/stable/0.24/stubs/qiskit.circuit.library.CU1Gate.html#qiskit.circuit.library.CU1Gate
-            circuit.cu1(
-                pi / (2**(otherqubit-qubit)), otherqubit, qubit
-            )
-    return circuit
+
+# Shor algorithm (factoring)
+@views.route('/algorithms/Shor_Algorithm/factor', methods=['GET'])
+def shor_factor_view():
+    # ?number=15[&a=7]: even numbers, perfect powers and lucky gcd(a, N) > 1
+    # are answered classically, the rest by order finding on the simulator
+    number = request.args.get('number', type=int)
+    if number is None:
+        return jsonify(error='Ожидается ?number=15'), 400
+    try:
+        entry = algorithms.run_algorithm(
+            'shor_factor',
+            cache=get_result_cache(),
+            number=number,
+            a=request.args.get('a', type=int),
+            seed=request.args.get('seed', type=int),
+            max_number=current_app.config['SHOR_MAX_NUMBER'],
+            engine=selected_engine(),
+            shots=selected_shots(default=1024)
+        )
+    except ValueError as error:
+        return jsonify(error=str(error)), 400
+    return jsonify(
+        number=entry['number'],
+        factors=entry['factors'],
+        method=entry['method'],
+        a=entry['a'],
+        attempts=entry['attempts']
+    )
 
 
 # Simon algorithm
-@app.route('/algorithms/Simon_Algorithm/quantum_solution', methods=['GET', 'POST'])
+@views.route('/algorithms/Simon_Algorithm/quantum_solution', methods=['GET', 'POST'])
 def simon_algorithm():
     b = '110'
-    n = len(b)
-    circuit, quantum_register = create_circuit(
-        num_qubits=n*2,
-        num_bits=n
-    )
-    add_hadamard_gate(
-        circuit=circuit,
-        quantum_register=quantum_register,
-        vector_register=range(n)
-    )
-    circuit.barrier()
-    circuit = circuit.compose(simon_oracle(b))
-    circuit.barrier()
-    add_hadamard_gate(
-        circuit=circuit,
-        quantum_register=quantum_register,
-        vector_register=range(n)
-    )
-    circuit.measure(
-        range(n),
-        range(n)
-    )
-    draw(
-        circuit=circuit,
-        filename="simon_circuit"
-    )
-    aer_sim = Aer.get_backend('aer_simulator')
-    results = aer_sim.run(circuit).result()
-    counts = results.get_counts()
-    create_histogram(
-        counts=counts,
-        name="simon_algorithm_histogram"
-    )
-    for z in counts:
-        print('{}.{} = {} (mod 2)'.format(b, z, bdotz(b,z)))
+    algorithms.run_algorithm(
+        'simon',
+        cache=get_result_cache(),
+        b=b,
+        engine=selected_engine()
+    )
+    algorithms.run_algorithm(
+        'simon_solver',
+        cache=get_result_cache(),
+        b=b,
+        engine=selected_engine()
+    )
     return render_template(
         template_name_or_list="simon_algorithm.html"
     )
 
-def bdotz(b, z):
-    accum = 0
-    for i in range(len(b)):
-        accum += int(b[i]) * int(z[i])
-    return (accum % 2)
+
+@views.route('/algorithms/Simon_Algorithm/solve', methods=['GET'])
+def simon_solve_view():
+    # ?b=1011: recovers b from as few shots as the equations need
+    b = request.args.get('b', '110')
+    if len(b) > current_app.config['SIMON_MAX_LENGTH']:
+        return jsonify(error=f"Не больше {current_app.config['SIMON_MAX_LENGTH']} бит"), 400
+    try:
+        solution = algorithms.run_algorithm(
+            'simon_solver',
+            cache=get_result_cache(),
+            b=b,
+            engine=selected_engine(),
+            seed=request.args.get('seed', type=int)
+        )
+    except ValueError as error:
+        return jsonify(error=str(error)), 400
+    return jsonify(
+        b=solution['b'],
+        correct=solution['b'] == b,
+        shots=solution['shots'],
+        batches=solution['batches'],
+        equations=solution['equations']
+    )
+
+
+# Counts API
+# Algorithms whose results are measurement counts
+COUNTS_ALGORITHMS = ('bernstein_vazirani', 'grover', 'grover_sudoku', 'quantum_teleportation', 'simon')
+
+
+def algorithm_counts(algorithm):
+    if algorithm not in COUNTS_ALGORITHMS:
+        abort(404)
+    kwargs = {'engine': selected_engine()}
+    if algorithm == 'quantum_teleportation':
+        kwargs['shots'] = selected_shots(default=1024)
+    entry = algorithms.run_algorithm(
+        algorithm,
+        cache=get_result_cache(),
+        **kwargs
+    )
+    return counts_to_dict(entry['counts'], entry['registers'])
+
+
+@views.route('/api/<algorithm>/counts', methods=['GET'])
+def counts_api_view(algorithm):
+    counts = algorithm_counts(algorithm)
+    response = jsonify(
+        algorithm=algorithm,
+        shots=sum(counts.values()),
+        counts=counts
+    )
+    response.set_etag(counts_hash(counts))
+    return response.make_conditional(request)
+
+
+@views.route('/api/<algorithm>/histogram.svg', methods=['GET'])
+def histogram_api_view(algorithm):
+    counts = algorithm_counts(algorithm)
+    response = current_app.response_class(
+        histogram_svg(counts, title=f' -- {algorithm} -- '),
+        mimetype='image/svg+xml'
+    )
+    response.set_etag(f'svg-{counts_hash(counts)}')
+    return response.make_conditional(request)
+
+
+# Background jobs
+# {plugin: (JSON arguments a job may pass, {cap argument: config key})}: the
+# arguments of the synchronous route, with the caps taken from the config
+JOB_ARGUMENTS = {
+    'bernstein_vazirani': (('engine',), {}),
+    'bernstein_vazirani_solver': (('secret_number', 'engine'), {}),
+    'grover': (('engine',), {}),
+    'grover_sudoku': (('engine',), {}),
+    'grover_cnf': (
+        ('num_variables', 'clauses', 'xor_clauses', 'num_solutions', 'engine', 'shots'),
+        {'max_qubits': 'GROVER_MAX_QUBITS'}
+    ),
+    'grover_comparison': (('sizes', 'seed'), {'max_size': 'GROVER_COMPARISON_MAX_SIZE'}),
+    'quantum_teleportation': (('engine', 'shots', 'theta', 'phi'), {}),
+    'teleportation_exact': (('states', 'engine'), {}),
+    'simon': (('engine',), {}),
+    'simon_solver': (('b', 'engine', 'seed'), {}),
+    'qft_bloch': (('state',), {'max_qubits': 'QFT_MAX_QUBITS'}),
+    'qft_circuit': (('num_qubits', 'approximation_degree'), {'max_qubits': 'QFT_MAX_QUBITS'}),
+    'shor_factor': (('number', 'a', 'seed', 'engine', 'shots'), {'max_number': 'JOBS_SHOR_MAX_NUMBER'}),
+}
+
+# Arguments whose length the synchronous routes limit
+JOB_LENGTH_LIMITS = {
+    'secret_number': 'BV_MAX_LENGTH',
+    'b': 'SIMON_MAX_LENGTH',
+    'states': 'TELEPORTATION_MAX_STATES',
+}
+
+
+def job_kwargs(algorithm, arguments):
+    if not isinstance(arguments, dict):
+        raise ValueError('Ожидается JSON-объект с аргументами алгоритма')
+    names, caps = JOB_ARGUMENTS[algorithm]
+    unknown = sorted(set(arguments) - set(names))
+    if unknown:
+        raise ValueError(f"Недопустимые аргументы: {', '.join(unknown)}")
+    config = current_app.config
+    kwargs = dict(arguments)
+    if 'engine' in names:
+        kwargs.setdefault('engine', config['SIMULATION_ENGINE'])
+        if kwargs['engine'] not in simulation.ENGINES:
+            raise ValueError(f"Движок должен быть одним из: {', '.join(simulation.ENGINES)}")
+    shots = kwargs.get('shots')
+    if shots is not None and (not isinstance(shots, int) or not 1 <= shots <= config['MAX_SHOTS']):
+        raise ValueError(f"Число запусков должно быть от 1 до {config['MAX_SHOTS']}")
+    for name, key in JOB_LENGTH_LIMITS.items():
+        value = kwargs.get(name)
+        if value is not None and (not isinstance(value, (str, list)) or len(value) > config[key]):
+            raise ValueError(f'{name}: не больше {config[key]} элементов')
+    for name, key in caps.items():
+        kwargs[name] = config[key]
+    return kwargs
+
+
+@views.route('/jobs/<algorithm>', methods=['POST'])
+def submit_job_view(algorithm):
+    if algorithm not in JOB_ARGUMENTS:
+        abort(404)
+    try:
+        kwargs = job_kwargs(algorithm, request.get_json(silent=True) or {})
+    except ValueError as error:
+        return jsonify(error=str(error)), 400
+    try:
+        job_id = get_job_manager().submit(algorithm, **kwargs)
+    except KeyError:
+        abort(404)
+    except JobQueueFull:
+        return jsonify(error='Очередь задач заполнена, попробуйте позже'), 503
+    return jsonify(
+        job_id=job_id,
+        status_url=url_for('.job_status_view', job_id=job_id),
+        result_url=url_for('.job_result_view', job_id=job_id)
+    ), 202
+
+
+@views.route('/jobs/<job_id>', methods=['GET'])
+def job_status_view(job_id):
+    job = get_job_manager().get(job_id)
+    if job is None:
+        abort(404)
+    return jsonify(get_job_manager().describe(job))
+
+
+@views.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result_view(job_id):
+    job = get_job_manager().get(job_id)
+    if job is None:
+        abort(404)
+    description = get_job_manager().describe(job)
+    if description['status'] == FINISHED:
+        return jsonify(get_job_manager().result(job))
+    if description['status'] == FAILED:
+        return jsonify(description), 500
+    if description['status'] == TIMEOUT:
+        return jsonify(description), 504
+    return jsonify(description), 202
+
+
+@views.route('/stats/transpile_cache', methods=['GET'])
+def transpile_cache_stats_view():
+    return jsonify(simulation.TRANSPILE_CACHE.stats())
+
+
+# Metrics
+@views.before_app_request
+def start_request_timing():
+    metrics.start_request()
+
+
+@views.after_app_request
+def finish_request_timing(response):
+    total, timings = metrics.finish_request(request.endpoint)
+    if total is not None and current_app.config['METRICS_SERVER_TIMING']:
+        response.headers['Server-Timing'] = metrics.server_timing(total, timings)
+    return response
+
+
+@views.route('/metrics', methods=['GET'])
+def metrics_view():
+    if request.remote_addr not in current_app.config['METRICS_ALLOWED_ADDRESSES']:
+        abort(403)
+    return current_app.response_class(
+        metrics.REGISTRY.render(),
+        mimetype='text/plain; version=0.0.4'
+    )
 
 
 # Обработчики ошибок (ERRORS)
-@app.errorhandler(404)
+@views.app_errorhandler(404)
 def page_not_found(error):
     return render_template('404.html'), 404
 
-@app.errorhandler(500)
+@views.app_errorhandler(resource_governor.ResourceLimitExceeded)
+def resource_limit_exceeded(error):
+    response = jsonify(error=str(error))
+    response.status_code = error.status
+    if error.status == 503:
+        response.headers['Retry-After'] = '10'
+    return response
+
+@views.app_errorhandler(500)
 def internal_error(error):
     db.session.rollback()
     return render_template('500.html'), 500
 
 
+# CONFIGURATION APP
+# ___________________________________________________________________________
+def create_app(preload=None):
+    app = Flask(__name__)
+
+    # Подключается БД SQLite
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///db.sqlite3'
+
+    # Задаётся конкретное значение для конфигурационного ключа
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+    # Всесто MY SECRET KEY придумайте и впишите свой ключ
+    app.config['SECRET_KEY'] = 'SECRET_KEY'
+
+    # Индекс id мнений для случайного выбора: перечитывается из БД раз в N секунд
+    app.config['OPINION_INDEX_TTL'] = 300
+
+    # Токен для POST /api/opinions/import (заголовок X-Import-Token); None - импорт выключен
+    app.config['OPINIONS_IMPORT_TOKEN'] = None
+
+    # Документы (презентации и упражнения): каталог и время кэширования в браузере.
+    # USE_X_SENDFILE=True отдаёт файлы через фронтенд-сервер (X-Sendfile)
+    app.config['DOCUMENTS_DIR'] = os.path.join(app.root_path, 'static', 'files')
+    app.config['DOCUMENTS_MAX_AGE'] = 7 * 24 * 3600
+    app.config['USE_X_SENDFILE'] = False
+
+    # Максимальный размер страницы списка и поиска мнений
+    app.config['OPINIONS_MAX_PAGE_SIZE'] = 100
+
+    # Бюджеты кэша результатов алгоритмов (память и диск)
+    app.config['RESULT_CACHE_MEMORY_BUDGET'] = 64 * MEGABYTE
+    app.config['RESULT_CACHE_DISK_BUDGET'] = 256 * MEGABYTE
+    app.config['RESULT_CACHE_DIR'] = 'results/cache'
+
+    # Хранилище изображений запусков (схемы, гистограммы): каталог, бюджет диска
+    # и срок хранения (секунды); файлы отдаются по /artifacts/<id>
+    app.config['ARTIFACTS_DIR'] = 'results/artifacts'
+    app.config['ARTIFACTS_DISK_BUDGET'] = 256 * MEGABYTE
+    app.config['ARTIFACTS_TTL'] = 7 * 24 * 3600
+
+    # Кэш транспилированных схем (QPY на диске): число схем в памяти и бюджет диска
+    app.config['TRANSPILE_CACHE_ENTRIES'] = 256
+    app.config['TRANSPILE_CACHE_DISK_BUDGET'] = 64 * MEGABYTE
+    app.config['TRANSPILE_CACHE_DIR'] = 'results/cache/transpiled'
+
+    # Движок симуляции по умолчанию ('aer' или 'numpy'); маршрут может выбрать
+    # другой через ?engine=. При SIMULATION_CROSS_CHECK результаты NumPy
+    # сверяются с Aer
+    app.config['SIMULATION_ENGINE'] = simulation.AER
+    app.config['SIMULATION_CROSS_CHECK'] = False
+
+    # Верхняя граница для ?shots= (выборка делается одним вызовом multinomial)
+    app.config['MAX_SHOTS'] = 10 ** 6
+
+    # Решение Бернштейна-Вазирани одним запуском (?secret=): наибольшая длина
+    # секрета; схема клиффордова и моделируется стабилизаторным методом
+    app.config['BV_MAX_LENGTH'] = 1024
+
+    # Пакетный перебор секретов Бернштейна-Вазирани: лимиты одного запроса
+    app.config['BV_SWEEP_MAX_SECRETS'] = 10000
+    app.config['BV_SWEEP_MAX_LENGTH'] = 64
+
+    # Поиск Гровера по CNF/XOR-ограничениям: предел числа кубитов схемы
+    app.config['GROVER_MAX_QUBITS'] = 24
+
+    # Сравнение классического поиска с Гровером: наибольший размер массива
+    # (массив int64 из N элементов - 8N байт на каждый размер в ?sizes=)
+    app.config['GROVER_COMPARISON_MAX_SIZE'] = 10 ** 7
+
+    # Предел числа кубитов для демонстраций QFT (?state=, ?num_qubits=)
+    app.config['QFT_MAX_QUBITS'] = 24
+
+    # Точная телепортация (без выборки): наибольшее число состояний в одном запросе
+    app.config['TELEPORTATION_MAX_STATES'] = 10000
+
+    # Разложение на множители алгоритмом Шора: наибольшее N для синхронного
+    # запроса (N <= 63 - не больше 18 кубитов) и для фоновой задачи
+    # /jobs/shor_factor (N <= 127 - не больше 21 кубита)
+    app.config['SHOR_MAX_NUMBER'] = 63
+    app.config['JOBS_SHOR_MAX_NUMBER'] = 127
+
+    # Адаптивный решатель Саймона: наибольшая длина b (2n кубитов; схема
+    # клиффордова и моделируется стабилизаторным методом)
+    app.config['SIMON_MAX_LENGTH'] = 256
+
+    # Контроль ресурсов симуляций (в каждом процессе): память всех одновременно
+    # идущих симуляций, предел оценки времени одной симуляции (секунды) и
+    # сколько запрос ждёт в очереди, пока освободится память (секунды).
+    # Превышение - ответ 413, истёкшее ожидание - 503
+    app.config['SIMULATION_MEMORY_BUDGET'] = 2 * resource_governor.GIGABYTE
+    app.config['SIMULATION_TIME_BUDGET'] = 120
+    app.config['SIMULATION_QUEUE_TIMEOUT'] = 30
+
+    # Число потоков отрисовки схем и гистограмм (matplotlib не потокобезопасен)
+    app.config['RENDER_WORKERS'] = 1
+
+    # Фоновые задачи: число процессов, глубина очереди и тайм-аут (секунды).
+    # Аргументы задач и их пределы - те же, что у синхронных маршрутов
+    # (JOB_ARGUMENTS)
+    app.config['JOBS_MAX_WORKERS'] = None
+    app.config['JOBS_MAX_QUEUE'] = 32
+    app.config['JOBS_TIMEOUT'] = 120
+
+    # Метрики в формате Prometheus (/metrics) доступны только с этих адресов.
+    # METRICS_SERVER_TIMING=True добавляет к ответам заголовок Server-Timing
+    # со временем этапов (схема, транспиляция, симуляция, отрисовка, шаблон)
+    app.config['METRICS_ALLOWED_ADDRESSES'] = ('127.0.0.1', '::1')
+    app.config['METRICS_SERVER_TIMING'] = False
+
+    # Алгоритмы (qiskit, Aer, matplotlib) загружаются при первом запросе.
+    # Под prefork-сервером их можно загрузить заранее в мастер-процессе:
+    # gunicorn --preload -w 4 'main:create_app(preload=True)'
+    app.config['PRELOAD_ALGORITHMS'] = False
+
+    db.init_app(app)
+    app.register_blueprint(views)
+    app.jinja_env.template_class = metrics.TimedTemplate
+
+    cache_settings = {
+        'memory_budget': app.config['RESULT_CACHE_MEMORY_BUDGET'],
+        'disk_budget': app.config['RESULT_CACHE_DISK_BUDGET'],
+        'directory': app.config['RESULT_CACHE_DIR']
+    }
+    transpile_settings = {
+        'max_entries': app.config['TRANSPILE_CACHE_ENTRIES'],
+        'disk_budget': app.config['TRANSPILE_CACHE_DISK_BUDGET'],
+        'directory': app.config['TRANSPILE_CACHE_DIR']
+    }
+    governor_settings = {
+        'memory_budget': app.config['SIMULATION_MEMORY_BUDGET'],
+        'time_budget': app.config['SIMULATION_TIME_BUDGET'],
+        'queue_timeout': app.config['SIMULATION_QUEUE_TIMEOUT']
+    }
+    artifact_settings = {
+        'directory': app.config['ARTIFACTS_DIR'],
+        'disk_budget': app.config['ARTIFACTS_DISK_BUDGET'],
+        'ttl': app.config['ARTIFACTS_TTL']
+    }
+    app.extensions['result_cache'] = ResultCache(**cache_settings)
+    app.extensions['opinion_index'] = OpinionIndex(
+        load_ids=load_opinion_ids,
+        ttl=app.config['OPINION_INDEX_TTL']
+    )
+    app.extensions['job_manager'] = JobManager(
+        max_workers=app.config['JOBS_MAX_WORKERS'],
+        max_queue=app.config['JOBS_MAX_QUEUE'],
+        timeout=app.config['JOBS_TIMEOUT'],
+        cache_settings=cache_settings,
+        transpile_settings=transpile_settings,
+        artifact_settings=artifact_settings,
+        governor_settings=governor_settings
+    )
+    artifact_store.configure(**artifact_settings)
+    resource_governor.configure(**governor_settings)
+    simulation.TRANSPILE_CACHE = TranspileCache(**transpile_settings)
+    simulation.CROSS_CHECK = app.config['SIMULATION_CROSS_CHECK']
+    render.configure(app.config['RENDER_WORKERS'])
+
+    @app.cli.command('create-search-index')
+    def create_search_index_command():
+        # For databases created before the FTS5 index: creates it and indexes existing rows
+        with db.engine.begin() as connection:
+            create_search_index(connection, rebuild=True)
+            connection.exec_driver_sql(
+                'CREATE INDEX IF NOT EXISTS ix_opinion_timestamp_id ON opinion (timestamp, id)'
+            )
+            connection.exec_driver_sql('DROP INDEX IF EXISTS ix_opinion_timestamp')
+
+    @app.cli.command('import-opinions')
+    @click.argument('file', type=click.File('rb'))
+    def import_opinions_command(file):
+        # flask --app main import-opinions opinions.jsonl  (or - for stdin)
+        with db.engine.begin() as connection:
+            stats = import_jsonl(connection, file)
+        click.echo(stats)
+
+    @app.cli.command('export-opinions')
+    @click.argument('file', type=click.File('w', encoding='utf-8'))
+    def export_opinions_command(file):
+        with db.engine.connect() as connection:
+            file.writelines(export_jsonl(connection))
+
+    @app.cli.command('migrate-opinions')
+    def migrate_opinions_command():
+        # Moves a database created with UNIQUE(text) to the text_hash column
+        with db.engine.begin() as connection:
+            migrated = migrate_text_hash(connection, Opinion.__table__.create)
+        click.echo('migrated' if migrated else 'already up to date')
+
+    @app.cli.command('compress-documents')
+    def compress_documents_command():
+        # Writes .gz (and .br if the brotli package is installed) next to each document
+        try:
+            import brotli
+        except ImportError:
+            brotli = None
+        for root, _, names in os.walk(app.config['DOCUMENTS_DIR']):
+            for name in names:
+                if name.endswith(('.gz', '.br')):
+                    continue
+                path = os.path.join(root, name)
+                with open(path, 'rb') as source, gzip.open(f'{path}.gz', 'wb', compresslevel=9) as target:
+                    shutil.copyfileobj(source, target)
+                if brotli is not None:
+                    with open(path, 'rb') as source, open(f'{path}.br', 'wb') as target:
+                        target.write(brotli.compress(source.read()))
+                click.echo(path)
+
+    if preload is None:
+        preload = app.config['PRELOAD_ALGORITHMS']
+    if preload:
+        algorithms.preload()
+    return app
+
+
+app = create_app()
+
+
  # MAIN THREAD
 if __name__ == '__main__':
     app.run()
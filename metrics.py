@@ -0,0 +1,179 @@
+import sys
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from jinja2 import Template
+
+try:
+    import resource
+except ImportError:
+    # Windows: no getrusage, peak RSS is not reported
+    resource = None
+
+
+# Hot-path instrumentation: stage timers, latency histograms, circuit sizes
+# and peak RSS, rendered in the Prometheus text format for /metrics.
+#
+# Stages nest (transpile runs inside an algorithm, draw_circuit inside a
+# cached run) and each one records only its own time, without the stages
+# nested in it, so the stages of a request add up to its total time.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096, 16384, 65536)
+
+DESCRIPTIONS = {
+    'qpi_stage_seconds': 'Time spent in each stage of an algorithm request, excluding nested stages',
+    'qpi_request_seconds': 'Request latency by endpoint',
+    'qpi_circuit_qubits': 'Qubits of the circuits passed to the simulators',
+    'qpi_circuit_gates': 'Gates of the circuits passed to the simulators',
+}
+
+
+class Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def render(self):
+        lines = []
+        with self._lock:
+            items = sorted(self._histograms.items())
+            last_name = None
+            for (name, labels), histogram in items:
+                if name != last_name:
+                    lines.append(f'# HELP {name} {DESCRIPTIONS.get(name, name)}')
+                    lines.append(f'# TYPE {name} histogram')
+                    last_name = name
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_labels(labels, le=bound)} {cumulative}')
+                lines.append(f'{name}_sum{_labels(labels)} {histogram.sum!r}')
+                lines.append(f'{name}_count{_labels(labels)} {histogram.count}')
+        if resource is None:
+            return '\n'.join(lines) + '\n'
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        scale = 1 if sys.platform == 'darwin' else 1024
+        for name, who, description in (
+            ('qpi_peak_rss_bytes', resource.RUSAGE_SELF, 'Peak resident set size of this process'),
+            ('qpi_children_peak_rss_bytes', resource.RUSAGE_CHILDREN, 'Peak resident set size of the largest finished child process'),
+        ):
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} gauge')
+            lines.append(f'{name} {resource.getrusage(who).ru_maxrss * scale}')
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+REGISTRY = Registry()
+
+# Per-thread stack of open stages and the timings of the current request
+_local = threading.local()
+
+
+def _stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+@contextmanager
+def stage(name, algorithm=None):
+    # algorithm labels this stage and every stage nested in it
+    stack = _stack()
+    if algorithm is None:
+        algorithm = stack[-1]['algorithm'] if stack else 'none'
+    frame = {'algorithm': algorithm, 'nested': 0.0}
+    stack.append(frame)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stack.pop()
+        if stack:
+            stack[-1]['nested'] += elapsed
+        own = elapsed - frame['nested']
+        REGISTRY.observe('qpi_stage_seconds', own, stage=name, algorithm=algorithm)
+        timings = getattr(_local, 'timings', None)
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + own
+
+
+def record_circuit(circuit):
+    stack = _stack()
+    algorithm = stack[-1]['algorithm'] if stack else 'none'
+    REGISTRY.observe('qpi_circuit_qubits', circuit.num_qubits, SIZE_BUCKETS, algorithm=algorithm)
+    REGISTRY.observe('qpi_circuit_gates', circuit.size(), SIZE_BUCKETS, algorithm=algorithm)
+
+
+def start_request():
+    _local.timings = {}
+    _local.started = time.perf_counter()
+
+
+def finish_request(endpoint):
+    # Records the request latency; returns (total seconds, {stage: seconds})
+    timings = getattr(_local, 'timings', None)
+    if timings is None:
+        return None, {}
+    total = time.perf_counter() - _local.started
+    _local.timings = None
+    REGISTRY.observe('qpi_request_seconds', total, endpoint=endpoint or 'none')
+    return total, timings
+
+
+def server_timing(total, timings):
+    # Value of a Server-Timing header, durations in milliseconds
+    entries = [f'{name};dur={seconds * 1000:.2f}' for name, seconds in timings.items()]
+    entries.append(f'total;dur={total * 1000:.2f}')
+    return ', '.join(entries)
+
+
+class TimedTemplate(Template):
+    # jinja_env.template_class: times the rendering of every page
+    # (included templates are rendered inside it)
+
+    def render(self, *args, **kwargs):
+        with stage('template'):
+            return super().render(*args, **kwargs)
@@ -0,0 +1,78 @@
+import random
+import threading
+import time
+from array import array
+
+
+class OpinionIndex:
+    # Ids of every opinion in a compact array, so a random pick is one
+    # primary-key lookup instead of COUNT + OFFSET. The array is updated by
+    # add() in this process and reloaded after `ttl` seconds to pick up rows
+    # written by other processes.
+
+    def __init__(self, load_ids, ttl=300):
+        self.load_ids = load_ids
+        self.ttl = ttl
+        self._ids = None
+        self._positions = {}
+        self._loaded_at = 0
+        self._lock = threading.Lock()
+
+    def _ensure_loaded(self):
+        if self._ids is not None and time.monotonic() - self._loaded_at < self.ttl:
+            return
+        ids = array('q', self.load_ids())
+        with self._lock:
+            self._ids = ids
+            self._positions = {id: position for position, id in enumerate(ids)}
+            self._loaded_at = time.monotonic()
+
+    def __len__(self):
+        self._ensure_loaded()
+        return len(self._ids)
+
+    def add(self, id):
+        with self._lock:
+            if self._ids is None or id in self._positions:
+                return
+            self._positions[id] = len(self._ids)
+            self._ids.append(id)
+
+    def discard(self, id):
+        # Swap with the last id so removal stays O(1)
+        with self._lock:
+            position = self._positions.pop(id, None)
+            if position is None:
+                return
+            last = self._ids.pop()
+            if last != id:
+                self._ids[position] = last
+                self._positions[last] = position
+
+    def invalidate(self):
+        with self._lock:
+            self._ids = None
+            self._positions = {}
+
+    def random_id(self):
+        self._ensure_loaded()
+        with self._lock:
+            if not self._ids:
+                return None
+            return self._ids[random.randrange(len(self._ids))]
+
+    def random(self, get, attempts=3):
+        # get(id) returns the row or None; ids that vanished are dropped and,
+        # if every attempt misses (or the index is empty), it is reloaded once
+        for reload in (False, True):
+            if reload:
+                self.invalidate()
+            for _ in range(attempts):
+                id = self.random_id()
+                if id is None:
+                    break
+                row = get(id)
+                if row is not None:
+                    return row
+                self.discard(id)
+        return None
@@ -0,0 +1,127 @@
+import hashlib
+import json
+from datetime import datetime, timezone
+
+from opinion_search import create_search_index, drop_search_index
+
+
+# Opinions as JSON Lines: one {"title", "text", "source", "timestamp"} per line.
+# Rows are written with executemany in batches, and duplicates are skipped by
+# the unique text_hash column (INSERT OR IGNORE) instead of a unique index
+# over the whole text.
+BATCH_SIZE = 5000
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+INSERT_SQL = (
+    'INSERT OR IGNORE INTO opinion (title, text, source, timestamp, text_hash) '
+    'VALUES (?, ?, ?, ?, ?)'
+)
+
+
+def hash_text(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _row(record):
+    # Raises ValueError / KeyError / TypeError on a malformed record
+    title = record['title']
+    text = record['text']
+    if not isinstance(title, str) or not isinstance(text, str) \
+            or not title or not text or len(title) > 128:
+        raise ValueError('title and text are required strings, title up to 128 characters')
+    source = record.get('source') or None
+    if source is not None and (not isinstance(source, str) or len(source) > 256):
+        raise ValueError('source must be a string up to 256 characters')
+    timestamp = record.get('timestamp')
+    timestamp = datetime.fromisoformat(timestamp) if timestamp else datetime.utcnow()
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    # Same text format SQLAlchemy uses for DateTime columns on SQLite
+    return (title, text, source, timestamp.strftime(TIMESTAMP_FORMAT), hash_text(text))
+
+
+def import_jsonl(connection, lines, batch_size=BATCH_SIZE):
+    # lines: any iterable of str/bytes lines (a file, request.stream, ...).
+    # Returns counts of inserted, duplicate and invalid records.
+    stats = {'inserted': 0, 'duplicates': 0, 'invalid': 0}
+    batch = []
+
+    def flush():
+        result = connection.exec_driver_sql(INSERT_SQL, batch)
+        stats['inserted'] += result.rowcount
+        stats['duplicates'] += len(batch) - result.rowcount
+        batch.clear()
+
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            batch.append(_row(json.loads(line)))
+        except (ValueError, KeyError, TypeError):
+            stats['invalid'] += 1
+            continue
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return stats
+
+
+def export_jsonl(connection, batch_size=BATCH_SIZE):
+    # Yields one JSON line per opinion, reading in keyset batches by id
+    last_id = 0
+    while True:
+        rows = connection.exec_driver_sql(
+            'SELECT id, title, text, source, timestamp FROM opinion '
+            'WHERE id > ? ORDER BY id LIMIT ?',
+            (last_id, batch_size)
+        ).all()
+        if not rows:
+            return
+        for id, title, text, source, timestamp in rows:
+            yield json.dumps(
+                {
+                    'title': title,
+                    'text': text,
+                    'source': source,
+                    'timestamp': datetime.fromisoformat(timestamp).isoformat() if timestamp else None
+                },
+                ensure_ascii=False
+            ) + '\n'
+        last_id = rows[-1][0]
+
+
+def migrate_text_hash(connection, create_table, batch_size=BATCH_SIZE):
+    # Rebuilds an opinion table created with UNIQUE(text) into the text_hash
+    # layout, keeping ids (opinion links are shared). Returns False if the
+    # table is already migrated.
+    columns = [row[1] for row in connection.exec_driver_sql('PRAGMA table_info(opinion)')]
+    if 'text_hash' in columns:
+        return False
+    # The FTS triggers would follow the rename to opinion_old and be dropped
+    # with it, so the index is dropped first and rebuilt at the end
+    drop_search_index(connection)
+    connection.exec_driver_sql('ALTER TABLE opinion RENAME TO opinion_old')
+    # Index names are global in SQLite
+    connection.exec_driver_sql('DROP INDEX IF EXISTS ix_opinion_timestamp')
+    connection.exec_driver_sql('DROP INDEX IF EXISTS ix_opinion_timestamp_id')
+    create_table(connection)
+    last_id = 0
+    while True:
+        rows = connection.exec_driver_sql(
+            'SELECT id, title, text, source, timestamp FROM opinion_old '
+            'WHERE id > ? ORDER BY id LIMIT ?',
+            (last_id, batch_size)
+        ).all()
+        if not rows:
+            break
+        connection.exec_driver_sql(
+            'INSERT OR IGNORE INTO opinion (id, title, text, source, timestamp, text_hash) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            [(*row, hash_text(row[2])) for row in rows]
+        )
+        last_id = rows[-1][0]
+    connection.exec_driver_sql('DROP TABLE opinion_old')
+    create_search_index(connection, rebuild=True)
+    return True
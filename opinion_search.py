@@ -0,0 +1,62 @@
+from datetime import datetime
+
+
+# External-content FTS5 index over opinion.title and opinion.text; the
+# triggers keep it in sync with every insert, update and delete.
+SEARCH_INDEX_DDL = (
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS opinion_fts USING fts5(
+        title, text, content='opinion', content_rowid='id'
+    )''',
+    '''CREATE TRIGGER IF NOT EXISTS opinion_fts_insert AFTER INSERT ON opinion BEGIN
+        INSERT INTO opinion_fts(rowid, title, text) VALUES (new.id, new.title, new.text);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS opinion_fts_delete AFTER DELETE ON opinion BEGIN
+        INSERT INTO opinion_fts(opinion_fts, rowid, title, text)
+        VALUES ('delete', old.id, old.title, old.text);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS opinion_fts_update AFTER UPDATE OF title, text ON opinion BEGIN
+        INSERT INTO opinion_fts(opinion_fts, rowid, title, text)
+        VALUES ('delete', old.id, old.title, old.text);
+        INSERT INTO opinion_fts(rowid, title, text) VALUES (new.id, new.title, new.text);
+    END''',
+)
+
+
+SEARCH_TRIGGERS = ('opinion_fts_insert', 'opinion_fts_delete', 'opinion_fts_update')
+
+
+def drop_search_index(connection):
+    # Before renaming opinion: SQLite moves the triggers with the table
+    for trigger in SEARCH_TRIGGERS:
+        connection.exec_driver_sql(f'DROP TRIGGER IF EXISTS {trigger}')
+    connection.exec_driver_sql('DROP TABLE IF EXISTS opinion_fts')
+
+
+def create_search_index(connection, rebuild=False):
+    # Safe to run on an existing database; rebuild re-indexes rows that were
+    # written before the triggers existed
+    for statement in SEARCH_INDEX_DDL:
+        connection.exec_driver_sql(statement)
+    if rebuild:
+        connection.exec_driver_sql("INSERT INTO opinion_fts(opinion_fts) VALUES ('rebuild')")
+
+
+def match_query(text):
+    # Every word becomes a quoted FTS5 string, so user input cannot produce
+    # a query syntax error; the words are ANDed, the last one as a prefix
+    words = [word.replace('"', '""') for word in text.split()]
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def encode_cursor(opinion):
+    return f'{opinion.timestamp.isoformat()}_{opinion.id}'
+
+
+def decode_cursor(cursor):
+    # Raises ValueError on a malformed cursor
+    timestamp, _, id = cursor.rpartition('_')
+    return datetime.fromisoformat(timestamp), int(id)
@@ -1,3 +1,6 @@
+import numpy as np
+
+
 def add_x_gate(circuit, qubit):
     circuit.x(
         qubit
@@ -6,10 +9,11 @@ def add_x_gate(circuit, qubit):
 
 
 def add_z_gate(circuit, quantum_register, vector_register):
-    register_a=vector_register[0]
-    register_b=vector_register[1]
-    circuit.cz(
-        quantum_register[register_a],
-        quantum_register[register_b]
-    )
+    # vector_register: a [control, target] pair or a list of pairs
+    pairs = np.reshape(vector_register, (-1, 2)).tolist()
+    if pairs:
+        circuit.cz(
+            quantum_register[[register_a for register_a, _ in pairs]],
+            quantum_register[[register_b for _, register_b in pairs]]
+        )
     return circuit
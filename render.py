@@ -0,0 +1,142 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from circuit_ir import lower
+
+
+# Drawings use their own Figure on an Agg canvas, never pyplot's "current
+# figure", and are cleared as soon as they are written. Matplotlib is not
+# thread-safe, so rendering is handed to a small pool (one thread by default)
+# instead of running in the request threads.
+WORKERS = 1
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def configure(workers):
+    global WORKERS, _executor
+    with _executor_lock:
+        WORKERS = workers
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix='render')
+        return _executor
+
+
+def render(function, *args, **kwargs):
+    # Runs a drawing function in the render pool and waits for it
+    return _get_executor().submit(function, *args, **kwargs).result()
+
+
+def new_figure(figsize=None):
+    # Imported here so the web process does not load matplotlib before a plugin does
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=figsize)
+    FigureCanvasAgg(figure)
+    return figure
+
+
+def _save(figure, path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    try:
+        figure.savefig(path)
+    finally:
+        figure.clear()
+
+
+def _write_text(path, text):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(text)
+
+
+# CIRCUITS
+# ___________________________________________________________________________
+def circuit_text(circuit):
+    return str(lower(circuit).draw(output='text'))
+
+
+def save_circuit(circuit, path):
+    # The extension picks the output: .txt (text drawing), .svg or .png
+    if path.endswith('.txt'):
+        _write_text(path, circuit_text(circuit))
+        return path
+    circuit = lower(circuit)
+    figure = new_figure()
+    circuit.draw(output='mpl', ax=figure.add_subplot())
+    _save(figure, path)
+    return path
+
+
+# HISTOGRAMS
+# ___________________________________________________________________________
+def save_histogram(counts, path, title='', legend='Execution', color='crimson',
+                   figsize=(25, 10)):
+    outcomes = sorted(counts)
+    total = sum(counts.values()) or 1
+    probabilities = [counts[outcome] / total for outcome in outcomes]
+    if path.endswith('.txt'):
+        lines = [f'{outcome}  {probability:.3f}' for outcome, probability in zip(outcomes, probabilities)]
+        _write_text(path, '\n'.join([title, *lines]) + '\n')
+        return path
+    figure = new_figure(figsize)
+    axes = figure.add_subplot()
+    positions = np.arange(len(outcomes))
+    bars = axes.bar(positions, probabilities, color=color, label=legend, zorder=2)
+    axes.bar_label(bars, labels=[f'{probability:.3f}' for probability in probabilities])
+    axes.set_xticks(positions)
+    axes.set_xticklabels(outcomes, rotation=70)
+    axes.set_ylabel('Probabilities')
+    axes.set_ylim(0, max(probabilities, default=1) * 1.1)
+    axes.grid(axis='y', linestyle='--', zorder=0)
+    axes.set_title(title)
+    axes.legend()
+    _save(figure, path)
+    return path
+
+
+# BLOCH SPHERES
+# ___________________________________________________________________________
+def bloch_vectors(statevector):
+    # (x, y, z) of every qubit's reduced state, qubit 0 first
+    state = np.asarray(statevector)
+    num_qubits = int(np.log2(state.size))
+    tensor = state.reshape((2,) * num_qubits)
+    vectors = []
+    for qubit in range(num_qubits):
+        axis = num_qubits - 1 - qubit
+        amplitudes = np.moveaxis(tensor, axis, 0).reshape(2, -1)
+        rho = amplitudes @ amplitudes.conj().T
+        vectors.append((
+            2 * rho[0, 1].real,
+            2 * rho[1, 0].imag,
+            (rho[0, 0] - rho[1, 1]).real
+        ))
+    return vectors
+
+
+def save_bloch_multivector(statevector, path, title=''):
+    from qiskit.visualization import plot_bloch_vector
+
+    vectors = bloch_vectors(statevector)
+    figure = new_figure((5 * len(vectors), 5))
+    for qubit, vector in enumerate(vectors):
+        axes = figure.add_subplot(1, len(vectors), qubit + 1, projection='3d')
+        plot_bloch_vector(vector, title=f'qubit {qubit}', ax=axes)
+    if title:
+        figure.suptitle(title)
+    _save(figure, path)
+    return path
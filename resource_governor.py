@@ -0,0 +1,269 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from circuit_ir import OPCODE, CircuitIR
+from counts import DENSE_MAX_CLBITS
+from result_cache import MEGABYTE
+
+
+# Sits in front of every simulation: estimates what each simulation method
+# would cost for a circuit, picks the cheapest valid one and admits the run
+# only while the estimated memory of all running simulations fits the
+# budget. A run that can never fit (or would take longer than the time
+# budget) is rejected at once; one that only has to wait for others is
+# queued for up to queue_timeout seconds.
+GIGABYTE = 1024 * MEGABYTE
+
+# In order of preference when costs are close
+METHODS = ('stabilizer', 'statevector', 'matrix_product_state', 'density_matrix')
+
+# Below this size the methods count as equally cheap and the preference
+# decides, so small circuits stay on the statevector simulator
+NEGLIGIBLE_BYTES = 64 * MEGABYTE
+
+# Amplitude (or tableau bit) updates per second, a conservative single-core
+# figure for turning operation counts into seconds
+OPERATIONS_PER_SECOND = 2.5e8
+
+# Widest circuits the dense methods are estimated for at all: 2^50
+# amplitudes are 16 PiB, far past any budget, and larger powers of two
+# overflow floats. Wider circuits only get the stabilizer and MPS methods
+MAX_STATEVECTOR_QUBITS = 50
+MAX_DENSITY_MATRIX_QUBITS = 25
+
+# MPS bond dimensions up to 2^this are estimated, wider bonds are not run
+MAX_BOND_EXPONENT = 24
+
+# Bytes per entry of Aer's get_counts() dict besides the bit string key
+COUNTS_ENTRY_BYTES = 100
+
+# The NumPy engine keeps a scratch buffer, the probabilities and the outcome
+# index of every basis state next to the 16-byte amplitudes
+WORKSPACE = {'aer': 1, 'numpy': 3}
+
+
+class ResourceLimitExceeded(RuntimeError):
+    # status: 413 when the run can never fit the budget, 503 when the queue
+    # wait timed out and a retry later may succeed
+
+    def __init__(self, message, status=413):
+        super().__init__(message)
+        self.status = status
+
+
+def _shape(circuit):
+    # (qubits of every gate, lowest and highest qubit of every gate, number
+    # of measurements); barriers and measurements are not gates
+    if isinstance(circuit, CircuitIR):
+        data = circuit.data
+        gates = (data['opcode'] != OPCODE['barrier']) & (data['opcode'] != OPCODE['measure'])
+        qubits = data['qubits'][gates]
+        width = 1 + (qubits[:, 1] >= 0)
+        low = np.where(width == 2, qubits.min(axis=1), qubits[:, 0])
+        high = qubits.max(axis=1)
+        return width, low, high, int(np.count_nonzero(data['opcode'] == OPCODE['measure']))
+    width = []
+    low = []
+    high = []
+    measurements = 0
+    for instruction in circuit.data:
+        name = instruction.operation.name
+        if name == 'measure':
+            measurements += 1
+            continue
+        if name == 'barrier' or not instruction.qubits:
+            continue
+        qubits = [circuit.find_bit(qubit).index for qubit in instruction.qubits]
+        width.append(len(qubits))
+        low.append(min(qubits))
+        high.append(max(qubits))
+    return np.array(width, dtype=np.int64), np.array(low, dtype=np.int64), \
+        np.array(high, dtype=np.int64), measurements
+
+
+def bond_exponents(num_qubits, low, high):
+    # log2 of an upper bound on the MPS bond dimension at every cut (between
+    # qubits k-1 and k): a general two-qubit gate has Schmidt rank up to 4,
+    # so 4 per gate crossing it, never more than 2^min(k, n - k)
+    crossing = np.zeros(num_qubits + 1, dtype=np.int64)
+    np.add.at(crossing, low + 1, 1)
+    np.add.at(crossing, high + 1, -1)
+    crossing = np.cumsum(crossing)[1:num_qubits]
+    cuts = np.arange(1, num_qubits)
+    return np.minimum(2 * crossing, np.minimum(cuts, num_qubits - cuts))
+
+
+def _output_bytes(num_clbits, engine, shots, output):
+    # At most one distinct outcome per shot
+    entries = min(2 ** num_clbits, shots)
+    if output == 'samples':
+        return shots * (num_clbits // 8 + 40)
+    if output != 'counts':
+        return 0
+    if num_clbits <= DENSE_MAX_CLBITS:
+        array_bytes = 8 * 2 ** num_clbits
+    else:
+        # SparseCounts: a value and a count per outcome
+        array_bytes = entries * (num_clbits // 8 + 16)
+    if engine == 'aer':
+        return array_bytes + entries * (num_clbits + COUNTS_ENTRY_BYTES)
+    return array_bytes
+
+
+def estimate_costs(circuit, engine='aer', shots=1024, output='counts', clifford=False):
+    # {method: {'bytes', 'seconds'}} for the methods valid for this circuit
+    # and engine. output: 'counts' (see counts.py), 'samples' or
+    # 'statevector' (which only the statevector method returns)
+    n = circuit.num_qubits
+    width, low, high, measurements = _shape(circuit)
+    gates = len(width)
+    output_bytes = _output_bytes(circuit.num_clbits, engine, shots, output)
+    costs = {}
+    if clifford and output != 'statevector':
+        # Two n x 2n bit matrices, signs as affine forms over the measurements
+        costs['stabilizer'] = {
+            'bytes': 4 * n * n + 2 * n * (1 + measurements),
+            'operations': gates * 2 * n + measurements * 4 * n * n
+        }
+    # A k-qubit gate touches 2^(n + k - 2) amplitudes beyond two qubits
+    wide = float(np.sum(2.0 ** np.maximum(width - 2, 0))) if gates and n <= MAX_STATEVECTOR_QUBITS else 0.0
+    if n <= MAX_STATEVECTOR_QUBITS:
+        costs['statevector'] = {
+            'bytes': 16 * 2 ** n * WORKSPACE[engine],
+            'operations': 2.0 ** n * (wide + 1) + shots
+        }
+    if engine == 'aer' and output != 'statevector':
+        exponents = bond_exponents(n, low, high) if n > 1 else np.zeros(0, dtype=np.int64)
+        if not exponents.size or exponents.max() <= MAX_BOND_EXPONENT:
+            sides = 2.0 ** np.concatenate([[0], exponents, [0]])
+            chi = float(sides.max())
+            costs['matrix_product_state'] = {
+                'bytes': float(np.sum(32 * sides[:-1] * sides[1:])),
+                'operations': (gates + shots) * chi ** 3
+            }
+        if n <= MAX_DENSITY_MATRIX_QUBITS:
+            costs['density_matrix'] = {
+                'bytes': 16 * 4 ** n,
+                'operations': 4.0 ** n * (wide + 1) + shots
+            }
+    if engine == 'numpy' and output == 'counts' and 'statevector' in costs:
+        # The NumPy statevector engine bincounts every outcome, at any width
+        costs['statevector']['bytes'] += 8 * 2 ** circuit.num_clbits - output_bytes
+    for cost in costs.values():
+        cost['bytes'] = int(cost['bytes'] + output_bytes)
+        cost['seconds'] = cost.pop('operations') / OPERATIONS_PER_SECOND
+    return costs
+
+
+def plan(circuit, engine='aer', shots=1024, output='counts', clifford=False, numpy_max_qubits=None,
+         method=None):
+    # The cheapest valid method; the NumPy engine has only the stabilizer
+    # tableau and (up to numpy_max_qubits) the statevector, anything else
+    # goes to Aer. method: the one the caller will use, when it is fixed
+    costs = estimate_costs(circuit, engine, shots, output, clifford)
+    if method is not None:
+        if method not in costs:
+            raise ResourceLimitExceeded(
+                f'Схема из {circuit.num_qubits} кубитов слишком широка для метода {method}'
+            )
+        costs = {method: costs[method]}
+    if engine == 'numpy' and 'stabilizer' not in costs and numpy_max_qubits is not None \
+            and circuit.num_qubits > numpy_max_qubits:
+        engine = 'aer'
+        costs = estimate_costs(circuit, engine, shots, output, clifford)
+    if not costs:
+        raise ResourceLimitExceeded(
+            f'Схема из {circuit.num_qubits} кубитов слишком широка для всех методов симуляции'
+        )
+    method = min(
+        costs,
+        key=lambda name: (max(costs[name]['bytes'], NEGLIGIBLE_BYTES), METHODS.index(name))
+    )
+    return {
+        'engine': engine,
+        'method': method,
+        'bytes': costs[method]['bytes'],
+        'seconds': costs[method]['seconds'],
+        'num_qubits': circuit.num_qubits,
+        'costs': costs
+    }
+
+
+def _format_bytes(size):
+    for unit in ('B', 'KiB', 'MiB', 'GiB', 'TiB'):
+        if size < 1024 or unit == 'TiB':
+            return f'{size:.0f} {unit}' if unit == 'B' else f'{size:.1f} {unit}'
+        size //= 1024
+
+
+class ResourceGovernor:
+
+    def __init__(self, memory_budget=2 * GIGABYTE, time_budget=120, queue_timeout=30):
+        self.memory_budget = memory_budget
+        self.time_budget = time_budget
+        self.queue_timeout = queue_timeout
+        self._in_use = 0
+        self._waiting = 0
+        self._condition = threading.Condition()
+        # Nested simulations (cross checks) run under the admission of the outer one
+        self._local = threading.local()
+
+    @contextmanager
+    def admit(self, plan):
+        if getattr(self._local, 'admitted', False):
+            yield
+            return
+        if plan['bytes'] > self.memory_budget:
+            raise ResourceLimitExceeded(
+                f"Схема из {plan['num_qubits']} кубитов требует не меньше "
+                f"{_format_bytes(plan['bytes'])} памяти (метод {plan['method']}), "
+                f"предел - {_format_bytes(self.memory_budget)}"
+            )
+        if plan['seconds'] > self.time_budget:
+            raise ResourceLimitExceeded(
+                f"Схема из {plan['num_qubits']} кубитов займёт около "
+                f"{plan['seconds']:.0f} с (метод {plan['method']}), предел - {self.time_budget} с"
+            )
+        deadline = time.monotonic() + self.queue_timeout
+        with self._condition:
+            self._waiting += 1
+            try:
+                while self._in_use + plan['bytes'] > self.memory_budget:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise ResourceLimitExceeded(
+                            'Сервер занят другими симуляциями, попробуйте позже',
+                            status=503
+                        )
+                    self._condition.wait(remaining)
+            finally:
+                self._waiting -= 1
+            self._in_use += plan['bytes']
+        self._local.admitted = True
+        try:
+            yield
+        finally:
+            self._local.admitted = False
+            with self._condition:
+                self._in_use -= plan['bytes']
+                self._condition.notify_all()
+
+    def stats(self):
+        with self._condition:
+            return {
+                'memory_budget': self.memory_budget,
+                'memory_in_use': self._in_use,
+                'waiting': self._waiting,
+                'time_budget': self.time_budget
+            }
+
+
+GOVERNOR = ResourceGovernor()
+
+
+def configure(**settings):
+    global GOVERNOR
+    GOVERNOR = ResourceGovernor(**settings)
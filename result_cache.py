@@ -0,0 +1,159 @@
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import metrics
+from circuit_ir import CircuitIR
+from disk_lru import atomic_write, evict_lru
+
+
+MEGABYTE = 1024 * 1024
+
+# Bumped whenever the layout of cached entries changes
+CACHE_VERSION = 4
+
+
+def circuit_hash(circuit):
+    if isinstance(circuit, CircuitIR):
+        # Hashes the instruction arrays as they are, nothing to walk
+        return circuit.digest()
+    digest = hashlib.sha256()
+    _update_digest(digest, circuit)
+    return digest.hexdigest()
+
+
+def _update_digest(digest, circuit):
+    # Imported here so the web process does not load qiskit before a plugin does
+    from qiskit.circuit import ClassicalRegister, Gate, Instruction
+
+    digest.update(
+        f'{circuit.num_qubits}:{circuit.num_clbits};'.encode()
+    )
+    for instruction in circuit.data:
+        operation = instruction.operation
+        qubits = [circuit.find_bit(qubit).index for qubit in instruction.qubits]
+        clbits = [circuit.find_bit(clbit).index for clbit in instruction.clbits]
+        # repr() elides the middle of large arrays (unitary / initialize data)
+        params = [
+            hashlib.sha256(np.ascontiguousarray(param).tobytes()).hexdigest() + repr(param.shape)
+            if isinstance(param, np.ndarray) else repr(param)
+            for param in operation.params
+        ]
+        # c_if: (register or clbit, value), hashed as the bits it reads
+        condition = getattr(operation, 'condition', None)
+        if condition is not None:
+            target, value = condition
+            bits = list(target) if isinstance(target, ClassicalRegister) else [target]
+            params.append(f'if{[circuit.find_bit(bit).index for bit in bits]}=={value}')
+        digest.update(
+            f'{operation.name}{qubits}{clbits}{params};'.encode()
+        )
+        # Gates built with to_gate() / to_instruction() only differ by body
+        if type(operation) in (Gate, Instruction) and operation.definition is not None:
+            digest.update(b'{')
+            _update_digest(digest, operation.definition)
+            digest.update(b'}')
+
+
+def result_key(circuit, backend, shots=None, seed=None):
+    digest = hashlib.sha256()
+    digest.update(
+        f'{CACHE_VERSION}|{circuit_hash(circuit)}|{backend}|{shots}|{seed}'.encode()
+    )
+    return digest.hexdigest()
+
+
+class ResultCache:
+    # Two LRU tiers: pickled entries in memory and on disk, each with a byte budget.
+    # An entry is a dict with any of 'counts', 'statevector' and 'artifacts'
+    # ({name: artifact id} of files in the artifact store).
+
+    def __init__(self, memory_budget=64 * MEGABYTE, disk_budget=256 * MEGABYTE,
+                 directory='results/cache'):
+        self.memory_budget = memory_budget
+        self.disk_budget = disk_budget
+        self.directory = directory
+        self._entries = OrderedDict()
+        self._memory_used = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is not None:
+                self._entries.move_to_end(key)
+                return pickle.loads(payload)
+        payload = self._read_disk(key)
+        if payload is None:
+            return None
+        self._store_memory(key, payload)
+        return pickle.loads(payload)
+
+    def put(self, key, entry):
+        payload = pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL)
+        self._store_memory(key, payload)
+        self._write_disk(key, payload)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._memory_used = 0
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith('.pkl'):
+                    os.remove(os.path.join(self.directory, name))
+
+    def _store_memory(self, key, payload):
+        if len(payload) > self.memory_budget:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._memory_used -= len(previous)
+            self._entries[key] = payload
+            self._memory_used += len(payload)
+            while self._memory_used > self.memory_budget:
+                _, evicted = self._entries.popitem(last=False)
+                self._memory_used -= len(evicted)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.pkl')
+
+    def _read_disk(self, key):
+        if not self.disk_budget:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as file:
+                payload = file.read()
+            # mtime doubles as the last access time of the disk tier
+            os.utime(path)
+        except OSError:
+            return None
+        return payload
+
+    def _write_disk(self, key, payload):
+        if not self.disk_budget or len(payload) > self.disk_budget:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        atomic_write(self._path(key), payload)
+        evict_lru(self.directory, self.disk_budget, match=lambda name: name.endswith('.pkl'))
+
+
+def cached_run(cache, key, run):
+    # Returns the cached entry, or runs `run` (which builds the entry) and stores it.
+    # An entry whose artifacts were evicted from the artifact store is rebuilt.
+    # Imported here: artifact_store imports this module
+    from artifact_store import artifacts_exist
+
+    with metrics.stage('cache'):
+        entry = cache.get(key)
+        hit = entry is not None and artifacts_exist(entry.get('artifacts', {}).values())
+    if not hit:
+        entry = run()
+        cache.put(key, entry)
+    return entry
@@ -0,0 +1,187 @@
+from functools import lru_cache
+
+import numpy as np
+
+import metrics
+import resource_governor
+from circuit_ir import CircuitIR, lower
+from counts import counts_from_dict, nonzero
+from transpile_cache import TranspileCache
+
+
+AER = 'aer'
+NUMPY = 'numpy'
+ENGINES = (AER, NUMPY)
+
+# Wider non-Clifford circuits go to Aer even with engine='numpy'
+# (a 2^26 statevector is already 1 GiB)
+NUMPY_MAX_QUBITS = 26
+
+# When enabled every NumPy engine run is repeated on Aer and compared
+CROSS_CHECK = False
+
+# Aer runs go through this cache instead of execute(), which transpiles every call
+TRANSPILE_CACHE = TranspileCache()
+
+# Clifford-only circuits (H, S, X, Y, Z, CX, CZ, ... and measurements) go to a
+# stabilizer tableau instead of a statevector: stabilizer_engine with
+# engine='numpy' (any width), Aer's stabilizer method otherwise. Other
+# circuits get the cheapest method resource_governor finds (statevector, or
+# matrix_product_state when its bond dimensions stay small), and every run
+# is admitted by resource_governor.GOVERNOR against the memory budget
+STABILIZER_ROUTING = True
+
+
+class SimulationMismatch(RuntimeError):
+    pass
+
+
+# qiskit, Aer and the NumPy engine are imported inside the functions: main.py
+# only needs the constants above and must stay cheap to import. Every
+# function also takes a circuit_ir.CircuitIR, lowered to qiskit when needed
+
+
+@lru_cache(maxsize=None)
+def method_simulator(method):
+    from qiskit_aer import AerSimulator
+
+    return AerSimulator(method=method)
+
+
+def aer_backend(method, backend):
+    from qiskit import Aer
+
+    # The statevector method keeps the backend the route asked for
+    if method == 'statevector':
+        return Aer.get_backend(backend)
+    return method_simulator(method)
+
+
+def plan_run(circuit, engine, shots=1024, output='counts'):
+    # Cheapest valid method and its estimated cost (see resource_governor)
+    import stabilizer_engine
+
+    return resource_governor.plan(
+        circuit,
+        engine=engine,
+        shots=shots,
+        output=output,
+        clifford=STABILIZER_ROUTING and stabilizer_engine.is_clifford(circuit),
+        numpy_max_qubits=NUMPY_MAX_QUBITS
+    )
+
+
+# Returns counts as an array indexed by classical register value, or
+# SparseCounts for wide registers (see counts.py)
+def run_counts(circuit, backend='qasm_simulator', shots=1024, seed=None, engine=AER):
+    import stabilizer_engine
+    import statevector_engine
+    from statevector_engine import UnsupportedOperation
+
+    metrics.record_circuit(circuit)
+    plan = plan_run(circuit, engine, shots=shots)
+    with resource_governor.GOVERNOR.admit(plan):
+        if plan['engine'] == NUMPY and plan['method'] == 'stabilizer':
+            with metrics.stage('execute'):
+                return stabilizer_engine.sample_counts(circuit, shots=shots, seed=seed)
+        circuit = lower(circuit)
+        if plan['engine'] == NUMPY:
+            try:
+                with metrics.stage('execute'):
+                    counts = statevector_engine.sample_counts(circuit, shots=shots, seed=seed)
+            except UnsupportedOperation:
+                # Anything the engine does not know goes to Aer unchanged
+                pass
+            else:
+                if CROSS_CHECK:
+                    cross_check(circuit)
+                return counts
+        simulator = aer_backend(plan['method'], backend)
+        with metrics.stage('transpile'):
+            transpiled = TRANSPILE_CACHE.transpile(circuit, simulator)
+        with metrics.stage('execute'):
+            result = simulator.run(
+                transpiled,
+                shots=shots,
+                seed_simulator=seed
+            ).result()
+        return counts_from_dict(result.get_counts(), circuit.num_clbits)
+
+
+# Register value of every shot as a Python int. There is no 2^clbits array
+# as in run_counts, so registers of any width work
+def run_samples(circuit, backend='qasm_simulator', shots=1024, seed=None, engine=AER):
+    import stabilizer_engine
+
+    metrics.record_circuit(circuit)
+    plan = plan_run(circuit, engine, shots=shots, output='samples')
+    with resource_governor.GOVERNOR.admit(plan):
+        if plan['engine'] == NUMPY and plan['method'] == 'stabilizer':
+            with metrics.stage('execute'):
+                return stabilizer_engine.sample_values(circuit, shots=shots, seed=seed)
+        circuit = lower(circuit)
+        if plan['engine'] == NUMPY:
+            counts = run_counts(circuit, backend=backend, shots=shots, seed=seed, engine=engine)
+            values, weights = nonzero(counts)
+            return np.repeat(values, weights).tolist()
+        simulator = aer_backend(plan['method'], backend)
+        with metrics.stage('transpile'):
+            transpiled = TRANSPILE_CACHE.transpile(circuit, simulator)
+        with metrics.stage('execute'):
+            result = simulator.run(
+                transpiled,
+                shots=shots,
+                seed_simulator=seed,
+                memory=True
+            ).result()
+        return [int(bits.replace(' ', ''), 2) for bits in result.get_memory()]
+
+
+def run_statevector(circuit, engine=AER):
+    from qiskit import Aer
+
+    import statevector_engine
+    from statevector_engine import UnsupportedOperation
+
+    metrics.record_circuit(circuit)
+    plan = plan_run(circuit, engine, output='statevector')
+    with resource_governor.GOVERNOR.admit(plan):
+        if plan['engine'] == NUMPY and isinstance(circuit, CircuitIR):
+            # Gates go straight from the arrays to the engine
+            with metrics.stage('execute'):
+                state = circuit.apply(statevector_engine.StatevectorEngine(circuit.num_qubits)).state
+            if CROSS_CHECK:
+                cross_check(lower(circuit))
+            return state
+        circuit = lower(circuit)
+        if plan['engine'] == NUMPY:
+            try:
+                with metrics.stage('execute'):
+                    state = statevector_engine.statevector(circuit)
+            except UnsupportedOperation:
+                pass
+            else:
+                if CROSS_CHECK:
+                    cross_check(circuit)
+                return state
+        simulator = Aer.get_backend('statevector_simulator')
+        with metrics.stage('transpile'):
+            transpiled = TRANSPILE_CACHE.transpile(circuit, simulator)
+        with metrics.stage('execute'):
+            result = simulator.run(transpiled).result()
+        return np.asarray(result.get_statevector().data)
+
+
+def cross_check(circuit, atol=1e-8):
+    import statevector_engine
+
+    # Compares final statevectors; measurements are dropped on both sides
+    unmeasured = circuit.remove_final_measurements(inplace=False)
+    expected = run_statevector(unmeasured, engine=AER)
+    actual = statevector_engine.statevector(unmeasured)
+    deviation = float(np.max(np.abs(expected - actual)))
+    if deviation > atol:
+        raise SimulationMismatch(
+            f'NumPy engine deviates from Aer by {deviation:.3e} on {circuit.name}'
+        )
+    return deviation
@@ -0,0 +1,224 @@
+import numpy as np
+
+import counts
+from circuit_ir import ARITY, OPCODE, OPCODES, CircuitIR
+
+
+# Clifford circuits on an Aaronson-Gottesman stabilizer tableau: O(n^2) bits
+# instead of 2^n amplitudes, so BV and Simon with hundreds of qubits run in
+# milliseconds.
+#
+# The signs of the tableau rows are kept as affine functions over GF(2) of
+# the random measurement outcomes (column 0 is the constant, column k the
+# k-th random outcome). One pass over the circuit then gives every clbit as
+# such a function, and any number of shots is one random bit matrix times
+# that form, instead of one tableau simulation per shot.
+
+# The gates the tableau applies, the same set Aer's stabilizer method takes
+CLIFFORD_GATES = (
+    'id', 'barrier', 'measure', 'h', 'x', 'y', 'z', 's', 'sdg', 'sx', 'sxdg',
+    'cx', 'cy', 'cz', 'swap',
+)
+CLIFFORD_OPCODES = [OPCODE[name] for name in CLIFFORD_GATES if name in OPCODE]
+
+
+class Tableau:
+    # Rows 0..n-1 are destabilizers, rows n..2n-1 stabilizers; row i is the
+    # Pauli product X^x[i] Z^z[i] with sign (-1)^signs[i]
+
+    def __init__(self, num_qubits, max_outcomes):
+        n = num_qubits
+        self.num_qubits = n
+        self.x = np.zeros((2 * n, n), dtype=bool)
+        self.z = np.zeros((2 * n, n), dtype=bool)
+        self.x[np.arange(n), np.arange(n)] = True
+        self.z[np.arange(n, 2 * n), np.arange(n)] = True
+        self.signs = np.zeros((2 * n, 1 + max_outcomes), dtype=bool)
+        self.num_random = 0
+
+    def h(self, a):
+        self.signs[:, 0] ^= self.x[:, a] & self.z[:, a]
+        self.x[:, a], self.z[:, a] = self.z[:, a].copy(), self.x[:, a].copy()
+
+    def s(self, a):
+        self.signs[:, 0] ^= self.x[:, a] & self.z[:, a]
+        self.z[:, a] ^= self.x[:, a]
+
+    def sdg(self, a):
+        self.signs[:, 0] ^= self.x[:, a] & ~self.z[:, a]
+        self.z[:, a] ^= self.x[:, a]
+
+    def x_gate(self, a):
+        self.signs[:, 0] ^= self.z[:, a]
+
+    def z_gate(self, a):
+        self.signs[:, 0] ^= self.x[:, a]
+
+    def y_gate(self, a):
+        self.signs[:, 0] ^= self.x[:, a] ^ self.z[:, a]
+
+    def sx(self, a):
+        self.h(a)
+        self.s(a)
+        self.h(a)
+
+    def sxdg(self, a):
+        self.h(a)
+        self.sdg(a)
+        self.h(a)
+
+    def cx(self, a, b):
+        self.signs[:, 0] ^= self.x[:, a] & self.z[:, b] & ~(self.x[:, b] ^ self.z[:, a])
+        self.x[:, b] ^= self.x[:, a]
+        self.z[:, a] ^= self.z[:, b]
+
+    def cy(self, a, b):
+        self.sdg(b)
+        self.cx(a, b)
+        self.s(b)
+
+    def cz(self, a, b):
+        self.h(b)
+        self.cx(a, b)
+        self.h(b)
+
+    def swap(self, a, b):
+        self.x[:, [a, b]] = self.x[:, [b, a]]
+        self.z[:, [a, b]] = self.z[:, [b, a]]
+
+    def apply(self, name, qubits):
+        if name in ('id', 'barrier'):
+            return
+        if name in ('x', 'y', 'z'):
+            getattr(self, f'{name}_gate')(*qubits)
+        else:
+            getattr(self, name)(*qubits)
+
+    def _phase_flips(self, x, z, pivot):
+        # [sum of g over the qubits = 2 mod 4] for multiplying the rows (x, z)
+        # by the pivot row, g as in Aaronson-Gottesman
+        x1 = self.x[pivot]
+        z1 = self.z[pivot]
+        x2 = x.astype(np.int8)
+        z2 = z.astype(np.int8)
+        g = np.where(
+            x1 & z1, z2 - x2,
+            np.where(x1, z2 * (2 * x2 - 1), np.where(z1, x2 * (1 - 2 * z2), 0))
+        )
+        return g.sum(axis=-1) % 4 == 2
+
+    def measure(self, a):
+        # Returns the outcome as an affine form (a row of signs)
+        n = self.num_qubits
+        stabilizers = np.flatnonzero(self.x[n:, a])
+        if stabilizers.size:
+            # Random outcome: every other row that anticommutes with Z_a is
+            # multiplied by the pivot, which is then replaced by +-Z_a
+            pivot = n + stabilizers[0]
+            rows = np.flatnonzero(self.x[:, a])
+            rows = rows[rows != pivot]
+            self.signs[rows] ^= self.signs[pivot]
+            self.signs[rows, 0] ^= self._phase_flips(self.x[rows], self.z[rows], pivot)
+            self.x[rows] ^= self.x[pivot]
+            self.z[rows] ^= self.z[pivot]
+            self.x[pivot - n] = self.x[pivot]
+            self.z[pivot - n] = self.z[pivot]
+            self.signs[pivot - n] = self.signs[pivot]
+            self.x[pivot] = False
+            self.z[pivot] = False
+            self.z[pivot, a] = True
+            self.num_random += 1
+            self.signs[pivot] = False
+            self.signs[pivot, self.num_random] = True
+            return self.signs[pivot].copy()
+        # Deterministic: Z_a is the product of the stabilizers paired with
+        # the destabilizers that anticommute with it
+        x = np.zeros(n, dtype=bool)
+        z = np.zeros(n, dtype=bool)
+        sign = np.zeros(self.signs.shape[1], dtype=bool)
+        for row in n + np.flatnonzero(self.x[:n, a]):
+            sign ^= self.signs[row]
+            sign[0] ^= self._phase_flips(x, z, row)
+            x ^= self.x[row]
+            z ^= self.z[row]
+        return sign
+
+
+def is_clifford(circuit):
+    if isinstance(circuit, CircuitIR):
+        return bool(np.isin(circuit.data['opcode'], CLIFFORD_OPCODES).all())
+    from qiskit.circuit import Gate, Instruction
+
+    for instruction in circuit.data:
+        operation = instruction.operation
+        if getattr(operation, 'condition', None) is not None:
+            return False
+        if operation.name in CLIFFORD_GATES:
+            continue
+        # Gates built with to_gate() / to_instruction(): look inside
+        if type(operation) in (Gate, Instruction) and operation.definition is not None:
+            if is_clifford(operation.definition):
+                continue
+        return False
+    return True
+
+
+def _instructions(circuit, qubit_map=None, clbit_map=None):
+    # (name, qubits, clbits) of a Clifford circuit, definitions inlined
+    if isinstance(circuit, CircuitIR):
+        data = circuit.data
+        for code, qubits, clbit in zip(
+            data['opcode'].tolist(), data['qubits'].tolist(), data['clbit'].tolist()
+        ):
+            name = OPCODES[code]
+            yield name, qubits[:ARITY[name][0]], [clbit]
+        return
+    for instruction in circuit.data:
+        operation = instruction.operation
+        qubits = [circuit.find_bit(qubit).index for qubit in instruction.qubits]
+        clbits = [circuit.find_bit(clbit).index for clbit in instruction.clbits]
+        if qubit_map is not None:
+            qubits = [qubit_map[qubit] for qubit in qubits]
+            clbits = [clbit_map[clbit] for clbit in clbits]
+        if operation.name in CLIFFORD_GATES:
+            yield operation.name, qubits, clbits
+        else:
+            yield from _instructions(operation.definition, qubits, clbits)
+
+
+def outcome_forms(circuit):
+    # (num_clbits, 1 + random outcomes) bool matrix: clbit c is
+    # forms[c, 0] xor (random bits . forms[c, 1:])
+    instructions = list(_instructions(circuit))
+    num_measurements = sum(name == 'measure' for name, _, _ in instructions)
+    tableau = Tableau(circuit.num_qubits, num_measurements)
+    forms = np.zeros((circuit.num_clbits, 1 + num_measurements), dtype=bool)
+    for name, qubits, clbits in instructions:
+        if name == 'measure':
+            forms[clbits[0]] = tableau.measure(qubits[0])
+        else:
+            tableau.apply(name, qubits)
+    return forms[:, :1 + tableau.num_random]
+
+
+def sample_bits(circuit, shots=1024, seed=None):
+    # (shots, num_clbits) array of 0/1, column c = clbit c
+    forms = outcome_forms(circuit).astype(np.int64)
+    rng = np.random.default_rng(seed)
+    random_bits = rng.integers(0, 2, (shots, forms.shape[1] - 1))
+    return ((random_bits @ forms[:, 1:].T + forms[:, 0]) & 1).astype(np.uint8)
+
+
+def sample_values(circuit, shots=1024, seed=None):
+    # Register value of every shot as a Python int (any register width)
+    packed = np.packbits(sample_bits(circuit, shots, seed), axis=1, bitorder='little')
+    return [int.from_bytes(row.tobytes(), 'little') for row in packed]
+
+
+def sample_counts(circuit, shots=1024, seed=None):
+    # Counts as in counts.py: dense up to DENSE_MAX_CLBITS, SparseCounts beyond
+    if circuit.num_clbits > counts.DENSE_MAX_CLBITS:
+        return counts.from_values(sample_values(circuit, shots, seed), circuit.num_clbits)
+    bits = sample_bits(circuit, shots, seed).astype(np.int64)
+    values = bits @ (1 << np.arange(circuit.num_clbits, dtype=np.int64))
+    return np.bincount(values, minlength=2 ** circuit.num_clbits)
@@ -0,0 +1,204 @@
+import numpy as np
+from qiskit.circuit import ControlledGate
+
+import counts
+
+
+SQRT1_2 = 1 / np.sqrt(2)
+
+# Phase applied to the |1> component of single-qubit diagonal gates
+PHASES = {
+    'z': -1,
+    's': 1j,
+    'sdg': -1j,
+    't': np.exp(1j * np.pi / 4),
+    'tdg': np.exp(-1j * np.pi / 4),
+}
+
+# Operations a measured qubit may still take part in without changing the
+# statistics of measuring it at the end (they are diagonal in its Z basis)
+DIAGONAL_ON_CONTROLS = ('barrier', 'z', 's', 'sdg', 't', 'tdg', 'p', 'cz', 'cp')
+
+
+class UnsupportedOperation(ValueError):
+    pass
+
+
+class StatevectorEngine:
+    # Qiskit ordering: qubit q is bit q of the basis index, i.e. axis n-1-q
+    # of the (2, 2, ..., 2) tensor view of the state buffer.
+
+    def __init__(self, num_qubits):
+        self.num_qubits = num_qubits
+        self.state = np.zeros(2 ** num_qubits, dtype=np.complex128)
+        self.state[0] = 1
+        self._tensor = self.state.reshape((2,) * num_qubits)
+        self._scratch = np.empty(max(1, 2 ** (num_qubits - 1)), dtype=np.complex128)
+
+    def _view(self, fixed):
+        index = [slice(None)] * self.num_qubits
+        for qubit, bit in fixed.items():
+            # A length-1 slice keeps a writable view even when every axis is fixed
+            index[self.num_qubits - 1 - qubit] = slice(bit, bit + 1)
+        return self._tensor[tuple(index)]
+
+    def _buffer(self, view):
+        return self._scratch[:view.size].reshape(view.shape)
+
+    def h(self, qubit, controls=None):
+        zero = self._view({**(controls or {}), qubit: 0})
+        one = self._view({**(controls or {}), qubit: 1})
+        difference = self._buffer(zero)
+        np.subtract(zero, one, out=difference)
+        zero += one
+        zero *= SQRT1_2
+        np.multiply(difference, SQRT1_2, out=one)
+
+    def x(self, qubit, controls=None):
+        zero = self._view({**(controls or {}), qubit: 0})
+        one = self._view({**(controls or {}), qubit: 1})
+        swap = self._buffer(zero)
+        swap[...] = zero
+        zero[...] = one
+        one[...] = swap
+
+    def y(self, qubit, controls=None):
+        self.x(qubit, controls)
+        self._view({**(controls or {}), qubit: 0})[...] *= -1j
+        self._view({**(controls or {}), qubit: 1})[...] *= 1j
+
+    def phase(self, qubit, phase, controls=None):
+        self._view({**(controls or {}), qubit: 1})[...] *= phase
+
+    def unitary(self, qubits, matrix):
+        # Dense k-qubit matrix; row/column bit j belongs to qubits[j]
+        k = len(qubits)
+        axes = [self.num_qubits - 1 - qubit for qubit in reversed(qubits)]
+        result = np.tensordot(
+            matrix.reshape((2,) * (2 * k)),
+            self._tensor,
+            axes=(list(range(k, 2 * k)), axes)
+        )
+        self._tensor[...] = np.moveaxis(result, list(range(k)), axes)
+
+    def initialize(self, qubits, amplitudes):
+        # Only valid while the target qubits are still |0...0>, which is how
+        # the routes use it (preparing an ancilla before any other gate)
+        ground = self._view({qubit: 0 for qubit in qubits}).copy()
+        if not np.isclose(np.vdot(ground, ground).real, 1):
+            raise UnsupportedOperation('initialize on a non-|0> qubit')
+        for basis, amplitude in enumerate(amplitudes):
+            fixed = {qubit: (basis >> position) & 1 for position, qubit in enumerate(qubits)}
+            np.multiply(ground, amplitude, out=self._view(fixed))
+
+    def probabilities(self):
+        return np.abs(self.state) ** 2
+
+
+def _controls(operation, qubits):
+    num_controls = operation.num_ctrl_qubits
+    return {
+        qubit: (operation.ctrl_state >> position) & 1
+        for position, qubit in enumerate(qubits[:num_controls])
+    }
+
+
+def apply_operation(engine, operation, qubits):
+    if getattr(operation, 'condition', None) is not None:
+        raise UnsupportedOperation('classically conditioned operations')
+    name = operation.name
+    if name in ('barrier', 'id', 'measure'):
+        return
+    if name == 'h':
+        engine.h(qubits[0])
+    elif name == 'x':
+        engine.x(qubits[0])
+    elif name == 'y':
+        engine.y(qubits[0])
+    elif name in PHASES:
+        engine.phase(qubits[0], PHASES[name])
+    elif name == 'p':
+        engine.phase(qubits[0], np.exp(1j * float(operation.params[0])))
+    elif name == 'unitary':
+        engine.unitary(qubits, np.asarray(operation.params[0], dtype=np.complex128))
+    elif name in ('u', 'u1', 'u2', 'u3', 'rx', 'ry', 'rz', 'sx', 'sxdg'):
+        engine.unitary(qubits, operation.to_matrix())
+    elif name == 'initialize':
+        engine.initialize(qubits, np.asarray(operation.params, dtype=np.complex128))
+    elif isinstance(operation, ControlledGate) and operation.base_gate.name in ('x', 'z', 'p', 'h'):
+        controls = _controls(operation, qubits)
+        target = qubits[operation.num_ctrl_qubits]
+        base = operation.base_gate
+        if base.name == 'x':
+            engine.x(target, controls)
+        elif base.name == 'h':
+            engine.h(target, controls)
+        elif base.name == 'z':
+            engine.phase(target, -1, controls)
+        else:
+            engine.phase(target, np.exp(1j * float(base.params[0])), controls)
+    elif operation.definition is not None:
+        _apply_circuit(engine, operation.definition, qubits)
+    else:
+        raise UnsupportedOperation(name)
+
+
+def _apply_circuit(engine, circuit, qubit_map=None):
+    for instruction in circuit.data:
+        qubits = [circuit.find_bit(qubit).index for qubit in instruction.qubits]
+        if qubit_map is not None:
+            qubits = [qubit_map[qubit] for qubit in qubits]
+        apply_operation(engine, instruction.operation, qubits)
+
+
+def deferred_measurements(circuit):
+    # Returns {clbit: qubit}; measurements may be followed only by operations
+    # that use the measured qubit as a control or are diagonal on it.
+    measured = {}
+    measured_qubits = set()
+    for instruction in circuit.data:
+        operation = instruction.operation
+        qubits = [circuit.find_bit(qubit).index for qubit in instruction.qubits]
+        if operation.name == 'measure':
+            clbit = circuit.find_bit(instruction.clbits[0]).index
+            measured[clbit] = qubits[0]
+            measured_qubits.add(qubits[0])
+            continue
+        touched = measured_qubits.intersection(qubits)
+        if not touched or operation.name in DIAGONAL_ON_CONTROLS:
+            continue
+        if isinstance(operation, ControlledGate) and operation.base_gate.name == 'x':
+            controls = qubits[:operation.num_ctrl_qubits]
+            if touched.issubset(controls):
+                continue
+        raise UnsupportedOperation('mid-circuit measurement')
+    return measured
+
+
+def simulate(circuit):
+    engine = StatevectorEngine(circuit.num_qubits)
+    _apply_circuit(engine, circuit)
+    return engine
+
+
+def outcome_probabilities(circuit):
+    # Probability of every classical register value, from one simulation
+    measured = deferred_measurements(circuit)
+    engine = simulate(circuit)
+    indices = np.arange(engine.state.size)
+    outcomes = np.zeros(engine.state.size, dtype=np.int64)
+    for clbit, qubit in measured.items():
+        outcomes |= ((indices >> qubit) & 1) << clbit
+    return np.bincount(
+        outcomes,
+        weights=engine.probabilities(),
+        minlength=2 ** circuit.num_clbits
+    )
+
+
+def sample_counts(circuit, shots=1024, seed=None):
+    return counts.sample(outcome_probabilities(circuit), shots, seed)
+
+
+def statevector(circuit):
+    return simulate(circuit).state
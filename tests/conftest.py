@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the top of the repository, not in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    # Caches and artifacts go to their relative results/ directories: keep
+    # them in a temporary directory
+    monkeypatch.chdir(tmp_path)
+    from main import create_app
+
+    return create_app().test_client()
@@ -0,0 +1,30 @@
+import pytest
+
+from algorithms.grover_oracle import Problem, build_grover
+
+
+def test_build_grover_rejects_empty_clause_list():
+    with pytest.raises(ValueError):
+        build_grover(Problem(3), num_solutions=1)
+
+
+@pytest.mark.parametrize('num_solutions', [0, 9, -1])
+def test_build_grover_rejects_num_solutions_out_of_range(num_solutions):
+    with pytest.raises(ValueError):
+        build_grover(Problem(3, clauses=[[1, -2]]), num_solutions=num_solutions)
+
+
+def test_cnf_route_answers_400_without_clauses(client):
+    response = client.post(
+        '/quantum_algorithms/Grover_algorithm/cnf',
+        json={'num_variables': 3, 'num_solutions': 1}
+    )
+    assert response.status_code == 400
+
+
+def test_cnf_route_answers_400_for_too_many_solutions(client):
+    response = client.post(
+        '/quantum_algorithms/Grover_algorithm/cnf',
+        json={'num_variables': 3, 'clauses': [[1]], 'num_solutions': 9}
+    )
+    assert response.status_code == 400
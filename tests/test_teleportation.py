@@ -0,0 +1,25 @@
+import pytest
+
+URL = '/algorithms/Quantum_Teleportation_Algorithm/exact'
+
+
+@pytest.mark.parametrize('states', [
+    [[0.5]],
+    [[0.5, 0.1, 0.2]],
+    [0.5],
+    [['0.5', 0.1]],
+    [None],
+])
+def test_exact_teleportation_rejects_malformed_states(client, states):
+    assert client.post(URL, json={'states': states}).status_code == 400
+
+
+def test_exact_teleportation_rejects_non_object_body(client):
+    assert client.post(URL, json=[[0.5, 0.1]]).status_code == 400
+
+
+def test_exact_teleportation_keeps_the_state(client):
+    response = client.post(URL, json={'states': [[1.0, 0.5]]})
+    assert response.status_code == 200
+    result, = response.get_json()['results']
+    assert result['fidelity'] == pytest.approx(1.0)
@@ -0,0 +1,151 @@
+import hashlib
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from disk_lru import atomic_write, evict_lru
+from result_cache import MEGABYTE, circuit_hash
+
+
+# Bumped whenever the layout of the cached files changes
+CACHE_VERSION = 1
+
+
+def transpile_key(circuit, backend_name, optimization_level=None):
+    from qiskit import __version__ as qiskit_version
+
+    digest = hashlib.sha256()
+    digest.update(
+        f'{CACHE_VERSION}|{qiskit_version}|{circuit_hash(circuit)}|{backend_name}|{optimization_level}'.encode()
+    )
+    return digest.hexdigest()
+
+
+class TranspileCache:
+    # Transpiled circuits in an in-memory LRU and as QPY files on disk.
+    # Stats count hits and misses, the transpile time they saved and how the
+    # gate count and depth changed between the input and the transpiled circuit.
+
+    def __init__(self, max_entries=256, disk_budget=64 * MEGABYTE,
+                 directory='results/cache/transpiled'):
+        self.max_entries = max_entries
+        self.disk_budget = disk_budget
+        self.directory = directory
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'transpile_seconds': 0.0,
+            'saved_seconds': 0.0,
+            'gates_before': 0,
+            'gates_after': 0,
+            'depth_before': 0,
+            'depth_after': 0,
+        }
+
+    def transpile(self, circuit, backend, optimization_level=None):
+        from qiskit import transpile
+
+        key = transpile_key(circuit, backend.name(), optimization_level)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._count_hit('memory_hits', entry)
+                return entry['circuit']
+        entry = self._read_disk(key)
+        if entry is not None:
+            self._store_memory(key, entry)
+            with self._lock:
+                self._count_hit('disk_hits', entry)
+            return entry['circuit']
+
+        start = time.perf_counter()
+        transpiled = transpile(
+            circuit,
+            backend=backend,
+            optimization_level=optimization_level
+        )
+        entry = {
+            'circuit': transpiled,
+            'seconds': time.perf_counter() - start,
+        }
+        self._store_memory(key, entry)
+        self._write_disk(key, entry)
+        with self._lock:
+            self._stats['misses'] += 1
+            self._stats['transpile_seconds'] += entry['seconds']
+            self._stats['gates_before'] += circuit.size()
+            self._stats['gates_after'] += transpiled.size()
+            self._stats['depth_before'] += circuit.depth()
+            self._stats['depth_after'] += transpiled.depth()
+        return transpiled
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_entries'] = len(self._entries)
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = (lookups - stats['misses']) / lookups if lookups else 0.0
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith('.qpy'):
+                    os.remove(os.path.join(self.directory, name))
+
+    def _count_hit(self, kind, entry):
+        self._stats[kind] += 1
+        self._stats['saved_seconds'] += entry['seconds']
+
+    def _store_memory(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.qpy')
+
+    def _read_disk(self, key):
+        from qiskit import qpy
+
+        if not self.disk_budget:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as file:
+                # The original transpile time is kept in the first line
+                seconds = float(file.readline())
+                circuit = qpy.load(file)[0]
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return {'circuit': circuit, 'seconds': seconds}
+
+    def _write_disk(self, key, entry):
+        from qiskit import qpy
+
+        if not self.disk_budget:
+            return
+        buffer = io.BytesIO()
+        buffer.write(f'{entry["seconds"]!r}\n'.encode())
+        try:
+            qpy.dump(entry['circuit'], buffer)
+        except Exception:
+            # Not every instruction has a QPY encoding; keep it in memory only
+            return
+        payload = buffer.getvalue()
+        if len(payload) > self.disk_budget:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        atomic_write(self._path(key), payload)
+        evict_lru(self.directory, self.disk_budget, match=lambda name: name.endswith('.qpy'))